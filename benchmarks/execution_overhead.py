@@ -0,0 +1,108 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Time the per-execution overhead of a large, already compiled statement.
+
+Usage::
+
+    python benchmarks/execution_overhead.py [--size 100000] [--number 1000]
+
+The statement is compiled once and reused through a compiled cache, and
+the DB-API connection does nothing, so what's left is the work the
+engine and dialect do on every execution.
+"""
+
+import argparse
+import timeit
+
+import sqlalchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+
+from pybigquery.sqlalchemy_bigquery import BigQueryDialect
+
+
+class Cursor(object):
+    description = None
+    rowcount = -1
+    arraysize = 1
+
+    def execute(self, operation, parameters=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class Connection(object):
+    def cursor(self):
+        return Cursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_statement(size):
+    table = sqlalchemy.table(
+        "events", sqlalchemy.column("id"), sqlalchemy.column("name")
+    )
+    columns = []
+    length = 0
+    while length < size:
+        i = len(columns)
+        column = sqlalchemy.literal_column("CONCAT(name, 'suffix {}')".format(i)).label(
+            "c{}".format(i)
+        )
+        columns.append(column)
+        length += len("CONCAT(name, 'suffix {}') AS `c{}`, ".format(i, i))
+    return sqlalchemy.select(columns).select_from(table).where(table.c.id == 42)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--number", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dialect = BigQueryDialect()
+    engine = Engine(
+        sqlalchemy.pool.StaticPool(Connection), dialect, make_url("bigquery://")
+    )
+    statement = make_statement(args.size)
+    with engine.connect() as conn:
+        conn = conn.execution_options(compiled_cache={})
+        conn.execute(statement)
+        text_size = len(str(statement.compile(dialect=dialect)))
+        times = timeit.repeat(
+            lambda: conn.execute(statement), number=args.number, repeat=args.repeat
+        )
+
+    print(
+        "{} KB statement: best of {}: {:.1f} us per execution".format(
+            text_size // 1000, args.repeat, min(times) / args.number * 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
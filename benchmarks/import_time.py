@@ -0,0 +1,65 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Time importing the dialect, as loading its entry point does.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeat 10]
+
+Each import runs in a new interpreter, after importing SQLAlchemy, so
+only the cost of the dialect itself is measured.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+CODE = """
+import sys, time
+import sqlalchemy
+start = time.perf_counter()
+import pybigquery.sqlalchemy_bigquery
+print(time.perf_counter() - start, "google.cloud.bigquery" in sys.modules)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    times = []
+    for _ in range(args.repeat):
+        output = subprocess.check_output([sys.executable, "-c", CODE], text=True)
+        seconds, imports_bigquery = output.split()
+        times.append(float(seconds))
+
+    print(
+        "import pybigquery.sqlalchemy_bigquery: median of {}: {:.1f} ms{}".format(
+            args.repeat,
+            statistics.median(times) * 1000,
+            " (imports google.cloud.bigquery)" if imports_bigquery == "True" else "",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Time column reflection of a wide, deeply nested schema.
+
+Usage::
+
+    python benchmarks/reflect_nested_columns.py [--leaves 10000] [--depth 15]
+
+The synthetic schema is a chain of ``depth`` nested RECORD fields, with
+the leaves spread evenly over the levels, like the event and user
+properties of analytics exports.
+"""
+
+import argparse
+import timeit
+
+from google.cloud.bigquery.schema import SchemaField
+
+from pybigquery.sqlalchemy_bigquery import BigQueryDialect
+
+LEAF_TYPES = ["STRING", "INT64", "FLOAT64", "BOOL", "TIMESTAMP"]
+
+
+def make_schema(leaves, depth):
+    per_level = max(leaves // depth, 1)
+    fields = []
+    for level in reversed(range(depth)):
+        level_fields = [
+            SchemaField(
+                "f{}_{}".format(level, i),
+                LEAF_TYPES[i % len(LEAF_TYPES)],
+                mode="REPEATED" if i % 7 == 0 else "NULLABLE",
+            )
+            for i in range(per_level)
+        ]
+        if fields:
+            level_fields.append(
+                SchemaField("r{}".format(level + 1), "RECORD", fields=fields)
+            )
+        fields = level_fields
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--leaves", type=int, default=10000)
+    parser.add_argument("--depth", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dialect = BigQueryDialect()
+    schema = make_schema(args.leaves, args.depth)
+    columns = dialect._get_columns_helper(schema)
+    times = timeit.repeat(
+        lambda: dialect._get_columns_helper(schema), number=1, repeat=args.repeat
+    )
+    print(
+        "{} columns, depth {}: best of {}: {:.1f} ms".format(
+            len(columns), args.depth, args.repeat, min(times) * 1000
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -25,7 +25,7 @@ import nox
 
 
 BLACK_VERSION = "black==19.10b0"
-BLACK_PATHS = ["docs", "pybigquery", "tests", "noxfile.py", "setup.py"]
+BLACK_PATHS = ["benchmarks", "docs", "pybigquery", "tests", "noxfile.py", "setup.py"]
 
 DEFAULT_PYTHON_VERSION = "3.8"
 SYSTEM_TEST_PYTHON_VERSIONS = ["3.9"]
@@ -94,7 +94,8 @@ def default(session):
     )
     session.install("mock", "pytest", "pytest-cov", "-c", constraints_path)
 
-    session.install("-e", ".", "-c", constraints_path)
+    # With the optional dependencies, so the DataFrame and Arrow tests don't skip.
+    session.install("-e", ".[pandas]", "-c", constraints_path)
 
     # Run py.test against the unit tests.
     session.run(
@@ -4,11 +4,23 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+import concurrent.futures
+import datetime
+import json
+import socket
+import threading
+
 from google.api_core import client_info
+from google.api_core.gapic_v1 import client_info as gapic_client_info
 import google.auth
+import google.api_core.exceptions
+import google.auth.transport.requests
 from google.cloud import bigquery
 from google.oauth2 import service_account
+import requests
+import requests.adapters
 import sqlalchemy
+from urllib3.connection import HTTPConnection
 
 
 USER_AGENT_TEMPLATE = "sqlalchemy/{}"
@@ -24,15 +36,12 @@ def google_client_info():
     return client_info.ClientInfo(user_agent=user_agent)
 
 
-def create_bigquery_client(
-    credentials_info=None,
-    credentials_path=None,
-    default_query_job_config=None,
-    location=None,
-    project_id=None,
-):
-    default_project = None
+# Refresh tokens this long before they expire. google-auth itself only
+# refreshes them (while a request waits) a few minutes before expiry.
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
 
+def _load_credentials(credentials_info=None, credentials_path=None):
     if credentials_path:
         credentials = service_account.Credentials.from_service_account_file(
             credentials_path
@@ -48,13 +57,243 @@ def create_bigquery_client(
     else:
         credentials, default_project = google.auth.default(scopes=SCOPES)
 
+    return credentials, default_project
+
+
+class CredentialsCache(object):
+    """Credentials loaded for an engine.
+
+    They're only loaded once for each ``credentials_path``,
+    ``credentials_info``, or the default credentials, so that an engine
+    doesn't repeat service account file reads or metadata server calls.
+    """
+
+    def __init__(self):
+        self._credentials = {}  # {key: (credentials, default_project)}
+        self._token_refreshers = {}  # {key: _TokenRefresher}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        credentials_info=None,
+        credentials_path=None,
+        background_token_refresh=False,
+    ):
+        """Return ``(credentials, default_project)``.
+
+        With ``background_token_refresh``, a daemon thread refreshes the
+        credentials' token before it expires, until :meth:`clear` is called.
+        """
+        if credentials_path:
+            key = ("path", credentials_path)
+        elif credentials_info:
+            key = ("info", json.dumps(credentials_info, sort_keys=True))
+        else:
+            key = ("default",)
+
+        with self._lock:
+            result = self._credentials.get(key)
+            if result is None:
+                result = _load_credentials(credentials_info, credentials_path)
+                self._credentials[key] = result
+            if background_token_refresh and key not in self._token_refreshers:
+                refresher = self._token_refreshers[key] = _TokenRefresher(result[0])
+                refresher.start()
+
+        return result
+
+    def clear(self):
+        """Forget the credentials, and stop refreshing their tokens."""
+        with self._lock:
+            for refresher in self._token_refreshers.values():
+                refresher.stop()
+            self._token_refreshers.clear()
+            self._credentials.clear()
+
+
+def _utcnow():
+    # google-auth token expiry times are naive UTC datetimes.
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class _TokenRefresher(threading.Thread):
+    """Refresh credentials shortly before their token expires, so that
+    queries don't wait for the refresh."""
+
+    def __init__(self, credentials, retry_interval=60, request=None):
+        super().__init__(name="pybigquery-token-refresh", daemon=True)
+        self.credentials = credentials
+        self.retry_interval = retry_interval
+        self._request = request or google.auth.transport.requests.Request()
+        self._stopped = threading.Event()
+
+    def delay(self):
+        """Seconds until the token needs to be refreshed."""
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return 0
+        return max((expiry - TOKEN_REFRESH_MARGIN - _utcnow()).total_seconds(), 0)
+
+    def run(self):
+        delay = self.delay()
+        while not self._stopped.wait(delay):
+            try:
+                self.credentials.refresh(self._request)
+            except Exception:
+                # The next request refreshes the token itself, and
+                # reports any error.
+                delay = self.retry_interval
+            else:
+                # Don't spin on tokens that expire within the margin.
+                delay = self.delay() or self.retry_interval
+
+    def stop(self):
+        self._stopped.set()
+
+
+def create_bigquery_client(
+    credentials_info=None,
+    credentials_path=None,
+    default_query_job_config=None,
+    location=None,
+    project_id=None,
+    background_token_refresh=False,
+    http_pool_size=None,
+    http_max_retries=None,
+    http_keepalive=None,
+    credentials_cache=None,
+):
+    if credentials_cache is None:
+        credentials_cache = CredentialsCache()
+    credentials, default_project = credentials_cache.get(
+        credentials_info, credentials_path, background_token_refresh
+    )
     if project_id is None:
         project_id = default_project
 
+    http = None
+    if (http_pool_size, http_max_retries, http_keepalive) != (None, None, None):
+        http = create_http_session(
+            credentials,
+            pool_size=http_pool_size,
+            max_retries=http_max_retries,
+            keepalive=http_keepalive,
+        )
+
     return bigquery.Client(
         client_info=google_client_info(),
         project=project_id,
         credentials=credentials,
         location=location,
         default_query_job_config=default_query_job_config,
+        _http=http,
+    )
+
+
+class _HTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that can set socket options on its connections."""
+
+    def __init__(self, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _keepalive_socket_options(idle):
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # Seconds before idle connections are probed: TCP_KEEPIDLE on Linux,
+    # TCP_KEEPALIVE on macOS.
+    idle_option = getattr(socket, "TCP_KEEPIDLE", None) or getattr(
+        socket, "TCP_KEEPALIVE", None
+    )
+    if idle_option is not None:
+        options.append((socket.IPPROTO_TCP, idle_option, idle))
+    return HTTPConnection.default_socket_options + options
+
+
+def create_http_session(credentials, pool_size=None, max_retries=None, keepalive=None):
+    """Create an authorized HTTP session for a client.
+
+    ``pool_size`` is the number of connections kept open (requests keeps
+    10 by default), ``max_retries`` the number of retries of failed
+    connections, and ``keepalive`` enables TCP keep-alive probes after
+    that many idle seconds.
+    """
+    adapter_kwargs = {}
+    if pool_size is not None:
+        adapter_kwargs["pool_connections"] = pool_size
+        adapter_kwargs["pool_maxsize"] = pool_size
+    if max_retries is not None:
+        adapter_kwargs["max_retries"] = max_retries
+    if keepalive is not None:
+        adapter_kwargs["socket_options"] = _keepalive_socket_options(keepalive)
+
+    session = google.auth.transport.requests.AuthorizedSession(credentials)
+    adapter = _HTTPAdapter(**adapter_kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def warm_up_client(client, connections):
+    """Open ``connections`` HTTP connections to the API, concurrently, so
+    that the first queries don't have to set them up."""
+
+    def ping(_):
+        try:
+            list(client.list_datasets(max_results=1))
+        except (
+            google.api_core.exceptions.GoogleAPICallError,
+            requests.exceptions.RequestException,
+        ):
+            # It's only a warm-up. Queries report any real problem.
+            pass
+
+    with concurrent.futures.ThreadPoolExecutor(connections) as executor:
+        list(executor.map(ping, range(connections)))
+
+
+def dbapi_keeps_query_rows():
+    """Whether DB-API cursors keep query results as a ``RowIterator``, as
+    they do since google-cloud-bigquery 3.17, rather than fetching them as
+    soon as queries run."""
+    version = tuple(int(part) for part in bigquery.__version__.split(".")[:2])
+    return version >= (3, 17)
+
+
+def create_bigquery_storage_client(client):
+    """Create a BigQuery Storage API client with the credentials of ``client``.
+
+    Returns None if google-cloud-bigquery-storage isn't installed.
+    """
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+
+    user_agent = USER_AGENT_TEMPLATE.format(sqlalchemy.__version__)
+    return bigquery_storage.BigQueryReadClient(
+        credentials=client._credentials,
+        client_info=gapic_client_info.ClientInfo(user_agent=user_agent),
+    )
+
+
+def create_bigquery_write_client(client):
+    """Create a BigQuery Storage Write API client with the credentials of ``client``.
+    """
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        raise ImportError(
+            "The Storage Write API requires google-cloud-bigquery-storage"
+        )
+
+    user_agent = USER_AGENT_TEMPLATE.format(sqlalchemy.__version__)
+    return bigquery_storage.BigQueryWriteClient(
+        credentials=client._credentials,
+        client_info=gapic_client_info.ClientInfo(user_agent=user_agent),
     )
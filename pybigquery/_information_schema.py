@@ -0,0 +1,231 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Reflect every table in a dataset with a single INFORMATION_SCHEMA query.
+
+The tables are returned as :class:`google.cloud.bigquery.table.Table`
+objects, the same thing ``client.get_table()`` returns, so the rest of
+the dialect doesn't need to know where the metadata came from.
+"""
+
+import json
+import re
+
+from google.cloud.bigquery.schema import SchemaField
+from google.cloud.bigquery.table import Table, TableReference, TimePartitioning
+
+DATASET_COLUMNS_QUERY = """\
+SELECT
+  c.table_name,
+  c.column_name,
+  c.ordinal_position,
+  c.is_nullable,
+  c.data_type,
+  c.is_partitioning_column,
+  c.clustering_ordinal_position,
+  f.field_path,
+  f.description,
+  o.option_value AS table_description
+FROM `{dataset}`.INFORMATION_SCHEMA.COLUMNS AS c
+JOIN `{dataset}`.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS AS f
+  USING (table_name, column_name)
+LEFT JOIN (
+  SELECT table_name, option_value
+  FROM `{dataset}`.INFORMATION_SCHEMA.TABLE_OPTIONS
+  WHERE option_name = 'description'
+) AS o
+  USING (table_name)
+ORDER BY c.table_name, c.ordinal_position
+"""
+
+_TIME_PARTITIONING_TYPES = frozenset(["DATE", "DATETIME", "TIMESTAMP"])
+
+_type_tokens = re.compile(r"\s*(`(?:[^`\\]|\\.)*`|\w+|.)").findall
+
+
+class _TypeParser(object):
+    """Parse GoogleSQL type names like ``ARRAY<STRUCT<x INT64, y STRING(10)>>``.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _type_tokens(text)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def error(self):
+        return ValueError("Did not understand type: {}".format(self.text))
+
+    def expect(self, token):
+        if self.next() != token:
+            raise self.error()
+
+    def skip_parameters(self):
+        # Parameterized types, like STRING(10) or NUMERIC(10, 2).
+        if self.peek() == "(":
+            depth = 0
+            while True:
+                token = self.next()
+                if token is None:
+                    raise self.error()
+                depth += {"(": 1, ")": -1}.get(token, 0)
+                if not depth:
+                    break
+
+    def parse(self, name, mode):
+        """Return a SchemaField for the type, with nested fields named, but
+        without descriptions."""
+        type_name = self.next().upper()
+        if type_name == "ARRAY":
+            self.expect("<")
+            field = self.parse(name, "REPEATED")
+            self.expect(">")
+            return field
+
+        fields = ()
+        if type_name == "STRUCT":
+            type_name = "RECORD"
+            fields = []
+            self.expect("<")
+            while True:
+                field_name = self.next()
+                if field_name.startswith("`"):
+                    field_name = field_name[1:-1]
+                fields.append(self.parse(field_name, "NULLABLE"))
+                token = self.next()
+                if token == ">":
+                    break
+                elif token != ",":
+                    raise self.error()
+        else:
+            self.skip_parameters()
+
+        if self.peek() == "NOT":
+            self.next()
+            self.expect("NULL")
+            if mode == "NULLABLE":
+                mode = "REQUIRED"
+
+        return SchemaField(name, type_name, mode=mode, fields=fields)
+
+
+def parse_data_type(name, data_type, mode="NULLABLE"):
+    """Build a SchemaField from a column name and INFORMATION_SCHEMA type."""
+    parser = _TypeParser(data_type)
+    field = parser.parse(name, mode)
+    if parser.peek() is not None:
+        raise parser.error()
+    return field
+
+
+def _describe(field, descriptions, prefix=""):
+    path = prefix + field.name
+    return SchemaField(
+        field.name,
+        field.field_type,
+        mode=field.mode,
+        description=descriptions.get(path),
+        fields=[_describe(f, descriptions, path + ".") for f in field.fields],
+    )
+
+
+def _parse_string_option(value):
+    # Option values are GoogleSQL literals, e.g. "a \"quoted\" description".
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value.strip("\"'")
+
+
+def _table_from_columns(dataset_ref, table_name, table_columns, descriptions):
+    schema = []
+    time_partitioning = None
+    clustering = []
+    table_description = None
+    for column_name, row in table_columns.items():
+        table_description = row["table_description"]
+        if row["is_partitioning_column"] == "YES" and column_name.startswith(
+            "_PARTITION"
+        ):
+            # Ingestion-time partitioning pseudo-column.
+            time_partitioning = TimePartitioning()
+            continue
+
+        mode = "NULLABLE" if row["is_nullable"] == "YES" else "REQUIRED"
+        field = parse_data_type(column_name, row["data_type"], mode)
+        schema.append(_describe(field, descriptions))
+
+        if (
+            row["is_partitioning_column"] == "YES"
+            and field.field_type in _TIME_PARTITIONING_TYPES
+        ):
+            time_partitioning = TimePartitioning(field=column_name)
+        if row["clustering_ordinal_position"] is not None:
+            clustering.append((row["clustering_ordinal_position"], column_name))
+
+    table = Table(TableReference(dataset_ref, table_name), schema=schema)
+    table.description = _parse_string_option(table_description)
+    table.time_partitioning = time_partitioning
+    if clustering:
+        table.clustering_fields = [name for _, name in sorted(clustering)]
+    return table
+
+
+def tables_from_rows(dataset_ref, rows):
+    """Group INFORMATION_SCHEMA rows into one Table per table name.
+
+    Tables with column types that can't be parsed, e.g. ``RANGE<DATE>``,
+    are left out, so that they're fetched with the API instead.
+    """
+    columns = {}  # {table_name: {column_name: row}}, in ordinal order
+    descriptions = {}  # {table_name: {field_path: description}}
+    for row in rows:
+        table_name = row["table_name"]
+        columns.setdefault(table_name, {}).setdefault(row["column_name"], row)
+        descriptions.setdefault(table_name, {})[row["field_path"]] = row["description"]
+
+    tables = []
+    for table_name, table_columns in columns.items():
+        try:
+            table = _table_from_columns(
+                dataset_ref, table_name, table_columns, descriptions[table_name]
+            )
+        except ValueError:
+            continue
+        tables.append(table)
+
+    return tables
+
+
+def reflect_dataset(client, dataset_ref):
+    """Fetch the metadata of every table in a dataset with one query."""
+    query = DATASET_COLUMNS_QUERY.format(
+        dataset="{}.{}".format(dataset_ref.project, dataset_ref.dataset_id)
+    )
+    return tables_from_rows(dataset_ref, client.query(query).result())
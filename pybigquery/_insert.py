@@ -0,0 +1,186 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Insert many rows at once, rather than with an INSERT query per row.
+
+Load jobs don't count against DML quotas, and load many rows in about the
+time a single INSERT query takes. For fewer rows, when that's still too
+long, the rows are passed to a single INSERT as an array of structs.
+Tables that can't be loaded, or need rows to be queryable right away,
+can be streamed to with insertAll requests instead.
+"""
+
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import uuid
+
+from google.cloud.bigquery import dbapi
+
+# Query requests are limited to 10 MB. This leaves room for the query text
+# and parameter types.
+MAX_QUERY_PARAMETER_BYTES = 8 * 1024 * 1024
+
+
+def json_value(value):
+    """Convert a parameter value to what BigQuery expects in JSON rows."""
+    if isinstance(value, (datetime.date, datetime.time)):
+        # Includes datetimes, which are dates.
+        return value.isoformat()
+    elif isinstance(value, decimal.Decimal):
+        return str(value)
+    elif isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    elif isinstance(value, dict):
+        return {k: json_value(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [json_value(v) for v in value]
+    return value
+
+
+def load_rows(client, table, rows, batch_size):
+    """Append rows, dicts of values by column name, to a table.
+
+    Each batch of ``batch_size`` rows is loaded by a job of its own, and
+    the jobs run one at a time, so if one fails, the batches before it
+    stay loaded.
+    """
+    from google.cloud.bigquery import LoadJobConfig, WriteDisposition
+
+    job_config = LoadJobConfig(
+        schema=table.schema, write_disposition=WriteDisposition.WRITE_APPEND
+    )
+    for start in range(0, len(rows), batch_size):
+        batch = [
+            {name: json_value(value) for name, value in row.items()}
+            for row in rows[start : start + batch_size]
+        ]
+        client.load_table_from_json(
+            batch, table.reference, job_config=job_config
+        ).result()
+    return len(rows)
+
+
+class InsertRowsError(dbapi.DatabaseError):
+    """Some of the rows of a streaming insert were rejected.
+
+    ``errors`` has a dict for every rejected row, with the ``index`` of the
+    row in the inserted parameters and the ``errors`` BigQuery reported
+    for it. The other ``rowcount`` rows were inserted.
+    """
+
+    def __init__(self, errors, rowcount):
+        super(InsertRowsError, self).__init__(
+            "{} rows were not inserted: {}".format(len(errors), errors)
+        )
+        self.errors = errors
+        self.rowcount = rowcount
+
+
+def row_id(index, row):
+    """An insertId derived from a row's position and values.
+
+    Running the same insert again, within BigQuery's deduplication window,
+    sends the same ids, so its rows are dropped. The row's position is part
+    of the id, so equal rows inserted together aren't mistaken for retries
+    of one another.
+    """
+    text = json.dumps([index, json_value(row)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def stream_rows(client, table, rows, batch_size, batch_bytes, row_ids=None):
+    """Stream rows, dicts of values by column name, into a table.
+
+    Rows are sent in insertAll requests of up to ``batch_size`` rows and
+    about ``batch_bytes`` of JSON. Invalid rows are skipped rather than
+    failing the rest of their request, and reported all at once at the
+    end, with an :class:`InsertRowsError`. The rows' insertIds are
+    ``row_ids``, or are random, so that requests retried by the client
+    aren't duplicated, but rows inserted again are.
+    """
+    json_rows = [
+        {name: json_value(value) for name, value in row.items()} for row in rows
+    ]
+    if row_ids is None:
+        row_ids = [uuid.uuid4().hex for _ in json_rows]
+    errors = []
+    start = 0
+    for batch in _streaming_batches(json_rows, batch_size, batch_bytes):
+        batch_errors = client.insert_rows_json(
+            table,
+            batch,
+            row_ids=row_ids[start : start + len(batch)],
+            skip_invalid_rows=True,
+        )
+        for error in batch_errors:
+            errors.append(dict(error, index=start + error["index"]))
+        start += len(batch)
+
+    if errors:
+        raise InsertRowsError(errors, len(rows) - len(errors))
+    return len(rows)
+
+
+def _streaming_batches(json_rows, max_rows, max_bytes):
+    batch = []
+    size = 0
+    for row in json_rows:
+        # The insertId and JSON framing add about 100 bytes per row.
+        row_size = 100 + len(json.dumps(row))
+        if batch and (len(batch) >= max_rows or size + row_size > max_bytes):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch
+
+
+def parameter_size(value):
+    """Estimate how many bytes a value adds to the JSON of a query parameter.
+
+    Each value comes wrapped in about 30 bytes of JSON, like
+    ``"c0": {"value": "..."}``, which is counted generously, so that
+    batches stay under the limit.
+    """
+    if isinstance(value, dict):
+        return 32 + sum(len(k) + parameter_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return 32 + sum(parameter_size(v) for v in value)
+    return 32 + len(json.dumps(json_value(value)))
+
+
+def parameter_batches(rows, max_bytes):
+    """Split rows into lists whose query parameters are up to max_bytes."""
+    batch = []
+    size = 0
+    for row in rows:
+        row_size = parameter_size(row)
+        if batch and size + row_size > max_bytes:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch
@@ -0,0 +1,211 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Gather single-row INSERTs from many threads into batches.
+
+Every INSERT query is a job of its own, which is slow, and counts
+against per-table DML quotas. The buffer collects rows by table, and a
+background thread appends each table's rows at once, when enough of
+them are waiting, or when the oldest of them has waited long enough.
+"""
+
+import atexit
+import concurrent.futures
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class _Batch(object):
+    def __init__(self, key, started):
+        self.key = key
+        self.started = started
+        self.rows = []
+        self.futures = []
+
+    def resolve(self, exc=None):
+        for future in self.futures:
+            # Futures cancelled by their caller can't be given a result.
+            if future.done():
+                continue
+            if exc is None:
+                future.set_result(None)
+            else:
+                future.set_exception(exc)
+
+
+class InsertBuffer(object):
+    """Buffer rows, and append them with ``flush(key, rows)`` in batches.
+
+    A table's rows are flushed once ``batch_size`` of them are buffered,
+    or ``interval`` seconds after the first of them was. At most
+    ``max_rows`` rows are held, including those being flushed; adding
+    more blocks until there's room.
+
+    Failed flushes are logged, and set on their rows' futures. So that
+    they aren't missed by callers that don't check the futures, the next
+    ``add()``, ``flush()`` or ``close()`` also raises an error, whose cause
+    is the latest failure. If the background thread fails, the rows it
+    holds fail with its error, and so does adding any more.
+    """
+
+    def __init__(self, flush, interval, batch_size, max_rows, timer=time.monotonic):
+        self._flush = flush
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self._timer = timer
+        self._pending = {}  # {key: _Batch}
+        self._flushing = []
+        self._size = 0
+        self._force = False
+        self._closed = False
+        self._error = None
+        self._flush_error = None
+        self._thread = None
+        self._changed = threading.Condition()
+
+    def add(self, key, row):
+        """Buffer a row, returning a future that's done once it's flushed."""
+        future = concurrent.futures.Future()
+        with self._changed:
+            while (
+                self._size >= self.max_rows and not self._closed and self._error is None
+            ):
+                self._changed.wait()
+            if self._error is not None:
+                raise ValueError("insert buffer failed") from self._error
+            self._raise_flush_error()
+            if self._closed:
+                raise ValueError("insert buffer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="pybigquery-insert-buffer", daemon=True
+                )
+                self._thread.start()
+                # Don't lose buffered rows when the interpreter exits.
+                atexit.register(self.close)
+
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _Batch(key, self._timer())
+                # So that the flusher waits for this batch's interval.
+                self._changed.notify_all()
+            batch.rows.append(row)
+            batch.futures.append(future)
+            self._size += 1
+            if len(batch.rows) >= self.batch_size:
+                self._changed.notify_all()
+        return future
+
+    def flush(self):
+        """Flush the buffered rows now, and wait until they're appended."""
+        with self._changed:
+            batches = list(self._pending.values()) + self._flushing
+            self._force = True
+            self._changed.notify_all()
+        concurrent.futures.wait(
+            [future for batch in batches for future in batch.futures]
+        )
+        with self._changed:
+            self._raise_flush_error()
+
+    def close(self):
+        """Flush the buffered rows, and stop the background thread."""
+        with self._changed:
+            self._closed = True
+            thread = self._thread
+            self._changed.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._changed:
+            self._raise_flush_error()
+
+    def _raise_flush_error(self):
+        # Called with the lock held. Each failure is raised once.
+        error, self._flush_error = self._flush_error, None
+        if error is not None:
+            raise ValueError("buffered rows failed to be appended") from error
+
+    def _take_due(self):
+        now = self._timer()
+        force = self._force or self._closed
+        self._force = False
+        due = [
+            batch
+            for batch in self._pending.values()
+            if force
+            or len(batch.rows) >= self.batch_size
+            or now - batch.started >= self.interval
+        ]
+        for batch in due:
+            del self._pending[batch.key]
+        return due
+
+    def _wait_time(self):
+        if self._pending:
+            oldest = min(batch.started for batch in self._pending.values())
+            return max(oldest + self.interval - self._timer(), 0)
+
+    def _run(self):
+        try:
+            self._flush_until_closed()
+        except BaseException as exc:
+            _logger.error("The insert buffer's thread failed", exc_info=True)
+            with self._changed:
+                self._error = exc
+                batches = list(self._pending.values()) + self._flushing
+                self._pending.clear()
+                self._flushing = []
+                self._changed.notify_all()
+            for batch in batches:
+                batch.resolve(exc)
+
+    def _flush_until_closed(self):
+        while True:
+            with self._changed:
+                due = self._take_due()
+                while not due:
+                    if self._closed:
+                        return
+                    self._changed.wait(self._wait_time())
+                    due = self._take_due()
+                self._flushing = due
+
+            for batch in due:
+                try:
+                    self._flush(batch.key, batch.rows)
+                except Exception as exc:
+                    _logger.error(
+                        "Failed to append %d buffered rows",
+                        len(batch.rows),
+                        exc_info=True,
+                    )
+                    with self._changed:
+                        self._flush_error = exc
+                    batch.resolve(exc)
+                else:
+                    batch.resolve()
+
+            with self._changed:
+                self._flushing = []
+                self._size -= sum(len(batch.rows) for batch in due)
+                self._changed.notify_all()
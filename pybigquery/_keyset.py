@@ -0,0 +1,96 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Load large IN lists into tables, so queries can semi-join against them.
+
+Query parameters count towards BigQuery's limit on the size of a query
+request, so lists of millions of keys can't be sent with the query.
+Instead, the keys are loaded into a table, which expires on its own in
+case it isn't deleted after the query, and the query selects from it.
+"""
+
+import base64
+import csv
+import datetime
+import io
+import uuid
+
+KEYSET_TABLE_PREFIX = "_pybigquery_keyset_"
+KEYSET_TABLE_LIFETIME = datetime.timedelta(hours=1)
+
+
+def _csv_value(value):
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _csv_file(keys):
+    data = io.BytesIO()
+    text = io.TextIOWrapper(data, encoding="utf-8", newline="")
+    # NULL can't match in IN, and can't be in an ARRAY parameter either.
+    csv.writer(text).writerows([_csv_value(key)] for key in keys if key is not None)
+    text.flush()
+    text.detach()
+    data.seek(0)
+    return data
+
+
+def upload_keyset(client, dataset_ref, field_type, keys):
+    """Load keys into a new table in the dataset and return its reference."""
+    from google.cloud import bigquery
+
+    table = bigquery.Table(
+        dataset_ref.table(KEYSET_TABLE_PREFIX + uuid.uuid4().hex),
+        schema=[bigquery.SchemaField("key", field_type)],
+    )
+    table.expires = datetime.datetime.now(datetime.timezone.utc) + KEYSET_TABLE_LIFETIME
+    table = client.create_table(table)
+    job_config = bigquery.LoadJobConfig(
+        schema=table.schema,
+        source_format=bigquery.SourceFormat.CSV,
+        allow_quoted_newlines=True,
+    )
+    try:
+        client.load_table_from_file(
+            _csv_file(keys), table.reference, job_config=job_config
+        ).result()
+    except Exception:
+        drop_keyset(client, table.reference)
+        raise
+    return table.reference
+
+
+def drop_keyset(client, table_ref):
+    """Delete a keyset table, leaving it to expire if that fails."""
+    import google.api_core.exceptions
+
+    try:
+        client.delete_table(table_ref, not_found_ok=True)
+    except google.api_core.exceptions.GoogleAPICallError:
+        pass
+
+
+def semi_join(table_ref):
+    """The subquery that replaces the array of keys in the query."""
+    return "(SELECT key FROM `{}.{}.{}`)".format(
+        table_ref.project, table_ref.dataset_id, table_ref.table_id
+    )
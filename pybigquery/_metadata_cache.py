@@ -0,0 +1,136 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Bounded, time-limited cache for table and dataset metadata."""
+
+import collections
+import threading
+import time
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"]
+)
+
+
+class MetadataCache(object):
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    A ``ttl`` of zero (or less) disables the cache: nothing is stored,
+    but lookups are still counted as misses so that the statistics
+    returned by :meth:`info` stay meaningful.
+    """
+
+    def __init__(self, maxsize=1000, ttl=0, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}  # {key: lock held while loading the key's value}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires, value = entry
+            if expires <= self._timer():
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_or_load(self, key, load):
+        """Get a value, or else set it to, and return, ``load()``.
+
+        Concurrent calls for the same missing key wait for a single
+        ``load()``, rather than each making their own.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            try:
+                if key in self:
+                    # Loaded while waiting.
+                    return self.get(key)
+                value = load()
+                self.set(key, value)
+                return value
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is loading:
+                        del self._loading[key]
+
+    def __contains__(self, key):
+        # Unlike get(), doesn't count as a hit or a miss.
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > self._timer()
+
+    def room(self):
+        """Return how many entries can be set without evicting any."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return max(self.maxsize - len(self._entries), 0)
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._timer() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(
+                self.hits,
+                self.misses,
+                self.evictions,
+                self.maxsize,
+                len(self._entries),
+            )
@@ -0,0 +1,115 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Read query results as NumPy arrays, a column at a time.
+
+Each column of an Arrow record batch becomes a NumPy array, without
+making a Python object of each value. Integer and floating-point
+columns share the batch's memory, even where values are missing, so
+they are read-only. Columns that allow NULL become masked arrays,
+masked where values are missing. Strings, numerics and other types
+that NumPy doesn't have become object arrays.
+"""
+
+import numpy
+import pyarrow.types
+
+
+def _values(array):
+    if array.null_count == 0:
+        return array.to_numpy(zero_copy_only=False)
+    if pyarrow.types.is_integer(array.type) or pyarrow.types.is_floating(array.type):
+        # The slots of missing values hold arbitrary numbers, which the
+        # mask hides, so the data buffer can be used as it is.
+        dtype = numpy.dtype(array.type.to_pandas_dtype())
+        data = numpy.frombuffer(array.buffers()[1], dtype, array.offset + len(array))
+        return data[array.offset :]
+    if pyarrow.types.is_boolean(array.type):
+        array = array.fill_null(False)
+    return array.to_numpy(zero_copy_only=False)
+
+
+def _mask(array):
+    if array.null_count == 0:
+        return numpy.zeros(len(array), bool)
+    return array.is_null().to_numpy(zero_copy_only=False)
+
+
+def nullable_columns(schema):
+    """Return the names of the columns of a BigQuery schema that allow NULL.
+
+    The Arrow schemas of query results say that every column does.
+    """
+    return {field.name for field in schema if field.mode == "NULLABLE"}
+
+
+def column_arrays(batch, nullable=None):
+    """Return the columns of a ``pyarrow.RecordBatch`` as a dict of NumPy
+    arrays, masked arrays for the ``nullable`` columns, by default those
+    whose Arrow fields are nullable."""
+    if nullable is None:
+        nullable = {field.name for field in batch.schema if field.nullable}
+    columns = {}
+    for field, array in zip(batch.schema, batch.columns):
+        values = _values(array)
+        if field.name in nullable:
+            values = numpy.ma.MaskedArray(values, mask=_mask(array))
+        columns[field.name] = values
+    return columns
+
+
+def _empty(array, size):
+    values = numpy.empty(size, array.dtype)
+    if numpy.ma.isMaskedArray(array):
+        values = numpy.ma.MaskedArray(values, mask=numpy.zeros(size, bool))
+    return values
+
+
+def _concatenate(arrays):
+    if numpy.ma.isMaskedArray(arrays[0]):
+        return numpy.ma.concatenate(arrays)
+    return numpy.concatenate(arrays)
+
+
+def concatenate(batches, total_rows=None):
+    """Join dicts of column arrays, as returned by :func:`column_arrays`.
+
+    If the total number of rows is known, each column is allocated once,
+    and filled in batch by batch. Otherwise, the batches are kept until
+    they can be concatenated.
+    """
+    if total_rows is None:
+        batches = list(batches)
+        if not batches:
+            return {}
+        return {name: _concatenate([b[name] for b in batches]) for name in batches[0]}
+
+    columns = {}
+    filled = 0
+    for batch in batches:
+        if not columns:
+            columns = {name: _empty(a, total_rows) for name, a in batch.items()}
+        size = len(next(iter(batch.values())))
+        for name, array in batch.items():
+            columns[name][filled : filled + size] = array
+        filled += size
+
+    if filled < total_rows:
+        columns = {name: column[:filled] for name, column in columns.items()}
+    return columns
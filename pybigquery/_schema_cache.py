@@ -0,0 +1,92 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Persistent, on-disk copies of table metadata.
+
+Each table is stored in its own file, as the API representation
+returned by ``client.get_table()``. Stored tables are only used while
+their ``lastModifiedTime`` matches the one BigQuery reports for them,
+which changes whenever a table's schema or options change.
+"""
+
+import json
+import os
+import tempfile
+import urllib.parse
+
+from google.cloud.bigquery.table import Table
+
+LAST_MODIFIED_QUERY = "SELECT table_id, last_modified_time FROM `{dataset}.__TABLES__`"
+
+
+def last_modified_times(client, dataset_ref):
+    """Get the last-modified times of all tables in a dataset with one query.
+
+    Returns a dictionary mapping table ids to milliseconds since the epoch.
+    """
+    query = LAST_MODIFIED_QUERY.format(
+        dataset="{}.{}".format(dataset_ref.project, dataset_ref.dataset_id)
+    )
+    return {
+        row["table_id"]: int(row["last_modified_time"])
+        for row in client.query(query).result()
+    }
+
+
+class SchemaCache(object):
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, table_ref):
+        # Project ids may contain colons, e.g. "example.com:project".
+        return os.path.join(
+            self.directory, urllib.parse.quote(str(table_ref), safe="") + ".json"
+        )
+
+    def load(self, table_ref, last_modified):
+        """Return the stored table, if it was stored at ``last_modified``."""
+        try:
+            with open(self._path(table_ref)) as f:
+                resource = json.load(f)
+        except (OSError, ValueError):
+            # Missing, or not a complete file we wrote.
+            return None
+
+        if int(resource.get("lastModifiedTime", -1)) != last_modified:
+            return None
+
+        return Table.from_api_repr(resource)
+
+    def save(self, table):
+        resource = table.to_api_repr()
+        if resource.get("lastModifiedTime") is None:
+            # Without a modification time, we could never tell it's current.
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first, so that concurrent readers
+        # never see a partially written table.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(resource, f)
+            os.replace(temp_path, self._path(table.reference))
+        except BaseException:
+            os.remove(temp_path)
+            raise
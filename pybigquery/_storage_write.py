@@ -0,0 +1,276 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Append rows with the BigQuery Storage Write API.
+
+The rows are written to a new stream as protocol buffers, built from the
+destination table's schema. Each request carries its offset in the
+stream, so a retried request can't append its rows twice.
+
+``PENDING`` streams are committed once all of the rows are written, so
+either all of them are inserted, or none. Rows written to ``COMMITTED``
+streams can be read as soon as each request is done.
+"""
+
+import datetime
+import json
+import re
+
+STREAM_TYPES = ("pending", "committed")
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _days(value):
+    if isinstance(value, str):
+        value = datetime.datetime.strptime(value, "%Y-%m-%d")
+    return value.toordinal() - _EPOCH.toordinal()
+
+
+# E.g. 2021-01-02 03:04:05.123456+01:00, or 2021-01-02T03:04:05Z.
+_TIMESTAMP = re.compile(
+    r"(\d{4}-\d\d-\d\d)(?:[T ](\d\d:\d\d:\d\d)(?:\.(\d{1,6}))?)?"
+    r"(Z|[+-]\d\d:?\d\d)?$"
+)
+
+
+def _parse_timestamp(value):
+    # datetime.fromisoformat() is missing before Python 3.7, and doesn't
+    # accept "Z" before 3.11.
+    match = _TIMESTAMP.match(value)
+    if match is None:
+        raise ValueError("Invalid TIMESTAMP: {!r}".format(value))
+    date, time, fraction, zone = match.groups()
+    parsed = datetime.datetime.strptime(
+        "{} {}".format(date, time or "00:00:00"), "%Y-%m-%d %H:%M:%S"
+    )
+    if fraction:
+        parsed = parsed.replace(microsecond=int(fraction.ljust(6, "0")))
+    if zone and zone != "Z":
+        offset = datetime.timedelta(hours=int(zone[1:3]), minutes=int(zone[-2:]))
+        parsed -= offset if zone[0] == "+" else -offset
+    return parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def _microseconds(value):
+    if isinstance(value, str):
+        value = _parse_timestamp(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return (value - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _string(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _json(value):
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+# {BigQuery type: (protocol buffer field type name, value conversion)}
+# See https://cloud.google.com/bigquery/docs/write-api#data_type_conversions
+_FIELD_TYPES = {
+    "STRING": ("TYPE_STRING", None),
+    "BYTES": ("TYPE_BYTES", None),
+    "INTEGER": ("TYPE_INT64", None),
+    "INT64": ("TYPE_INT64", None),
+    "FLOAT": ("TYPE_DOUBLE", None),
+    "FLOAT64": ("TYPE_DOUBLE", None),
+    "BOOLEAN": ("TYPE_BOOL", None),
+    "BOOL": ("TYPE_BOOL", None),
+    "NUMERIC": ("TYPE_STRING", _string),
+    "BIGNUMERIC": ("TYPE_STRING", _string),
+    "DATE": ("TYPE_INT32", _days),
+    "DATETIME": ("TYPE_STRING", _string),
+    "TIME": ("TYPE_STRING", _string),
+    "TIMESTAMP": ("TYPE_INT64", _microseconds),
+    "GEOGRAPHY": ("TYPE_STRING", _string),
+    "JSON": ("TYPE_STRING", _json),
+}
+
+
+def _describe(message, fields):
+    from google.protobuf import descriptor_pb2
+
+    FieldDescriptorProto = descriptor_pb2.FieldDescriptorProto
+    for number, field in enumerate(fields, 1):
+        field_proto = message.field.add(
+            name=field.name,
+            number=number,
+            label=FieldDescriptorProto.LABEL_REPEATED
+            if field.mode == "REPEATED"
+            else FieldDescriptorProto.LABEL_OPTIONAL,
+        )
+        if field.field_type in ("RECORD", "STRUCT"):
+            nested = message.nested_type.add(name="F{}".format(number))
+            _describe(nested, field.fields)
+            field_proto.type = FieldDescriptorProto.TYPE_MESSAGE
+            field_proto.type_name = nested.name
+        else:
+            try:
+                type_name, _ = _FIELD_TYPES[field.field_type]
+            except KeyError:
+                raise ValueError(
+                    "The Storage Write API can't write {} columns, like {}".format(
+                        field.field_type, field.name
+                    )
+                )
+            field_proto.type = FieldDescriptorProto.Type.Value(type_name)
+
+
+def row_descriptor(schema):
+    """A self-contained, proto2 message descriptor for rows of the schema."""
+    from google.protobuf import descriptor_pb2
+
+    message = descriptor_pb2.DescriptorProto(name="Row")
+    _describe(message, schema)
+    return message
+
+
+def row_class(descriptor):
+    """The message class for a descriptor returned by row_descriptor()."""
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(
+        descriptor_pb2.FileDescriptorProto(
+            name="pybigquery_row.proto",
+            package="pybigquery",
+            syntax="proto2",
+            message_type=[descriptor],
+        )
+    )
+    descriptor = pool.FindMessageTypeByName("pybigquery.Row")
+    if not hasattr(message_factory, "GetMessageClass"):
+        # protobuf 3, e.g. on Python 3.6.
+        return message_factory.MessageFactory(pool).GetPrototype(descriptor)
+    return message_factory.GetMessageClass(descriptor)
+
+
+def _set_fields(message, fields, row):
+    for field in fields:
+        value = row.get(field.name)
+        if value is None:
+            continue
+
+        if field.field_type in ("RECORD", "STRUCT"):
+            if field.mode == "REPEATED":
+                for item in value:
+                    _set_fields(getattr(message, field.name).add(), field.fields, item)
+            else:
+                _set_fields(getattr(message, field.name), field.fields, value)
+            continue
+
+        _, convert = _FIELD_TYPES[field.field_type]
+        if field.mode == "REPEATED":
+            getattr(message, field.name).extend(
+                [convert(v) for v in value] if convert else value
+            )
+        else:
+            setattr(message, field.name, convert(value) if convert else value)
+
+
+def serialize_rows(schema, row_class, rows):
+    """Serialize rows, dicts of values by column name, to protocol buffers."""
+    serialized = []
+    for row in rows:
+        message = row_class()
+        _set_fields(message, schema, row)
+        serialized.append(message.SerializeToString())
+    return serialized
+
+
+def _batches(serialized_rows, max_bytes):
+    batch = []
+    size = 0
+    for row in serialized_rows:
+        if batch and size + len(row) > max_bytes:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(row)
+        size += len(row)
+    if batch:
+        yield batch
+
+
+def write_rows(write_client, table, rows, stream_type, flush_bytes):
+    """Append rows, dicts of values by column name, to a table.
+
+    The rows are sent in requests of up to ``flush_bytes`` of serialized
+    rows, over a new stream of ``stream_type``, ``"pending"`` or
+    ``"committed"``.
+    """
+    import google.api_core.exceptions
+    from google.cloud.bigquery_storage_v1 import types, writer
+
+    parent = write_client.table_path(table.project, table.dataset_id, table.table_id)
+    stream = write_client.create_write_stream(
+        parent=parent,
+        write_stream=types.WriteStream(
+            type_=types.WriteStream.Type[stream_type.upper()]
+        ),
+    )
+
+    descriptor = row_descriptor(table.schema)
+    template = types.AppendRowsRequest(
+        write_stream=stream.name,
+        proto_rows=types.AppendRowsRequest.ProtoData(
+            writer_schema=types.ProtoSchema(proto_descriptor=descriptor)
+        ),
+    )
+    append_rows_stream = writer.AppendRowsStream(write_client, template)
+    try:
+        offset = 0
+        futures = []
+        serialized_rows = serialize_rows(table.schema, row_class(descriptor), rows)
+        for batch in _batches(serialized_rows, flush_bytes):
+            futures.append(
+                append_rows_stream.send(
+                    types.AppendRowsRequest(
+                        write_stream=stream.name,
+                        offset=offset,
+                        proto_rows=types.AppendRowsRequest.ProtoData(
+                            rows=types.ProtoRows(serialized_rows=batch)
+                        ),
+                    )
+                )
+            )
+            offset += len(batch)
+        for future in futures:
+            future.result()
+    finally:
+        append_rows_stream.close()
+
+    write_client.finalize_write_stream(name=stream.name)
+    if stream_type == "pending":
+        response = write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(
+                parent=parent, write_streams=[stream.name]
+            )
+        )
+        if response.stream_errors:
+            raise google.api_core.exceptions.BadRequest(
+                "Could not commit rows to {}".format(table.reference),
+                errors=list(response.stream_errors),
+            )
+    return len(rows)
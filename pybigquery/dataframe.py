@@ -0,0 +1,198 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Load pandas DataFrames and Arrow tables with load jobs, and read
+query results into DataFrames.
+
+``DataFrame.to_sql()`` inserts rows with INSERT statements. Instead, the
+data can be written to Parquet in memory, and loaded with a single load
+job, either directly with :func:`load_dataframe`, or by passing
+:func:`to_sql_method` to ``to_sql()``::
+
+    frame.to_sql("table", engine, if_exists="append", method=to_sql_method)
+
+The BigQuery types of the loaded columns come from the SQLAlchemy table,
+so they match what ``CREATE TABLE`` would create.
+
+Likewise, :func:`to_dataframe` builds a DataFrame from the Arrow results
+of a query, column by column, rather than from rows of Python objects,
+as ``pandas.read_sql()`` does.
+"""
+
+import io
+
+from sqlalchemy.engine import Engine
+
+# Columns of these types are cast to them, so that integers with missing
+# values, which pandas stores as floats, load into INT64 columns.
+_ARROW_TYPES = {
+    "INT64": "int64",
+    "FLOAT64": "float64",
+    "BOOL": "bool_",
+    "STRING": "string",
+}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("DataFrames require pyarrow")
+    return pyarrow
+
+
+def table_schema(dialect, table, column_names=None):
+    """The BigQuery schema of the named columns of a SQLAlchemy table.
+
+    Without ``column_names``, the schema has all of the table's columns.
+    """
+    from google.cloud.bigquery.schema import SchemaField
+
+    columns = {column.name: column for column in table.columns}
+    if column_names is None:
+        column_names = list(columns)
+    unknown = [name for name in column_names if name not in columns]
+    if unknown:
+        raise ValueError(
+            "{} has no columns named: {}".format(table.name, ", ".join(unknown))
+        )
+
+    schema = []
+    for name in column_names:
+        column = columns[name]
+        field_type = dialect.type_compiler.process(column.type)
+        mode = "NULLABLE" if column.nullable else "REQUIRED"
+        if field_type.startswith("ARRAY<"):
+            field_type = field_type[6:-1]
+            mode = "REPEATED"
+        schema.append(SchemaField(name, field_type, mode=mode))
+    return schema
+
+
+def _cast(pyarrow, data, schema):
+    for i, field in enumerate(schema):
+        type_name = _ARROW_TYPES.get(field.field_type)
+        if type_name is None or field.mode == "REPEATED":
+            continue
+        arrow_type = getattr(pyarrow, type_name)()
+        if data.schema.types[i] != arrow_type:
+            data = data.set_column(i, field.name, data.column(i).cast(arrow_type))
+    return data
+
+
+def load_dataframe(connection, table, data):
+    """Append a pandas DataFrame, or a ``pyarrow.Table``, to a table.
+
+    ``table`` is a SQLAlchemy table. The data's columns are matched to the
+    table's columns by name. Returns the number of rows loaded.
+    """
+    if isinstance(connection, Engine):
+        with connection.connect() as connection:
+            return load_dataframe(connection, table, data)
+
+    from google.cloud.bigquery import LoadJobConfig, SourceFormat, WriteDisposition
+
+    pyarrow = _import_pyarrow()
+    if not isinstance(data, pyarrow.Table):
+        data = pyarrow.Table.from_pandas(data, preserve_index=False)
+
+    dialect = connection.dialect
+    client = connection.connection._client
+    schema = table_schema(dialect, table, data.column_names)
+    data = _cast(pyarrow, data, schema)
+    job_config = LoadJobConfig(
+        source_format=SourceFormat.PARQUET,
+        schema=schema,
+        write_disposition=WriteDisposition.WRITE_APPEND,
+    )
+    if any(field.mode == "REPEATED" for field in schema):
+        # Load Parquet lists as arrays, rather than as records of lists.
+        from google.cloud.bigquery.format_options import ParquetOptions
+
+        parquet_options = ParquetOptions()
+        parquet_options.enable_list_inference = True
+        job_config.parquet_options = parquet_options
+
+    parquet = io.BytesIO()
+    pyarrow.parquet.write_table(
+        data,
+        parquet,
+        use_compliant_nested_type=True,
+        # BigQuery timestamps have microsecond precision.
+        coerce_timestamps="us",
+        allow_truncated_timestamps=True,
+    )
+    parquet.seek(0)
+
+    table_ref = dialect._table_reference(table.schema, table.name, client.project)
+    client.load_table_from_file(parquet, table_ref, job_config=job_config).result()
+    return data.num_rows
+
+
+def to_sql_method(pd_table, connection, keys, data_iter):
+    """Load the rows of ``DataFrame.to_sql()`` with :func:`load_dataframe`.
+
+    Pass it as ``to_sql()``'s ``method``. The DataFrame is converted to
+    Arrow column by column, rather than from ``to_sql()``'s rows, and the
+    first call loads all of it with one job, so a ``chunksize`` has no
+    effect: the calls for later chunks load nothing.
+    """
+    if getattr(pd_table, "_pybigquery_loaded", False):
+        return 0
+    pd_table._pybigquery_loaded = True
+
+    frame = pd_table.frame
+    if pd_table.index is not None:
+        frame = frame.rename_axis(pd_table.index).reset_index()
+    frame = frame.set_axis(keys, axis=1)
+    return load_dataframe(connection, pd_table.table, frame)
+
+
+def arrow_to_dataframe(table):
+    """Convert query results fetched as a ``pyarrow.Table`` to a DataFrame.
+
+    Integer and boolean columns get pandas' nullable ``Int64`` and
+    ``boolean`` dtypes. The table's memory is released as its columns are
+    converted, so the table can't be used afterwards.
+    """
+    import pandas
+
+    pyarrow = _import_pyarrow()
+    dtypes = {
+        pyarrow.int64(): pandas.Int64Dtype(),
+        pyarrow.bool_(): pandas.BooleanDtype(),
+    }
+    return table.to_pandas(
+        types_mapper=dtypes.get, split_blocks=True, self_destruct=True
+    )
+
+
+def to_dataframe(connection, statement, *multiparams, **params):
+    """Run a query, and return its results as a DataFrame.
+
+    Like ``pandas.read_sql(statement, connection)``, but the frame is built
+    from Arrow, column by column, with the dtypes of
+    :func:`arrow_to_dataframe`, and large results are read with the Storage
+    API.
+    """
+    if isinstance(connection, Engine):
+        with connection.connect() as connection:
+            return to_dataframe(connection, statement, *multiparams, **params)
+    return connection.execute(statement, *multiparams, **params).fetch_dataframe()
@@ -0,0 +1,114 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Load local CSV, newline-delimited JSON and Parquet files into tables.
+
+Like PostgreSQL's ``COPY ... FROM``, :func:`copy_from` hands a file to a
+load job as is, rather than parsing it in Python and inserting its rows::
+
+    with open("people.csv", "rb") as f:
+        stats = copy_from(engine, people, f, format="csv", header=True)
+"""
+
+import collections
+import os
+
+from sqlalchemy.engine import Engine
+
+from pybigquery.dataframe import table_schema
+
+LoadStatistics = collections.namedtuple(
+    "LoadStatistics",
+    ["job_id", "input_file_bytes", "output_rows", "output_bytes", "errors"],
+)
+
+FORMATS = {
+    "csv": "CSV",
+    "json": "NEWLINE_DELIMITED_JSON",
+    "ndjson": "NEWLINE_DELIMITED_JSON",
+    "newline_delimited_json": "NEWLINE_DELIMITED_JSON",
+    "parquet": "PARQUET",
+}
+
+
+def copy_from(
+    connection,
+    table,
+    source,
+    format="csv",
+    columns=None,
+    header=False,
+    max_bad_records=0,
+):
+    """Append a local file to a table with a load job.
+
+    ``table`` is a SQLAlchemy table, and ``source`` is a path or a file
+    opened in binary mode. The file is uploaded from its current position,
+    with a resumable upload, in chunks of 100 MB, so even large files
+    aren't read into memory at once. Its ``columns``, by default all of
+    the table's, are given the BigQuery types of the table's column types,
+    and values that don't fit them fail the load, unless there are no more
+    than ``max_bad_records`` of them. With ``header``, the first line of a
+    CSV file is skipped.
+
+    Returns the :class:`LoadStatistics` of the load job, once it's done.
+    """
+    from google.cloud.bigquery import LoadJobConfig, WriteDisposition
+
+    try:
+        source_format = FORMATS[format.lower()]
+    except KeyError:
+        raise ValueError("invalid format: {}".format(format))
+
+    if isinstance(connection, Engine):
+        with connection.connect() as connection:
+            return copy_from(
+                connection, table, source, format, columns, header, max_bad_records,
+            )
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file_obj:
+            return copy_from(
+                connection, table, file_obj, format, columns, header, max_bad_records,
+            )
+
+    dialect = connection.dialect
+    client = connection.connection._client
+    job_config = LoadJobConfig(
+        source_format=source_format,
+        schema=table_schema(dialect, table, columns),
+        write_disposition=WriteDisposition.WRITE_APPEND,
+        max_bad_records=max_bad_records,
+    )
+    if header:
+        if source_format != "CSV":
+            raise ValueError("header is only for CSV files")
+        job_config.skip_leading_rows = 1
+
+    table_ref = dialect._table_reference(table.schema, table.name, client.project)
+    # Without a size, the file is streamed with a resumable upload.
+    job = client.load_table_from_file(source, table_ref, job_config=job_config)
+    job.result()
+    return LoadStatistics(
+        job.job_id,
+        job.input_file_bytes,
+        job.output_rows,
+        job.output_bytes,
+        job.errors or [],
+    )
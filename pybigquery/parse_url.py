@@ -43,6 +43,16 @@ def parse_boolean(bool_string):
         raise ValueError()
 
 
+def parse_int(query, name):
+    """Pop an integer parameter from the url query, if it's there."""
+    if name in query:
+        str_value = query.pop(name)
+        try:
+            return int(str_value)
+        except ValueError:
+            raise ValueError("invalid int in url query {}: {}".format(name, str_value))
+
+
 def parse_url(url):  # noqa: C901
     query = url.query
 
@@ -66,8 +76,10 @@ def parse_url(url):  # noqa: C901
     project_id = url.host
     location = None
     dataset_id = url.database or None
-    arraysize = None
     credentials_path = None
+    schema_cache_dir = None
+    insert_mode = None
+    use_bqstorage = None
 
     # location
     if "location" in query:
@@ -77,13 +89,32 @@ def parse_url(url):  # noqa: C901
     if "credentials_path" in query:
         credentials_path = query.pop("credentials_path")
 
-    # arraysize
-    if "arraysize" in query:
-        str_arraysize = query.pop("arraysize")
+    # schema_cache_dir
+    if "schema_cache_dir" in query:
+        schema_cache_dir = query.pop("schema_cache_dir")
+
+    # insert_mode
+    if "insert_mode" in query:
+        insert_mode = query.pop("insert_mode")
+
+    # use_bqstorage
+    if "use_bqstorage" in query:
+        str_value = query.pop("use_bqstorage")
         try:
-            arraysize = int(str_arraysize)
+            use_bqstorage = parse_boolean(str_value)
         except ValueError:
-            raise ValueError("invalid int in url query arraysize: " + str_arraysize)
+            raise ValueError(
+                "invalid boolean in url query for use_bqstorage: " + str_value
+            )
+
+    # arraysize
+    arraysize = parse_int(query, "arraysize")
+
+    # HTTP connections of the client
+    http_pool_size = parse_int(query, "http_pool_size")
+    http_max_retries = parse_int(query, "http_max_retries")
+    http_keepalive = parse_int(query, "http_keepalive")
+    http_warmup = parse_int(query, "http_warmup")
 
     # if only these "non-config" values were present, the dict will now be empty
     if not query:
@@ -97,9 +128,30 @@ def parse_url(url):  # noqa: C901
                 arraysize,
                 credentials_path,
                 QueryJobConfig(),
+                schema_cache_dir,
+                http_pool_size,
+                http_max_retries,
+                http_keepalive,
+                http_warmup,
+                insert_mode,
+                use_bqstorage,
             )
         else:
-            return project_id, location, dataset_id, arraysize, credentials_path, None
+            return (
+                project_id,
+                location,
+                dataset_id,
+                arraysize,
+                credentials_path,
+                None,
+                schema_cache_dir,
+                http_pool_size,
+                http_max_retries,
+                http_keepalive,
+                http_warmup,
+                insert_mode,
+                use_bqstorage,
+            )
 
     job_config = QueryJobConfig()
 
@@ -239,4 +291,18 @@ def parse_url(url):  # noqa: C901
                 "invalid write_disposition in url query: " + query["write_disposition"]
             )
 
-    return project_id, location, dataset_id, arraysize, credentials_path, job_config
+    return (
+        project_id,
+        location,
+        dataset_id,
+        arraysize,
+        credentials_path,
+        job_config,
+        schema_cache_dir,
+        http_pool_size,
+        http_max_retries,
+        http_keepalive,
+        http_warmup,
+        insert_mode,
+        use_bqstorage,
+    )
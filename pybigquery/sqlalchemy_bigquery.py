@@ -22,21 +22,17 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import concurrent.futures
 from decimal import Decimal
 import random
 import operator
+import threading
 import uuid
-
-from google import auth
-import google.api_core.exceptions
-from google.cloud.bigquery import dbapi
-from google.cloud.bigquery.schema import SchemaField
-from google.cloud.bigquery.table import TableReference
-from google.api_core.exceptions import NotFound
+import weakref
 
 import sqlalchemy.sql.sqltypes
 import sqlalchemy.sql.type_api
-from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.exc import InvalidRequestError, NoSuchTableError
 from sqlalchemy import types, util
 from sqlalchemy.sql.compiler import (
     SQLCompiler,
@@ -47,15 +43,24 @@ from sqlalchemy.sql.compiler import (
 from sqlalchemy.sql.sqltypes import Integer, String, NullType, Numeric
 from sqlalchemy.engine.default import DefaultDialect, DefaultExecutionContext
 from sqlalchemy.engine.base import Engine
+from sqlalchemy.engine.result import ResultProxy
 from sqlalchemy.sql.schema import Column
 from sqlalchemy.sql import elements, selectable
 import re
 
-from .parse_url import parse_url
-from pybigquery import _helpers
+from pybigquery import _storage_write
+from pybigquery._insert_buffer import InsertBuffer
+from pybigquery._metadata_cache import MetadataCache
+
+# The google-cloud-bigquery modules (and this package's modules using them)
+# take long to import, so they're only imported when first needed, e.g.
+# not when a statement is just compiled.
 
 FIELD_ILLEGAL_CHARACTERS = re.compile(r"[^\w]+")
 
+# Date-sharded table names, like events_20210101.
+_shard_suffix = re.compile(r"^(.*_)\d{8}$").match
+
 
 class BigQueryIdentifierPreparer(IdentifierPreparer):
     """
@@ -137,7 +142,49 @@ NUMERIC = _type_map["NUMERIC"]
 BIGNUMERIC = _type_map["NUMERIC"]
 
 
+# How executemany INSERTs are run: with load jobs, a DML query with the
+# rows in an ARRAY<STRUCT> parameter, the Storage Write API, insertAll
+# streaming requests, or a DML query per row.
+INSERT_MODES = ("load", "unnest", "storage_write", "streaming", "dml")
+
+# The modes that append rows without a query, which the insert buffer uses.
+APPEND_MODES = ("load", "storage_write", "streaming")
+
+# Rough sizes of values, in bytes, to tell whether results are big enough
+# to be read with the Storage API without asking for their table's size.
+_VALUE_SIZES = {
+    "BIGNUMERIC": 32,
+    "BOOL": 1,
+    "BOOLEAN": 1,
+    "DATE": 8,
+    "DATETIME": 8,
+    "FLOAT": 8,
+    "FLOAT64": 8,
+    "INT64": 8,
+    "INTEGER": 8,
+    "NUMERIC": 16,
+    "TIME": 8,
+    "TIMESTAMP": 8,
+}
+# Strings, bytes, and the rest, are assumed to be short.
+_OTHER_VALUE_SIZE = 16
+
+
+def _estimate_row_size(fields):
+    # Repeated fields are counted as if they held a single value.
+    size = 0
+    for field in fields:
+        if field.fields:
+            size += _estimate_row_size(field.fields)
+        else:
+            size += _VALUE_SIZES.get(field.field_type, _OTHER_VALUE_SIZE)
+    return size
+
+
 class BigQueryExecutionContext(DefaultExecutionContext):
+    # The Storage API client to fetch results with, if they're large.
+    _bqstorage_client = None
+
     def create_cursor(self):
         # Set arraysize
         c = super(BigQueryExecutionContext, self).create_cursor()
@@ -152,35 +199,281 @@ class BigQueryExecutionContext(DefaultExecutionContext):
         elif isinstance(column.type, String):
             return str(uuid.uuid4())
 
-    def pre_exec(
-        self,
-        in_sub=re.compile(
-            r" IN UNNEST\(\[ "
-            r"(%\([^)]+_\d+\)s(?:, %\([^)]+_\d+\)s)*)?"  # Placeholders. See below.
-            r":([A-Z0-9]+)"  # Type
-            r" \]\)"
-        ).sub,
-    ):
-        # If we have an in parameter, it sometimes gets expaned to 0 or more
-        # parameters and we need to move the type marker to each
-        # parameter.
-        # (The way SQLAlchemy handles this is a bit awkward for our
-        # purposes.)
-
-        # In the placeholder part of the regex above, the `_\d+
-        # suffixes refect that when an array parameter is expanded,
-        # numeric suffixes are added.  For example, a placeholder like
-        # `%(foo)s` gets expaneded to `%(foo_0)s, `%(foo_1)s, ...`.
-
-        def repl(m):
-            placeholders, type_ = m.groups()
-            if placeholders:
-                placeholders = placeholders.replace(")", f":{type_})")
-            else:
-                placeholders = ""
-            return f" IN UNNEST([ {placeholders} ])"
+    def _is_plain_insert(self):
+        """Whether the statement inserts column values, and nothing else,
+        so that its rows can be appended without a query."""
+        compiled = self.compiled
+        if compiled is None or not self.isinsert:
+            return False
+
+        # INSERT ... SELECT, and inserts of SQL expressions or defaults,
+        # need a query.
+        statement = compiled.statement
+        columns = statement.table.c
+        return not (
+            statement.select is not None
+            or statement.parameters
+            or compiled.returning
+            or compiled.postfetch
+            or not all(key in columns for key in compiled.binds)
+        )
+
+    def _bulk_insert_mode(self):
+        mode = self.execution_options.get(
+            "bigquery_insert_mode", self.dialect.insert_mode
+        )
+        self.dialect._check_insert_mode(mode)
+        if mode == "dml" or not self._is_plain_insert():
+            return "dml"
+        compiled = self.compiled
+        columns = compiled.statement.table.c
+        if mode == "unnest" and any(
+            isinstance(columns[key].type, NullType) for key in compiled.binds
+        ):
+            # The parameter needs the type of every column.
+            return "dml"
+        return mode
+
+    def _column_rows(self, parameters):
+        # Parameters are keyed by column key, rows by column name.
+        columns = self.compiled.statement.table.c
+        return [
+            {columns[key].name: value for key, value in row.items()}
+            for row in parameters
+        ]
+
+    def _append_rows(self, cursor, parameters, mode):
+        table = self.compiled.statement.table
+        cursor.rowcount = self.dialect._append_to_table(
+            cursor.connection._client,
+            table.schema,
+            table.name,
+            self._column_rows(parameters),
+            mode,
+        )
+
+    def _buffer_insert(self, cursor, parameters):
+        """Add a single-row INSERT to the dialect's insert buffer.
+
+        The future of the row's flush is kept as ``insert_future``, which
+        is available from results as ``result.context.insert_future``.
+        """
+        buffer = self.dialect.insert_buffer
+        if buffer is None or not self.execution_options.get(
+            "bigquery_buffer_inserts", True
+        ):
+            return False
+
+        # Rows are appended with the statement's insert mode, so e.g.
+        # bigquery_insert_mode='dml' runs an INSERT query after all.
+        mode = self.execution_options.get(
+            "bigquery_insert_mode", self.dialect.insert_mode
+        )
+        self.dialect._check_insert_mode(mode)
+        if mode not in APPEND_MODES or not self._is_plain_insert():
+            return False
+
+        table = self.compiled.statement.table
+        key = (cursor.connection._client, table.schema, table.name, mode)
+        [row] = self._column_rows([parameters])
+        self.insert_future = buffer.add(key, row)
+        cursor.rowcount = 1
+        return True
+
+    def _insert_unnest(self, cursor, parameters):
+        from pybigquery import _insert
+
+        compiled = self.compiled
+        table = compiled.statement.table
+        columns = [table.c[key] for key in compiled.binds]
+        preparer = self.dialect.identifier_preparer
+        # The struct fields are matched to the columns by position.
+        fields = ["c{}".format(i) for i in range(len(columns))]
+        statement = (
+            "INSERT INTO {} ({}) SELECT * FROM UNNEST(%(rows:ARRAY<STRUCT<{}>>)s)"
+        ).format(
+            preparer.format_table(table),
+            ", ".join(preparer.format_column(column) for column in columns),
+            ", ".join(
+                "{} {}".format(field, self.dialect.type_compiler.process(column.type))
+                for field, column in zip(fields, columns)
+            ),
+        )
+        rows = [
+            {field: row[key] for field, key in zip(fields, compiled.binds)}
+            for row in parameters
+        ]
+        rowcount = 0
+        for batch in _insert.parameter_batches(rows, _insert.MAX_QUERY_PARAMETER_BYTES):
+            cursor.execute(statement, {"rows": batch})
+            rowcount += cursor.rowcount
+        cursor.rowcount = rowcount
+
+    def pre_exec(self):
+        if (
+            self.execution_options.get("bigquery_use_bqstorage")
+            and not self.dialect._dbapi_keeps_query_rows
+        ):
+            raise InvalidRequestError(
+                "bigquery_use_bqstorage requires google-cloud-bigquery 3.17 or later"
+            )
+
+        # IN lists are compiled as ARRAY parameters. Large ones are loaded
+        # into tables and semi-joined instead. See _keyset.
+        self._keysets = []
+        in_arrays = getattr(self.compiled, "in_arrays", None)
+        if not (in_arrays and len(self.parameters) == 1):
+            return
+
+        threshold = self.dialect.keyset_threshold
+        parameters = dict(self.parameters[0])
+        try:
+            for array, (name, field_type) in in_arrays.items():
+                keys = parameters[name]
+                if keys is not None and None in keys:
+                    self._bind_elements(array, name, field_type, keys, parameters)
+                elif threshold and keys is not None and len(keys) >= threshold:
+                    self._semi_join_keyset(array, name, field_type, keys, parameters)
+        except Exception:
+            self._drop_keysets()
+            raise
+        self.parameters = self.dialect.execute_sequence_format([parameters])
+
+    def _bind_elements(self, array, name, field_type, values, parameters):
+        # BigQuery rejects ARRAY parameters with NULL elements, so such
+        # lists get a parameter per element, like SQLAlchemy's expanding
+        # parameters. Leaving the NULLs out would change what NOT IN means.
+        placeholders = []
+        for i, value in enumerate(values, 1):
+            element = "{}_{}".format(name, i)
+            parameters[element] = value
+            placeholders.append("%({}:{})s".format(element, field_type))
+        del parameters[name]
+        self.statement = self.statement.replace(
+            array, "UNNEST([ {} ])".format(", ".join(placeholders))
+        )
+
+    def _semi_join_keyset(self, array, name, field_type, keys, parameters):
+        from pybigquery import _keyset
+
+        client = self._dbapi_connection._client
+        table_ref = _keyset.upload_keyset(
+            client, self.dialect._keyset_dataset_ref(client), field_type, keys,
+        )
+        self._keysets.append(table_ref)
+        self.statement = self.statement.replace(array, _keyset.semi_join(table_ref))
+        del parameters[name]
+
+    def _drop_keysets(self):
+        if self._keysets:
+            from pybigquery import _keyset
+
+            client = self._dbapi_connection._client
+            for table_ref in self._keysets:
+                _keyset.drop_keyset(client, table_ref)
+            self._keysets = []
+
+    def post_exec(self):
+        self._drop_keysets()
+        self._choose_result_api()
+
+    def _choose_result_api(self):
+        """Read large results with the Storage API, and others with the
+        REST API, which is quicker to start."""
+        cursor = self.cursor
+        use_bqstorage = self.execution_options.get(
+            "bigquery_use_bqstorage", self.dialect.use_bqstorage
+        )
+        # Older DB-APIs fetch rows as soon as they run queries, and choose
+        # the API themselves.
+        rows = getattr(cursor, "_query_rows", None)
+        if rows is None or cursor.connection._bqstorage_client is None:
+            return
+
+        if use_bqstorage is None:
+            use_bqstorage = self.dialect._is_large_result(rows)
+        if use_bqstorage:
+            self._bqstorage_client = cursor.connection._bqstorage_client
+        else:
+            # The DB-API cursor uses the Storage API whenever it can.
+            # Rows are only iterated once fetched, so that they can be
+            # fetched as Arrow instead.
+            cursor._query_data = _iterate(rows)
+
+    def handle_dbapi_exception(self, e):
+        self._drop_keysets()
 
-        self.statement = in_sub(repl, self.statement)
+    def get_result_proxy(self):
+        return BigQueryResultProxy(self)
+
+
+def _iterate(rows):
+    for row in rows:
+        yield row
+
+
+class BigQueryResultProxy(ResultProxy):
+    """Results that can also be fetched as Arrow or NumPy arrays, straight
+    from the query results, without making Python objects of their values."""
+
+    def _query_rows(self):
+        rows = getattr(self.cursor, "_query_rows", None)
+        if rows is None or not hasattr(rows, "to_arrow_iterable"):
+            raise InvalidRequestError(
+                "Results can only be fetched as Arrow from queries"
+                " run with google-cloud-bigquery 3.17 or later"
+            )
+        return rows
+
+    def fetch_arrow(self):
+        """Fetch all of the rows as a ``pyarrow.Table``."""
+        table = self._query_rows().to_arrow(
+            bqstorage_client=self.context._bqstorage_client,
+            create_bqstorage_client=False,
+        )
+        self._soft_close()
+        return table
+
+    def fetch_dataframe(self):
+        """Fetch all of the rows as a pandas DataFrame, built from Arrow."""
+        from pybigquery import dataframe
+
+        return dataframe.arrow_to_dataframe(self.fetch_arrow())
+
+    def fetch_arrow_batches(self, max_rows=None):
+        """Iterate over the rows as ``pyarrow.RecordBatch`` objects of at
+        most ``max_rows`` rows."""
+        batches = self._query_rows().to_arrow_iterable(
+            bqstorage_client=self.context._bqstorage_client
+        )
+        for batch in batches:
+            if max_rows is None:
+                yield batch
+                continue
+            # Slices share the batch's memory.
+            for offset in range(0, batch.num_rows, max_rows):
+                yield batch.slice(offset, max_rows)
+        self._soft_close()
+
+    def fetch_numpy(self):
+        """Fetch all of the rows as a dict of NumPy arrays, one per column.
+
+        The arrays are allocated from the number of rows the query job
+        reports, and filled in a batch at a time.
+        """
+        from pybigquery import _numpy
+
+        total_rows = self._query_rows().total_rows
+        return _numpy.concatenate(self.fetch_numpy_batches(), total_rows)
+
+    def fetch_numpy_batches(self, max_rows=None):
+        """Iterate over the rows as dicts of NumPy arrays, one per column,
+        of at most ``max_rows`` rows."""
+        from pybigquery import _numpy
+
+        nullable = _numpy.nullable_columns(self._query_rows().schema)
+        for batch in self.fetch_arrow_batches(max_rows):
+            yield _numpy.column_arrays(batch, nullable)
 
 
 class BigQueryCompiler(SQLCompiler):
@@ -189,6 +482,8 @@ class BigQueryCompiler(SQLCompiler):
     compound_keywords[selectable.CompoundSelect.UNION] = "UNION ALL"
 
     def __init__(self, dialect, statement, column_keys=None, inline=False, **kwargs):
+        # {"UNNEST(<placeholder>)": (parameter name, BigQuery item type)}
+        self.in_arrays = {}
         if isinstance(statement, Column):
             kwargs["compile_kwargs"] = util.immutabledict({"include_table": False})
         super(BigQueryCompiler, self).__init__(
@@ -256,27 +551,48 @@ class BigQueryCompiler(SQLCompiler):
     # Due to details in the way sqlalchemy arranges the compilation we
     # expect the bind parameter as an array and unnest it.
 
-    # As it happens, bigquery can handle arrays directly, but there's
-    # no way to tell sqlalchemy that, so it works harder than
-    # necessary and makes us do the same.
+    # BigQuery can handle arrays directly, so when we know the type of
+    # the elements, we pass the whole sequence as a single ARRAY
+    # parameter, rather than let sqlalchemy expand it into a parameter
+    # per element. Otherwise, the parameters sqlalchemy expands go in
+    # an array literal.
 
-    _in_expanding_bind = re.compile(r" IN \((\[EXPANDING_\w+\](:[A-Z0-9]+)?)\)$")
+    _in_expanding_bind = re.compile(r" IN \((\[EXPANDING_\w+\])\)$")
 
     def _unnestify_in_expanding_bind(self, in_text):
         return self._in_expanding_bind.sub(r" IN UNNEST([ \1 ])", in_text)
 
-    def visit_in_op_binary(self, binary, operator_, **kw):
+    def _generate_in_binary(self, binary, opstring, **kw):
+        right = binary.right
+        if (
+            isinstance(right, elements.BindParameter)
+            and right.expanding
+            and not isinstance(right.type, NullType)
+            and not kw.get("literal_binds")
+        ):
+            right = right._clone()
+            right.expanding = False
+            right.type = types.ARRAY(right.type)
+            left = binary.left._compiler_dispatch(self, **kw)
+            array = "UNNEST({})".format(right._compiler_dispatch(self, **kw))
+            self.in_arrays[array] = (
+                self.bind_names[right],
+                self.dialect.type_compiler.process(right.type.item_type),
+            )
+            return left + opstring + array
+
         return self._unnestify_in_expanding_bind(
-            self._generate_generic_binary(binary, " IN ", **kw)
+            self._generate_generic_binary(binary, opstring, **kw)
         )
 
+    def visit_in_op_binary(self, binary, operator_, **kw):
+        return self._generate_in_binary(binary, " IN ", **kw)
+
     def visit_empty_set_expr(self, element_types):
         return ""
 
     def visit_notin_op_binary(self, binary, operator, **kw):
-        return self._unnestify_in_expanding_bind(
-            self._generate_generic_binary(binary, " NOT IN ", **kw)
-        )
+        return self._generate_in_binary(binary, " NOT IN ", **kw)
 
     ############################################################################
 
@@ -344,7 +660,7 @@ class BigQueryCompiler(SQLCompiler):
         )
 
         type_ = bindparam.type
-        if isinstance(type_, NullType):
+        if literal_binds or isinstance(type_, NullType):
             return param
 
         if (
@@ -522,6 +838,33 @@ class BQArray(sqlalchemy.sql.sqltypes.ARRAY):
 
         return process_array_literal
 
+    def bind_processor(self, dialect):
+        item_processor = self.item_type._cached_bind_processor(dialect)
+        if item_processor is None:
+            return None
+
+        def process_array_value(value):
+            if value is None:
+                return None
+            return [item_processor(v) for v in value]
+
+        return process_array_value
+
+
+class _ShardFamily(object):
+    """A family of date-sharded tables, as listed by get_table_names."""
+
+    def __init__(self, shard, table_id):
+        from google.cloud.bigquery.dataset import DatasetReference
+        from google.cloud.bigquery.table import TableReference
+
+        self.shard = shard  # The newest shard
+        self.table_id = table_id
+        self.table_type = shard.table_type
+        self.reference = TableReference(
+            DatasetReference(shard.project, shard.dataset_id), table_id
+        )
+
 
 class BigQueryDialect(DefaultDialect):
     name = "bigquery"
@@ -564,6 +907,33 @@ class BigQueryDialect(DefaultDialect):
         credentials_path=None,
         location=None,
         credentials_info=None,
+        metadata_cache_ttl=0,
+        metadata_cache_size=1000,
+        bulk_reflection=False,
+        metadata_max_workers=8,
+        schema_cache_dir=None,
+        prefetch_tables=False,
+        collapse_sharded_tables=False,
+        background_token_refresh=False,
+        http_pool_size=None,
+        http_max_retries=None,
+        http_keepalive=None,
+        http_warmup=None,
+        keyset_threshold=None,
+        keyset_dataset=None,
+        insert_mode="dml",
+        load_batch_size=10000,
+        storage_write_stream_type="pending",
+        storage_write_flush_bytes=8 * 1024 * 1024,
+        streaming_batch_size=500,
+        streaming_batch_bytes=8 * 1024 * 1024,
+        streaming_content_ids=False,
+        insert_buffer_interval=None,
+        insert_buffer_size=500,
+        insert_buffer_max_rows=10000,
+        use_bqstorage=None,
+        bqstorage_min_rows=100000,
+        bqstorage_min_bytes=100 * 1024 * 1024,
         *args,
         **kwargs,
     ):
@@ -573,9 +943,61 @@ class BigQueryDialect(DefaultDialect):
         self.credentials_info = credentials_info
         self.location = location
         self.dataset_id = None
+        self.metadata_cache = MetadataCache(
+            maxsize=metadata_cache_size, ttl=metadata_cache_ttl
+        )
+        if bulk_reflection and not self.metadata_cache.enabled:
+            # The dataset snapshot needs to outlive the Inspector that
+            # reflects a single table.
+            raise ValueError("bulk_reflection requires metadata_cache_ttl to be set")
+        self.bulk_reflection = bulk_reflection
+        if prefetch_tables and not self.metadata_cache.enabled:
+            raise ValueError("prefetch_tables requires metadata_cache_ttl to be set")
+        self.prefetch_tables = prefetch_tables
+        self.collapse_sharded_tables = collapse_sharded_tables
+        self.background_token_refresh = background_token_refresh
+        self.credentials_cache = None  # Set by create_connect_args.
+        self.http_pool_size = http_pool_size
+        self.http_max_retries = http_max_retries
+        self.http_keepalive = http_keepalive
+        self.http_warmup = http_warmup
+        self.keyset_threshold = keyset_threshold
+        self.keyset_dataset = keyset_dataset
+        self.insert_mode = self._check_insert_mode(insert_mode)
+        self.load_batch_size = load_batch_size
+        if storage_write_stream_type not in _storage_write.STREAM_TYPES:
+            raise ValueError(
+                "invalid storage_write_stream_type: {}".format(
+                    storage_write_stream_type
+                )
+            )
+        self.storage_write_stream_type = storage_write_stream_type
+        self.storage_write_flush_bytes = storage_write_flush_bytes
+        self.streaming_batch_size = streaming_batch_size
+        self.streaming_batch_bytes = streaming_batch_bytes
+        self.streaming_content_ids = streaming_content_ids
+        self.insert_buffer = None
+        if insert_buffer_interval is not None:
+            self.insert_buffer = InsertBuffer(
+                self._flush_insert_buffer,
+                insert_buffer_interval,
+                insert_buffer_size,
+                insert_buffer_max_rows,
+            )
+        self._write_client = None
+        self._write_client_lock = threading.Lock()
+        self.use_bqstorage = use_bqstorage
+        self._dbapi_keeps_query_rows = False
+        self.bqstorage_min_rows = bqstorage_min_rows
+        self.bqstorage_min_bytes = bqstorage_min_bytes
+        self.metadata_max_workers = metadata_max_workers
+        self.schema_cache_dir = schema_cache_dir
+        self.schema_cache = None
 
     @classmethod
     def dbapi(cls):
+        from google.cloud.bigquery import dbapi
+
         return dbapi
 
     @staticmethod
@@ -583,17 +1005,22 @@ class BigQueryDialect(DefaultDialect):
         """Build '<dataset_id>.<table_id>' string using given table."""
         return "{}.{}".format(table.reference.dataset_id, table.table_id)
 
-    @staticmethod
-    def _add_default_dataset_to_job_config(job_config, project_id, dataset_id):
+    def _add_default_dataset_to_job_config(self, job_config, project_id, dataset_id):
         # If dataset_id is set, then we know the job_config isn't None
         if dataset_id:
-            # If project_id is missing, use default project_id for the current environment
+            # If project_id is missing, use the default project_id of the
+            # credentials, which the client is going to load anyway.
             if not project_id:
-                _, project_id = auth.default()
+                _, project_id = self.credentials_cache.get(
+                    self.credentials_info, self.credentials_path
+                )
 
             job_config.default_dataset = "{}.{}".format(project_id, dataset_id)
 
     def create_connect_args(self, url):
+        from pybigquery import _helpers, _schema_cache
+        from pybigquery.parse_url import parse_url
+
         (
             project_id,
             location,
@@ -601,12 +1028,59 @@ class BigQueryDialect(DefaultDialect):
             arraysize,
             credentials_path,
             default_query_job_config,
+            schema_cache_dir,
+            http_pool_size,
+            http_max_retries,
+            http_keepalive,
+            http_warmup,
+            insert_mode,
+            use_bqstorage,
         ) = parse_url(url)
 
         self.arraysize = self.arraysize or arraysize
         self.location = location or self.location
         self.credentials_path = credentials_path or self.credentials_path
         self.dataset_id = dataset_id
+        # E.g. http_max_retries=0 in the URL turns retries off.
+        if http_pool_size is not None:
+            self.http_pool_size = http_pool_size
+        if http_max_retries is not None:
+            self.http_max_retries = http_max_retries
+        if http_keepalive is not None:
+            self.http_keepalive = http_keepalive
+        if http_warmup is not None:
+            self.http_warmup = http_warmup
+        self.insert_mode = self._check_insert_mode(insert_mode or self.insert_mode)
+        if self.insert_buffer is not None and self.insert_mode not in APPEND_MODES:
+            raise ValueError(
+                "insert_buffer_interval requires insert_mode to be one of: {}".format(
+                    ", ".join(APPEND_MODES)
+                )
+            )
+        if use_bqstorage is not None:
+            self.use_bqstorage = use_bqstorage
+        self._dbapi_keeps_query_rows = _helpers.dbapi_keeps_query_rows()
+        if self.use_bqstorage and not self._dbapi_keeps_query_rows:
+            # Older DB-APIs choose between the APIs by themselves.
+            raise ValueError(
+                "use_bqstorage requires google-cloud-bigquery 3.17 or later"
+            )
+        self._dbapi_keeps_query_rows = False
+        self.schema_cache_dir = schema_cache_dir or self.schema_cache_dir
+        if self.schema_cache_dir:
+            if not self.metadata_cache.enabled:
+                raise ValueError(
+                    "schema_cache_dir requires metadata_cache_ttl to be set"
+                )
+            self.schema_cache = _schema_cache.SchemaCache(self.schema_cache_dir)
+        if self.keyset_threshold and not (self.keyset_dataset or dataset_id):
+            raise ValueError(
+                "keyset_threshold requires keyset_dataset or a default dataset"
+            )
+        if self.credentials_cache is None:
+            # Stop refreshing tokens once the engine is gone.
+            self.credentials_cache = _helpers.CredentialsCache()
+            weakref.finalize(self, self.credentials_cache.clear)
         self._add_default_dataset_to_job_config(
             default_query_job_config, project_id, dataset_id
         )
@@ -616,8 +1090,121 @@ class BigQueryDialect(DefaultDialect):
             project_id=project_id,
             location=self.location,
             default_query_job_config=default_query_job_config,
+            background_token_refresh=self.background_token_refresh,
+            http_pool_size=self.http_pool_size,
+            http_max_retries=self.http_max_retries,
+            http_keepalive=self.http_keepalive,
+            credentials_cache=self.credentials_cache,
         )
-        return ([client], {})
+        # create_connect_args is called once per engine, so every DB-API
+        # connection in the pool shares these (thread-safe) clients, and
+        # their credentials and HTTP connections.
+        bqstorage_client = _helpers.create_bigquery_storage_client(client)
+        if bqstorage_client is None and self.use_bqstorage:
+            raise ImportError("use_bqstorage requires google-cloud-bigquery-storage")
+        return ([client, bqstorage_client], {})
+
+    def _is_large_result(self, rows):
+        """Whether query results are big enough to be worth reading with
+        the Storage API."""
+        total_rows = rows.total_rows or 0
+        if total_rows >= self.bqstorage_min_rows:
+            return True
+        if total_rows <= (self.arraysize or 0):
+            # They fit in a single page.
+            return False
+
+        # Fewer, but maybe wide, rows. Their size is estimated from the
+        # schema, rather than fetched with another request.
+        size = total_rows * _estimate_row_size(rows.schema)
+        return size >= self.bqstorage_min_bytes
+
+    @staticmethod
+    def _check_insert_mode(insert_mode):
+        if insert_mode not in INSERT_MODES:
+            raise ValueError("invalid insert_mode: {}".format(insert_mode))
+        return insert_mode
+
+    def do_executemany(self, cursor, statement, parameters, context=None):
+        mode = "dml" if context is None else context._bulk_insert_mode()
+        if mode in APPEND_MODES:
+            context._append_rows(cursor, parameters, mode)
+        elif mode == "unnest":
+            context._insert_unnest(cursor, parameters)
+        else:
+            super(BigQueryDialect, self).do_executemany(
+                cursor, statement, parameters, context
+            )
+
+    def _append_to_table(self, client, schema, table_name, rows, mode, row_ids=None):
+        """Append rows, dicts of values by column name, without a query.
+
+        ``row_ids`` are the insertIds of streamed rows, which are random by
+        default, or derived from the rows with ``streaming_content_ids``.
+        """
+        import google.api_core.exceptions
+        from pybigquery import _insert
+
+        try:
+            bq_table = self._get_client_table(client, table_name, schema)
+            if mode == "load":
+                return _insert.load_rows(client, bq_table, rows, self.load_batch_size)
+            elif mode == "streaming":
+                if row_ids is None and self.streaming_content_ids:
+                    row_ids = [
+                        _insert.row_id(index, row) for index, row in enumerate(rows)
+                    ]
+                return _insert.stream_rows(
+                    client,
+                    bq_table,
+                    rows,
+                    self.streaming_batch_size,
+                    self.streaming_batch_bytes,
+                    row_ids,
+                )
+            else:
+                return _storage_write.write_rows(
+                    self._storage_write_client(client),
+                    bq_table,
+                    rows,
+                    self.storage_write_stream_type,
+                    self.storage_write_flush_bytes,
+                )
+        except google.api_core.exceptions.GoogleAPICallError as exc:
+            raise self.dbapi.DatabaseError(exc)
+
+    def _flush_insert_buffer(self, key, rows):
+        # Called from the insert buffer's thread.
+        client, schema, table_name, mode = key
+        # Even with streaming_content_ids: every flush numbers its rows from
+        # 0, so ids derived from the rows would have equal rows of different
+        # flushes dropped as retries.
+        row_ids = [uuid.uuid4().hex for _ in rows]
+        self._append_to_table(client, schema, table_name, rows, mode, row_ids)
+
+    def _storage_write_client(self, client):
+        # Created on first use, then shared like the other clients.
+        with self._write_client_lock:
+            if self._write_client is None:
+                from pybigquery import _helpers
+
+                self._write_client = _helpers.create_bigquery_write_client(client)
+            return self._write_client
+
+    def _keyset_dataset_ref(self, client):
+        """The dataset that large IN lists are loaded into."""
+        from google.cloud.bigquery.dataset import DatasetReference
+
+        return DatasetReference.from_string(
+            self.keyset_dataset or self.dataset_id, default_project=client.project
+        )
+
+    def initialize(self, connection):
+        super(BigQueryDialect, self).initialize(connection)
+        if self.http_warmup:
+            from pybigquery import _helpers
+
+            _helpers.warm_up_client(connection.connection._client, self.http_warmup)
 
     def _json_deserializer(self, row):
         """JSON deserializer for RECORD types.
@@ -628,6 +1215,8 @@ class BigQueryDialect(DefaultDialect):
         return row
 
     def _get_table_or_view_names(self, connection, table_type, schema=None):
+        import google.api_core.exceptions
+
         current_schema = schema or self.dataset_id
         get_table_name = (
             self._build_formatted_table_id
@@ -636,26 +1225,121 @@ class BigQueryDialect(DefaultDialect):
         )
 
         client = connection.connection._client
-        datasets = client.list_datasets()
-
-        result = []
-        for dataset in datasets:
-            if current_schema is not None and current_schema != dataset.dataset_id:
-                continue
+        if current_schema is not None:
+            # No need to look at every dataset in the project.
+            dataset_refs = [self._dataset_reference(current_schema, client.project)]
+        else:
+            dataset_refs = [d.reference for d in self._list_datasets(client)]
 
+        def list_tables(dataset_ref):
             try:
-                tables = client.list_tables(dataset.reference)
-                for table in tables:
-                    if table_type == table.table_type:
-                        result.append(get_table_name(table))
+                return self._list_tables(client, dataset_ref)
             except google.api_core.exceptions.NotFound:
                 # It's possible that the dataset was deleted between when we
                 # fetched the list of datasets and when we try to list the
                 # tables from it. See:
                 # https://github.com/googleapis/python-bigquery-sqlalchemy/issues/105
-                pass
+                return []
+
+        result = []
+        table_refs = []
+        for tables in self._map_concurrently(list_tables, dataset_refs):
+            tables = [table for table in tables if table_type == table.table_type]
+            if self.collapse_sharded_tables:
+                tables = self._collapse_shards(tables)
+            for table in tables:
+                result.append(get_table_name(table))
+                table_refs.append(table.reference)
+
+        if self.prefetch_tables:
+            # Listing tables is usually followed by reflecting each of
+            # them, e.g. by MetaData.reflect().
+            self._prefetch_tables(client, table_refs)
         return result
 
+    @staticmethod
+    def _collapse_shards(tables):
+        """Replace each family of date-sharded tables, like
+        ``events_20210101``, ``events_20210102``, ..., by its newest
+        shard, listed as ``events_*``."""
+        result = []
+        families = {}  # {wildcard table_id: index in result}
+        for table in tables:
+            match = _shard_suffix(table.table_id)
+            if match is None:
+                result.append(table)
+                continue
+
+            wildcard = _ShardFamily(table, match.group(1) + "*")
+            index = families.get(wildcard.table_id)
+            if index is None:
+                families[wildcard.table_id] = len(result)
+                result.append(wildcard)
+            elif table.table_id > result[index].shard.table_id:
+                result[index] = wildcard
+        return result
+
+    def _prefetch_tables(self, client, table_refs):
+        """Fetch tables that aren't cached yet into the metadata cache,
+        as many as fit without evicting other entries."""
+        import google.api_core.exceptions
+
+        table_refs = [
+            table_ref
+            for table_ref in table_refs
+            if ("table", str(table_ref)) not in self.metadata_cache
+        ]
+        del table_refs[self.metadata_cache.room() :]
+
+        def fetch_table(table_ref):
+            try:
+                table = self._fetch_table(client, table_ref)
+            except google.api_core.exceptions.GoogleAPICallError:
+                # E.g. the table was just deleted. Leave any error to be
+                # reported when the table itself is reflected.
+                return
+            self.metadata_cache.set(("table", str(table_ref)), table)
+
+        self._map_concurrently(fetch_table, table_refs)
+
+    def _map_concurrently(self, func, items):
+        """Like map(), but makes up to metadata_max_workers calls at once."""
+        items = list(items)
+        max_workers = min(self.metadata_max_workers, len(items))
+        if max_workers <= 1:
+            return [func(item) for item in items]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    def _dataset_reference(schema, client_project):
+        from google.cloud.bigquery.dataset import DatasetReference
+
+        schema_split = schema.split(".")
+        if len(schema_split) == 1:
+            return DatasetReference(client_project, schema)
+        elif len(schema_split) == 2:
+            return DatasetReference(*schema_split)
+        else:
+            raise ValueError("Did not understand schema: {}".format(schema))
+
+    def _list_datasets(self, client):
+        key = ("datasets",)
+        datasets = self.metadata_cache.get(key)
+        if datasets is None:
+            datasets = list(client.list_datasets())
+            self.metadata_cache.set(key, datasets)
+        return datasets
+
+    def _list_tables(self, client, dataset_ref):
+        key = ("tables", "{}.{}".format(dataset_ref.project, dataset_ref.dataset_id))
+        tables = self.metadata_cache.get(key)
+        if tables is None:
+            tables = list(client.list_tables(dataset_ref))
+            self.metadata_cache.set(key, tables)
+        return tables
+
     @staticmethod
     def _split_table_name(full_table_name):
         # Split full_table_name to get project, dataset and table name
@@ -680,6 +1364,8 @@ class BigQueryDialect(DefaultDialect):
     def _table_reference(
         self, provided_schema_name, provided_table_name, client_project
     ):
+        from google.cloud.bigquery.table import TableReference
+
         project_id_from_table, dataset_id_from_table, table_id = self._split_table_name(
             provided_table_name
         )
@@ -729,19 +1415,143 @@ class BigQueryDialect(DefaultDialect):
         )
         return table_ref
 
-    def _get_table(self, connection, table_name, schema=None):
+    def _cache_get(self, key, info_cache=None):
+        value = self.metadata_cache.get(key)
+        if value is None and info_cache is not None:
+            # Fall back to the cache of the Inspector we're called from.
+            value = info_cache.get(key)
+        return value
+
+    def _cache_set(self, key, value, info_cache=None):
+        self.metadata_cache.set(key, value)
+        if info_cache is not None:
+            info_cache[key] = value
+
+    def _get_table(self, connection, table_name, schema=None, info_cache=None):
         if isinstance(connection, Engine):
             connection = connection.connect()
 
-        client = connection.connection._client
+        return self._get_client_table(
+            connection.connection._client, table_name, schema, info_cache
+        )
+
+    def _get_client_table(self, client, table_name, schema=None, info_cache=None):
+        from google.api_core.exceptions import NotFound
 
         table_ref = self._table_reference(schema, table_name, client.project)
+        key = ("table", str(table_ref))
+        table = self._cache_get(key, info_cache)
+        if table is not None:
+            return table
+
         try:
-            table = client.get_table(table_ref)
+            table = self._fetch_table(client, table_ref)
         except NotFound:
             raise NoSuchTableError(table_name)
+        self._cache_set(key, table, info_cache)
+        return table
+
+    def _fetch_table(self, client, table_ref):
+        """Get a table from the schema cache, INFORMATION_SCHEMA or the API."""
+        if table_ref.table_id.endswith("*"):
+            table_ref = self._newest_shard(client, table_ref)
+
+        table = None
+        if self.schema_cache is not None:
+            table = self._get_table_from_schema_cache(client, table_ref)
+        if table is None and self.bulk_reflection:
+            table = self._get_table_from_information_schema(client, table_ref)
+        if table is None:
+            table = client.get_table(table_ref)
+            if self.schema_cache is not None:
+                self.schema_cache.save(table)
         return table
 
+    def _newest_shard(self, client, table_ref):
+        """Resolve a wildcard table, like ``events_*``, to its newest
+        date shard, with the same shards that table listings collapse."""
+        from google.api_core.exceptions import NotFound
+        from google.cloud.bigquery.dataset import DatasetReference
+        from google.cloud.bigquery.table import TableReference
+
+        prefix = table_ref.table_id[:-1]
+        dataset_ref = DatasetReference(table_ref.project, table_ref.dataset_id)
+        table_ids = []
+        for table in self._list_tables(client, dataset_ref):
+            match = _shard_suffix(table.table_id)
+            # E.g. events_2021010* matches events_20210102, of the
+            # events_* family, but events_* doesn't match events_x_20210102.
+            if (
+                match is not None
+                and prefix.startswith(match.group(1))
+                and table.table_id.startswith(prefix)
+            ):
+                table_ids.append(table.table_id)
+        if not table_ids:
+            raise NotFound("No tables match {}".format(table_ref))
+        return TableReference(dataset_ref, max(table_ids))
+
+    def _get_table_from_schema_cache(self, client, table_ref):
+        """Load a table from schema_cache_dir, if it's still current.
+
+        The last-modified times of all the tables in the dataset are
+        fetched with one query, and kept in the metadata cache. Concurrent
+        lookups, e.g. of prefetched tables, share that query.
+        """
+        import google.api_core.exceptions
+        from google.cloud.bigquery.dataset import DatasetReference
+        from pybigquery import _schema_cache
+
+        dataset_ref = DatasetReference(table_ref.project, table_ref.dataset_id)
+        times_key = (
+            "last_modified",
+            "{}.{}".format(dataset_ref.project, dataset_ref.dataset_id),
+        )
+
+        def fetch_times():
+            try:
+                return _schema_cache.last_modified_times(client, dataset_ref)
+            except google.api_core.exceptions.GoogleAPICallError:
+                return {}
+
+        times = self.metadata_cache.get_or_load(times_key, fetch_times)
+        last_modified = times.get(table_ref.table_id)
+        if last_modified is not None:
+            return self.schema_cache.load(table_ref, last_modified)
+
+    def _get_table_from_information_schema(self, client, table_ref):
+        """Look up a table after reflecting its whole dataset in one query.
+
+        Returns None if the table isn't part of the dataset snapshot, in
+        which case the caller falls back to ``client.get_table()``.
+        Concurrent lookups, e.g. of prefetched tables, share one snapshot.
+        """
+        import google.api_core.exceptions
+        from google.cloud.bigquery.dataset import DatasetReference
+        from pybigquery import _information_schema
+
+        dataset_ref = DatasetReference(table_ref.project, table_ref.dataset_id)
+        dataset_key = (
+            "dataset",
+            "{}.{}".format(dataset_ref.project, dataset_ref.dataset_id),
+        )
+
+        def reflect_dataset():
+            try:
+                tables = _information_schema.reflect_dataset(client, dataset_ref)
+            except (google.api_core.exceptions.GoogleAPICallError, ValueError):
+                # E.g. missing permissions for INFORMATION_SCHEMA, the
+                # dataset doesn't exist, or its rows can't be parsed. Look
+                # tables up one by one.
+                tables = []
+            for table in tables:
+                self.metadata_cache.set(("table", str(table.reference)), table)
+            return frozenset(table.table_id for table in tables)
+
+        table_ids = self.metadata_cache.get_or_load(dataset_key, reflect_dataset)
+        if table_ref.table_id in table_ids:
+            return self.metadata_cache.get(("table", str(table_ref)))
+
     def has_table(self, connection, table_name, schema=None):
         try:
             self._get_table(connection, table_name, schema)
@@ -749,56 +1559,54 @@ class BigQueryDialect(DefaultDialect):
         except NoSuchTableError:
             return False
 
-    def _get_columns_helper(self, columns, cur_columns):
+    def _get_columns_helper(self, columns):
         """
-        Recurse into record type and return all the nested field names.
-        As contributed by @sumedhsakdeo on issue #17
+        Flatten record fields into reflected columns with dotted names.
+        As contributed by @sumedhsakdeo on issue #17.
+
+        The schema is walked with a stack, rather than by recursion, so
+        that each dotted name is built from its parent's prefix.
         """
         results = []
-        for col in columns:
-            results += [
-                SchemaField(
-                    name=".".join(col.name for col in cur_columns + [col]),
-                    field_type=col.field_type,
-                    mode=col.mode,
-                    description=col.description,
-                    fields=col.fields,
-                )
-            ]
-            if col.field_type == "RECORD":
-                cur_columns.append(col)
-                results += self._get_columns_helper(col.fields, cur_columns)
-                cur_columns.pop()
-        return results
+        stack = [("", iter(columns))]
+        while stack:
+            prefix, fields = stack[-1]
+            col = next(fields, None)
+            if col is None:
+                stack.pop()
+                continue
 
-    def get_columns(self, connection, table_name, schema=None, **kw):
-        table = self._get_table(connection, table_name, schema)
-        columns = self._get_columns_helper(table.schema, [])
-        result = []
-        for col in columns:
+            name = prefix + col.name
+            field_type = col.field_type
+            mode = col.mode
             try:
-                coltype = _type_map[col.field_type]
+                coltype = _type_map[field_type]
             except KeyError:
                 util.warn(
-                    "Did not recognize type '%s' of column '%s'"
-                    % (col.field_type, col.name)
+                    "Did not recognize type '%s' of column '%s'" % (field_type, name)
                 )
                 coltype = types.NullType
 
-            result.append(
+            results.append(
                 {
-                    "name": col.name,
-                    "type": types.ARRAY(coltype) if col.mode == "REPEATED" else coltype,
-                    "nullable": col.mode == "NULLABLE" or col.mode == "REPEATED",
+                    "name": name,
+                    "type": types.ARRAY(coltype) if mode == "REPEATED" else coltype,
+                    "nullable": mode == "NULLABLE" or mode == "REPEATED",
                     "comment": col.description,
                     "default": None,
                 }
             )
+            if field_type == "RECORD":
+                stack.append((name + ".", iter(col.fields)))
 
-        return result
+        return results
+
+    def get_columns(self, connection, table_name, schema=None, **kw):
+        table = self._get_table(connection, table_name, schema, kw.get("info_cache"))
+        return self._get_columns_helper(table.schema)
 
     def get_table_comment(self, connection, table_name, schema=None, **kw):
-        table = self._get_table(connection, table_name, schema)
+        table = self._get_table(connection, table_name, schema, kw.get("info_cache"))
         return {
             "text": table.description,
         }
@@ -812,7 +1620,7 @@ class BigQueryDialect(DefaultDialect):
         return {"constrained_columns": []}
 
     def get_indexes(self, connection, table_name, schema=None, **kw):
-        table = self._get_table(connection, table_name, schema)
+        table = self._get_table(connection, table_name, schema, kw.get("info_cache"))
         indexes = []
         if table.time_partitioning:
             indexes.append(
@@ -836,7 +1644,7 @@ class BigQueryDialect(DefaultDialect):
         if isinstance(connection, Engine):
             connection = connection.connect()
 
-        datasets = connection.connection._client.list_datasets()
+        datasets = self._list_datasets(connection.connection._client)
         return [d.dataset_id for d in datasets]
 
     def get_table_names(self, connection, schema=None, **kw):
@@ -851,6 +1659,27 @@ class BigQueryDialect(DefaultDialect):
 
         return self._get_table_or_view_names(connection, "VIEW", schema)
 
+    def do_execute(self, cursor, statement, parameters, context=None):
+        if context is not None and context._buffer_insert(cursor, parameters):
+            return
+        super(BigQueryDialect, self).do_execute(cursor, statement, parameters, context)
+        self._invalidate_metadata_after_ddl(statement, context)
+
+    def do_execute_no_params(self, cursor, statement, context=None):
+        super(BigQueryDialect, self).do_execute_no_params(cursor, statement, context)
+        self._invalidate_metadata_after_ddl(statement, context)
+
+    def _invalidate_metadata_after_ddl(
+        self,
+        statement,
+        context,
+        is_ddl_text=re.compile(r"\s*(?:CREATE|DROP|ALTER)\s", re.IGNORECASE).match,
+    ):
+        # Schema changes made through the dialect make cached table
+        # metadata stale.
+        if (context is not None and context.isddl) or is_ddl_text(statement):
+            self.metadata_cache.clear()
+
     def do_rollback(self, dbapi_connection):
         # BigQuery has no support for transactions.
         pass
@@ -39,6 +39,13 @@ def readme():
         return f.read()
 
 
+extras = {
+    "bqstorage": ["google-cloud-bigquery-storage>=2.6.0", "pyarrow>=4.0.0"],
+    "pandas": ["pandas>=1.0.0", "pyarrow>=4.0.0"],
+    "numpy": ["numpy>=1.16.6", "pyarrow>=4.0.0"],
+}
+extras["all"] = sorted(set(sum(extras.values(), [])))
+
 setup(
     name=name,
     version=version,
@@ -67,10 +74,13 @@ setup(
     install_requires=[
         "sqlalchemy>=1.2.0,<1.4.0dev",
         "google-auth>=1.24.0,<2.0dev",  # Work around pip wack.
-        "google-cloud-bigquery>=2.15.0",
+        "google-cloud-bigquery>=2.21.0",  # DB-API STRUCT parameters.
         "google-api-core>=1.23.0",  # Work-around bug in cloud core deps.
+        "requests>=2.18.0,<3.0.0dev",  # HTTP connection pool options.
+        "urllib3>=1.21.1",  # TCP keep-alive socket options.
         "future",
     ],
+    extras_require=extras,
     python_requires=">=3.6, <3.10",
     tests_require=["pytz"],
     entry_points={
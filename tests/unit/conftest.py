@@ -35,7 +35,8 @@ sqlalchemy_1_3_or_higher = pytest.mark.skipif(
 @pytest.fixture()
 def faux_conn():
     test_data = dict(execute=[])
-    connection = sqlite3.connect(":memory:")
+    # Buffered inserts are flushed from another thread.
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
 
     def factory(*args, **kw):
         conn = fauxdbi.Connection(connection, test_data, *args, **kw)
@@ -45,6 +46,8 @@ def faux_conn():
         # We want to bypass client creation. We don't need it and it requires creds.
         with mock.patch(
             "pybigquery._helpers.create_bigquery_client", fauxdbi.FauxClient
+        ), mock.patch(
+            "pybigquery._helpers.create_bigquery_storage_client", return_value=None
         ):
             with mock.patch("google.auth.default", return_value=("authdb", "authproj")):
                 engine = sqlalchemy.create_engine("bigquery://myproject/mydataset")
@@ -65,6 +68,28 @@ def faux_conn():
                 conn.close()
 
 
+@pytest.fixture()
+def faux_engine(faux_conn):
+    """Connect to new engines, with options, sharing faux_conn's database.
+
+    ``faux_engine(metadata_cache_ttl=60)`` returns a connection whose
+    client's ``get_table`` is wrapped in a mock, to count its calls.
+    """
+    with contextlib.ExitStack() as stack:
+
+        def connect(url="bigquery://myproject/mydataset", **kw):
+            conn = stack.enter_context(
+                contextlib.closing(sqlalchemy.create_engine(url, **kw).connect())
+            )
+            client = conn.connection._client
+            stack.enter_context(
+                mock.patch.object(client, "get_table", wraps=client.get_table)
+            )
+            return conn
+
+        yield connect
+
+
 @pytest.fixture()
 def metadata():
     return sqlalchemy.MetaData()
@@ -77,3 +102,28 @@ def setup_table(connection, name, *columns, initial_data=(), **kw):
     if initial_data:
         connection.execute(table.insert(), initial_data)
     return table
+
+
+@pytest.fixture()
+def people(faux_conn):
+    return setup_table(
+        faux_conn,
+        "people",
+        sqlalchemy.Column("name", sqlalchemy.String, key="name_key"),
+        sqlalchemy.Column("age", sqlalchemy.Integer),
+        sqlalchemy.Column("born", sqlalchemy.DateTime),
+        sqlalchemy.Column("tags", sqlalchemy.ARRAY(sqlalchemy.String)),
+    )
+
+
+@pytest.fixture()
+def load_table_from_file(faux_conn):
+    client = faux_conn.connection.connection._client
+    with mock.patch.object(client, "load_table_from_file") as load_table_from_file:
+        job = load_table_from_file.return_value
+        job.job_id = "job"
+        job.input_file_bytes = 10
+        job.output_rows = 2
+        job.output_bytes = 20
+        job.errors = None
+        yield load_table_from_file
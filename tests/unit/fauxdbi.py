@@ -19,8 +19,10 @@
 
 import base64
 import contextlib
+import csv
 import datetime
 import decimal
+import io
 import pickle
 import re
 import sqlite3
@@ -29,6 +31,7 @@ import google.api_core.exceptions
 import google.cloud.bigquery.schema
 import google.cloud.bigquery.table
 import google.cloud.bigquery.dbapi.cursor
+import mock
 
 
 class Connection:
@@ -44,11 +47,16 @@ class Connection:
     def commit(self):
         pass
 
+    def close(self):
+        pass
+
 
 class Cursor:
     def __init__(self, connection):
         self.connection = connection
         self.cursor = connection.connection.cursor()
+        self.description = None
+        self.rowcount = -1
         assert self.arraysize == 1
 
     __arraysize = 1
@@ -89,18 +97,35 @@ class Cursor:
         self,
         operation,
         parameters,
-        placeholder=re.compile(r"%\((\w+)\)s", re.IGNORECASE),
+        placeholder=re.compile(
+            r"(?P<unnest>UNNEST\()?%\((\w+)\)s(?(unnest)\))", re.IGNORECASE
+        ),
     ):
         ordered_parameters = []
 
-        def repl(m):
-            name = m.group(1)
-            value = parameters[name]
+        def convert(value):
             if isinstance(value, self._need_to_be_pickled):
                 value = pickle.dumps(value, 4).decode("latin1")
             ordered_parameters.append(value)
             return "?"
 
+        def repl(m):
+            value = parameters[m.group(2)]
+            if m.group("unnest"):
+                if value and isinstance(value[0], dict):
+                    # Rows, in "SELECT * FROM UNNEST(%(rows)s)".
+                    return (
+                        "(VALUES "
+                        + ", ".join(
+                            "(" + ", ".join(convert(v) for v in row.values()) + ")"
+                            for row in value
+                        )
+                        + ")"
+                    )
+                # An array parameter, in "x IN UNNEST(%(name)s)".
+                return "(" + ", ".join(convert(v) for v in value) + ")"
+            return convert(value)
+
         operation = placeholder.sub(repl, operation)
         return operation, ordered_parameters
 
@@ -277,6 +302,8 @@ class Cursor:
 
         self.description = self.cursor.description
         self.rowcount = self.cursor.rowcount
+        # BigQuery queries run to completion before results are fetched.
+        self.rows = iter(self.cursor.fetchall())
 
     def executemany(self, operation, parameters_list):
         for parameters in parameters_list:
@@ -303,10 +330,10 @@ class Cursor:
         ]
 
     def fetchone(self):
-        return self._fix_pickled(self.cursor.fetchone())
+        return self._fix_pickled(next(self.rows, None))
 
     def fetchall(self):
-        return map(self._fix_pickled, self.cursor)
+        return map(self._fix_pickled, self.rows)
 
 
 class attrdict(dict):
@@ -409,6 +436,67 @@ class FauxClient:
             else:
                 raise google.api_core.exceptions.NotFound(table_ref)
 
+    @staticmethod
+    def _sqlite_name(table_ref):
+        return f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}"
+
+    def create_table(self, table):
+        columns = ", ".join(
+            f"{field.name} {field.field_type}" for field in table.schema
+        )
+        with contextlib.closing(self.connection.connection.cursor()) as cursor:
+            cursor.execute(f"create table `{self._sqlite_name(table)}` ({columns})")
+        return table
+
+    def load_table_from_file(self, file_obj, table_ref, job_config):
+        rows = list(csv.reader(io.TextIOWrapper(file_obj, encoding="utf-8")))
+        placeholders = ", ".join("?" for _ in job_config.schema)
+        with contextlib.closing(self.connection.connection.cursor()) as cursor:
+            cursor.executemany(
+                f"insert into `{self._sqlite_name(table_ref)}` values ({placeholders})",
+                rows,
+            )
+        return mock.Mock()
+
+    @staticmethod
+    def _insert_json_row(cursor, table_id, row):
+        columns = ", ".join(f"`{name}`" for name in row)
+        placeholders = ", ".join("?" for _ in row)
+        cursor.execute(
+            f"insert into `{table_id}` ({columns}) values ({placeholders})",
+            [
+                pickle.dumps(v, 4).decode("latin1")
+                if isinstance(v, (list, dict))
+                else v
+                for v in row.values()
+            ],
+        )
+
+    def load_table_from_json(self, json_rows, destination, job_config):
+        with contextlib.closing(self.connection.connection.cursor()) as cursor:
+            for row in json_rows:
+                self._insert_json_row(cursor, destination.table_id, row)
+        return mock.Mock()
+
+    def insert_rows_json(self, table, json_rows, row_ids=None, skip_invalid_rows=None):
+        errors = []
+        with contextlib.closing(self.connection.connection.cursor()) as cursor:
+            for index, row in enumerate(json_rows):
+                try:
+                    self._insert_json_row(cursor, table.table_id, row)
+                except sqlite3.Error as exc:
+                    errors.append(
+                        {
+                            "index": index,
+                            "errors": [{"reason": "invalid", "message": str(exc)}],
+                        }
+                    )
+        return errors
+
+    def delete_table(self, table_ref, not_found_ok=False):
+        with contextlib.closing(self.connection.connection.cursor()) as cursor:
+            cursor.execute(f"drop table `{self._sqlite_name(table_ref)}`")
+
     def list_datasets(self):
         return [
             google.cloud.bigquery.Dataset("myproject.mydataset"),
@@ -0,0 +1,111 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from google.cloud.bigquery.schema import SchemaField
+from google.cloud.bigquery.table import RowIterator
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery.sqlalchemy_bigquery import BigQueryExecutionContext
+
+
+class Batch(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.num_rows = len(rows)
+
+    def slice(self, offset, length):
+        return Batch(self.rows[offset : offset + length])
+
+
+@pytest.fixture()
+def result(faux_conn):
+    result = faux_conn.execute("select 1")
+    result.cursor._query_rows = mock.Mock()
+    return result
+
+
+def test_fetch_arrow(result):
+    rows = result.cursor._query_rows
+    assert result.fetch_arrow() is rows.to_arrow.return_value
+    rows.to_arrow.assert_called_once_with(
+        bqstorage_client=None, create_bqstorage_client=False
+    )
+    assert result.cursor is None  # Released
+
+
+def test_fetch_arrow_batches(result):
+    rows = result.cursor._query_rows
+    rows.to_arrow_iterable.return_value = [Batch([1, 2, 3, 4, 5]), Batch([6])]
+    batches = result.fetch_arrow_batches(2)
+    assert [batch.rows for batch in batches] == [[1, 2], [3, 4], [5], [6]]
+    rows.to_arrow_iterable.assert_called_once_with(bqstorage_client=None)
+    assert result.cursor is None
+
+
+def test_fetch_arrow_batches_as_they_come(result):
+    rows = result.cursor._query_rows
+    rows.to_arrow_iterable.return_value = [Batch([1, 2, 3]), Batch([4])]
+    assert [batch.rows for batch in result.fetch_arrow_batches()] == [[1, 2, 3], [4]]
+
+
+def test_fetch_arrow_with_bqstorage(result):
+    result.context._bqstorage_client = bqstorage_client = mock.Mock()
+    rows = result.cursor._query_rows
+    result.fetch_arrow()
+    rows.to_arrow.assert_called_once_with(
+        bqstorage_client=bqstorage_client, create_bqstorage_client=False
+    )
+
+
+def test_fetch_arrow_needs_query_rows(faux_conn):
+    result = faux_conn.execute("select 1")
+    with pytest.raises(
+        sqlalchemy.exc.InvalidRequestError, match="google-cloud-bigquery 3.17"
+    ):
+        result.fetch_arrow()
+
+    # Rows of older versions without to_arrow_iterable() aren't enough.
+    result.cursor._query_rows = mock.Mock(spec=["to_arrow"])
+    with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+        result.fetch_arrow()
+
+
+def test_fetch_arrow_of_rows_chosen_for_rest():
+    pyarrow = pytest.importorskip("pyarrow")
+    api_request = mock.Mock(
+        return_value={"rows": [{"f": [{"v": "1"}]}, {"f": [{"v": "2"}]}]}
+    )
+    rows = RowIterator(
+        mock.Mock(), api_request, "/path", [SchemaField("x", "INT64")], total_rows=2
+    )
+    cursor = mock.Mock(_query_rows=rows, _query_data=None)
+    context = mock.Mock(
+        spec=BigQueryExecutionContext,
+        cursor=cursor,
+        dialect=mock.Mock(use_bqstorage=False),
+        execution_options={},
+    )
+    BigQueryExecutionContext._choose_result_api(context)
+
+    # Choosing the REST API doesn't start the rows iterator.
+    table = rows.to_arrow(create_bqstorage_client=False)
+    assert table.schema.field("x").type == pyarrow.int64()
+    assert table.column("x").to_pylist() == [1, 2]
@@ -0,0 +1,185 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from google.cloud.bigquery.schema import SchemaField
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery.sqlalchemy_bigquery import (
+    BigQueryDialect,
+    BigQueryExecutionContext,
+    _estimate_row_size,
+)
+
+
+def make_context(dialect, total_rows, schema=(), execution_options={}):
+    cursor = mock.Mock(_query_data=None)
+    cursor._query_rows = mock.MagicMock(total_rows=total_rows, schema=list(schema))
+    cursor._query_rows.__iter__.return_value = iter([(1,)])
+    return mock.Mock(
+        spec=BigQueryExecutionContext,
+        _bqstorage_client=None,
+        cursor=cursor,
+        dialect=dialect,
+        execution_options=execution_options,
+    )
+
+
+def choose_result_api(context):
+    BigQueryExecutionContext._choose_result_api(context)
+    if context.cursor._query_data is None:
+        assert context._bqstorage_client is context.cursor.connection._bqstorage_client
+        return "bqstorage"
+    assert context._bqstorage_client is None
+    # The rows are only iterated once fetched.
+    assert not context.cursor._query_rows.__iter__.called
+    assert list(context.cursor._query_data) == [(1,)]
+    return "rest"
+
+
+# 16 KiB rows, of which 6400 make 100 MiB.
+WIDE = [SchemaField("s{}".format(i), "STRING") for i in range(1024)]
+
+
+@pytest.mark.parametrize(
+    "total_rows,schema,api",
+    [
+        (None, WIDE, "rest"),
+        (5000, WIDE, "rest"),  # A single page
+        (6399, WIDE, "rest"),
+        (6400, WIDE, "bqstorage"),  # Wide rows
+        (99999, [SchemaField("x", "INT64")], "rest"),
+        (100000, [SchemaField("x", "INT64")], "bqstorage"),
+    ],
+)
+def test_choose_result_api(total_rows, schema, api):
+    context = make_context(BigQueryDialect(), total_rows, schema)
+    assert choose_result_api(context) == api
+    # The size of the results is estimated, not fetched.
+    assert not context.cursor.connection._client.method_calls
+
+
+def test_choose_result_api_thresholds():
+    dialect = BigQueryDialect(
+        arraysize=10, bqstorage_min_rows=100, bqstorage_min_bytes=110
+    )
+    schema = [SchemaField("b", "BOOL")]
+    assert choose_result_api(make_context(dialect, 10)) == "rest"
+    assert choose_result_api(make_context(dialect, 99, schema)) == "rest"
+    assert choose_result_api(make_context(dialect, 11, schema * 10)) == "bqstorage"
+    assert choose_result_api(make_context(dialect, 100)) == "bqstorage"
+
+
+def test_estimate_row_size():
+    assert _estimate_row_size([]) == 0
+    schema = [
+        SchemaField("i", "INT64"),
+        SchemaField("b", "BOOLEAN"),
+        SchemaField("n", "BIGNUMERIC"),
+        SchemaField(
+            "r",
+            "RECORD",
+            mode="REPEATED",
+            fields=[SchemaField("t", "TIMESTAMP"), SchemaField("s", "STRING")],
+        ),
+    ]
+    assert _estimate_row_size(schema) == 8 + 1 + 32 + 8 + 16
+
+
+def test_use_bqstorage():
+    dialect = BigQueryDialect(use_bqstorage=True)
+    assert choose_result_api(make_context(dialect, 10)) == "bqstorage"
+    context = make_context(
+        dialect, 10 ** 6, execution_options=dict(bigquery_use_bqstorage=False)
+    )
+    assert choose_result_api(context) == "rest"
+
+    dialect = BigQueryDialect(use_bqstorage=False)
+    assert choose_result_api(make_context(dialect, 10 ** 6)) == "rest"
+    context = make_context(
+        dialect, 10, execution_options=dict(bigquery_use_bqstorage=True)
+    )
+    assert choose_result_api(context) == "bqstorage"
+
+
+def test_results_without_bqstorage_client():
+    context = make_context(BigQueryDialect(use_bqstorage=True), 10 ** 6)
+    context.cursor.connection._bqstorage_client = None
+    BigQueryExecutionContext._choose_result_api(context)
+    assert context.cursor._query_data is None  # Left to the cursor.
+
+
+def test_results_with_older_dbapi():
+    # Older DB-APIs choose by themselves.
+    context = make_context(BigQueryDialect(use_bqstorage=False), 10 ** 6)
+    del context.cursor._query_rows
+    BigQueryExecutionContext._choose_result_api(context)
+    assert context.cursor._query_data is None
+
+
+@pytest.fixture()
+def older_dbapi():
+    with mock.patch(
+        "pybigquery._helpers.dbapi_keeps_query_rows", return_value=False
+    ) as dbapi_keeps_query_rows:
+        yield dbapi_keeps_query_rows
+
+
+def test_use_bqstorage_with_older_dbapi(faux_conn, older_dbapi):
+    with pytest.raises(ValueError, match="3.17 or later"):
+        sqlalchemy.create_engine("bigquery://myproject/mydataset", use_bqstorage=True)
+
+    engine = sqlalchemy.create_engine(
+        "bigquery://myproject/mydataset?use_bqstorage=false"
+    )
+    engine.connect().close()
+    assert older_dbapi.call_count == 2
+
+
+def test_use_bqstorage_option_with_older_dbapi(faux_conn):
+    faux_conn.dialect._dbapi_keeps_query_rows = False
+    conn = faux_conn.execution_options(bigquery_use_bqstorage=True)
+    with pytest.raises(sqlalchemy.exc.InvalidRequestError, match="3.17 or later"):
+        conn.execute(sqlalchemy.text("insert into comments values ('a', 'b')"))
+    # The statement didn't run.
+    assert faux_conn.execute("select count(*) from comments").scalar() == 0
+
+    conn = faux_conn.execution_options(bigquery_use_bqstorage=False)
+    conn.execute(sqlalchemy.text("insert into comments values ('a', 'b')"))
+    assert faux_conn.execute("select count(*) from comments").scalar() == 1
+
+
+def test_faux_results(faux_conn):
+    # Cursors that didn't run a query have no results to choose for.
+    assert faux_conn.execute("select 1").fetchall() == [(1,)]
+
+
+def test_use_bqstorage_in_url(faux_conn):
+    engine = sqlalchemy.create_engine("bigquery://myproject/?use_bqstorage=false")
+    assert engine.dialect.use_bqstorage is False
+
+
+def test_use_bqstorage_requires_bqstorage(faux_conn):
+    with pytest.raises(ImportError, match="requires google-cloud-bigquery-storage"):
+        sqlalchemy.create_engine("bigquery://myproject", use_bqstorage=True)
+
+    with mock.patch("pybigquery._helpers.create_bigquery_storage_client"):
+        engine = sqlalchemy.create_engine("bigquery://myproject", use_bqstorage=True)
+    assert engine.dialect.use_bqstorage is True
@@ -238,6 +238,35 @@ def test_get_table_columns_special_cases(faux_conn):
     ]
 
 
+def test_get_table_columns_deeply_nested(faux_conn):
+    cursor = faux_conn.connection.cursor()
+    cursor.execute("create table foo (r RECORD, s STRING)")
+    client = faux_conn.connection._client
+    client.tables.foo.columns.r.fields = (
+        dict(
+            name="a",
+            type="RECORD",
+            mode="REPEATED",
+            fields=[
+                dict(name="b", type="RECORD", fields=[dict(name="c", type="INT64")])
+            ],
+        ),
+        dict(name="d", type="STRING", description="d's description"),
+    )
+
+    actual = faux_conn.dialect.get_columns(faux_conn, "foo")
+    assert [(c["name"], c["nullable"], c["comment"]) for c in actual] == [
+        ("r", True, None),
+        ("r.a", True, None),
+        ("r.a.b", True, None),
+        ("r.a.b.c", True, None),
+        ("r.d", True, "d's description"),
+        ("s", True, None),
+    ]
+    assert isinstance(actual[1]["type"], sqlalchemy.types.ARRAY)
+    assert actual[3]["type"] is sqlalchemy.types.Integer
+
+
 def test_has_table(faux_conn):
     cursor = faux_conn.connection.cursor()
     assert not faux_conn.dialect.has_table(faux_conn, "foo")
@@ -257,3 +286,63 @@ def test_bad_table_argument(faux_conn):
     # with goofy table name, to exercise some error handling
     with pytest.raises(ValueError, match=r"Did not understand table_name: a\.b\.c\.d"):
         faux_conn.dialect.has_table(faux_conn.engine, "a.b.c.d")
+
+
+@pytest.fixture()
+def sharded_conn(faux_engine):
+    conn = faux_engine(collapse_sharded_tables=True)
+    conn.execute("create table events_20210102 (x INT64, y INT64)")
+    conn.execute("create table other (z INT64)")
+    conn.execute("create table events_20210101 (x INT64)")
+    conn.execute("create table events_view (v INT64)")
+    conn.execute("create table logs_20210101 (l INT64)")
+    conn.execute("create view myview as select 1")
+    return conn
+
+
+def test_get_table_names_collapses_shards(sharded_conn):
+    dialect = sharded_conn.dialect
+    assert dialect.get_table_names(sharded_conn) == [
+        "events_*",
+        "other",
+        "events_view",
+        "logs_*",
+    ]
+    assert dialect.get_view_names(sharded_conn) == ["myview"]
+
+
+def test_get_columns_of_shard_family_uses_newest_shard(sharded_conn):
+    dialect = sharded_conn.dialect
+    columns = dialect.get_columns(sharded_conn, "events_*")
+    assert [c["name"] for c in columns] == ["x", "y"]
+    columns = dialect.get_columns(sharded_conn, "events_2021010*")
+    assert [c["name"] for c in columns] == ["x", "y"]
+    with pytest.raises(sqlalchemy.exc.NoSuchTableError):
+        dialect.get_columns(sharded_conn, "nope_*")
+
+
+def test_newest_shard_is_a_listed_shard(sharded_conn):
+    sharded_conn.execute("create table events_99 (n INT64)")
+    sharded_conn.execute("create table events_x_20211231 (n INT64)")
+    dialect = sharded_conn.dialect
+    assert "events_99" in dialect.get_table_names(sharded_conn)
+    columns = dialect.get_columns(sharded_conn, "events_*")
+    assert [c["name"] for c in columns] == ["x", "y"]
+
+
+def test_collapsed_shards_are_prefetched(faux_engine):
+    conn = faux_engine(
+        collapse_sharded_tables=True,
+        prefetch_tables=True,
+        metadata_cache_ttl=60,
+        metadata_max_workers=1,
+    )
+    conn.execute("create table events_20210101 (x INT64)")
+    conn.execute("create table events_20210102 (x INT64, y INT64)")
+    client = conn.connection._client
+    metadata = sqlalchemy.MetaData()
+    metadata.reflect(conn)
+    assert list(metadata.tables) == ["events_*"]
+    assert list(metadata.tables["events_*"].columns.keys()) == ["x", "y"]
+    client.get_table.assert_called_once()
+    assert client.get_table.call_args[0][0].table_id == "events_20210102"
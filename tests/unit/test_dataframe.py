@@ -0,0 +1,234 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import decimal
+import sys
+
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery import dataframe
+from pybigquery.sqlalchemy_bigquery import BigQueryDialect
+
+
+def test_table_schema(people):
+    schema = dataframe.table_schema(BigQueryDialect(), people)
+    assert [(f.name, f.field_type, f.mode) for f in schema] == [
+        ("name", "STRING", "NULLABLE"),
+        ("age", "INT64", "NULLABLE"),
+        ("born", "DATETIME", "NULLABLE"),
+        ("tags", "STRING", "REPEATED"),
+    ]
+    schema = dataframe.table_schema(BigQueryDialect(), people, ["age", "name"])
+    assert [f.name for f in schema] == ["age", "name"]
+
+    with pytest.raises(ValueError, match="people has no columns named: x, y"):
+        dataframe.table_schema(BigQueryDialect(), people, ["name", "x", "y"])
+
+
+class ArrowTable(object):
+    def __init__(self, types, num_rows):
+        self.types = types
+        self.column_names = list(types)
+        self.schema = mock.Mock(types=list(types.values()))
+        self.num_rows = num_rows
+
+    def column(self, i):
+        return mock.Mock(cast=lambda arrow_type: arrow_type)
+
+    def set_column(self, i, name, column):
+        return ArrowTable(dict(self.types, **{name: column}), self.num_rows)
+
+
+@pytest.fixture()
+def pyarrow(monkeypatch):
+    # pyarrow is optional.
+    pyarrow = mock.Mock()
+    pyarrow.Table = type("Table", (ArrowTable,), dict(from_pandas=mock.Mock()))
+    monkeypatch.setitem(sys.modules, "pyarrow", pyarrow)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", pyarrow.parquet)
+    return pyarrow
+
+
+def test_load_arrow_table(faux_conn, people, pyarrow, load_table_from_file):
+    data = pyarrow.Table(dict(age=pyarrow.float64(), name=pyarrow.string()), 2)
+    assert dataframe.load_dataframe(faux_conn, people, data) == 2
+
+    pyarrow.Table.from_pandas.assert_not_called()
+    [written, parquet], kw = pyarrow.parquet.write_table.call_args
+    # Integers with missing values are floats in pandas.
+    assert written.types == dict(age=pyarrow.int64(), name=pyarrow.string())
+    assert kw == dict(
+        use_compliant_nested_type=True,
+        coerce_timestamps="us",
+        allow_truncated_timestamps=True,
+    )
+    [file_obj, table_ref], kw = load_table_from_file.call_args
+    assert file_obj is parquet
+    assert str(table_ref) == "myproject.mydataset.people"
+    job_config = kw["job_config"]
+    assert job_config.source_format == "PARQUET"
+    assert job_config.write_disposition == "WRITE_APPEND"
+    assert [f.name for f in job_config.schema] == ["age", "name"]
+    assert job_config.parquet_options is None
+    load_table_from_file.return_value.result.assert_called_once_with()
+
+
+def test_load_dataframe(faux_conn, people, pyarrow, load_table_from_file):
+    frame = object()
+    pyarrow.Table.from_pandas.return_value = pyarrow.Table(dict(tags=None), 3)
+    engine = mock.Mock(spec=sqlalchemy.engine.Engine)
+    engine.connect.return_value = faux_conn
+
+    assert dataframe.load_dataframe(engine, people, frame) == 3
+
+    pyarrow.Table.from_pandas.assert_called_once_with(frame, preserve_index=False)
+    _, kw = load_table_from_file.call_args
+    assert kw["job_config"].parquet_options.enable_list_inference
+
+
+def test_load_dataframe_without_pyarrow(monkeypatch, faux_conn, people):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError, match="DataFrames require pyarrow"):
+        dataframe.load_dataframe(faux_conn, people, object())
+
+
+def test_to_sql_method(faux_conn, people):
+    frame = mock.Mock()
+    pd_table = mock.Mock(
+        spec=["table", "frame", "index"], table=people, frame=frame, index=None
+    )
+    with mock.patch("pybigquery.dataframe.load_dataframe") as load_dataframe:
+        rowcount = dataframe.to_sql_method(
+            pd_table, faux_conn, ["name", "age"], iter([("a", 1), ("b", 2)])
+        )
+        # The first chunk's call loaded the whole frame.
+        assert dataframe.to_sql_method(pd_table, faux_conn, ["name", "age"], []) == 0
+
+    frame.set_axis.assert_called_once_with(["name", "age"], axis=1)
+    load_dataframe.assert_called_once_with(
+        faux_conn, people, frame.set_axis.return_value
+    )
+    assert rowcount is load_dataframe.return_value
+
+
+def loaded_parquet(load_table_from_file):
+    import pyarrow.parquet
+
+    [file_obj, _], _ = load_table_from_file.call_args
+    return pyarrow.parquet.read_table(file_obj).to_pylist()
+
+
+def test_parquet_of_dataframe(faux_conn, people, load_table_from_file):
+    pandas = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    born = datetime.datetime(2000, 1, 2, 3, 4, 5, 123456)
+    frame = pandas.DataFrame(
+        dict(name=["a", "b"], age=[1, None], born=[born, None], tags=[["x"], []]),
+        index=[10, 20],
+    )
+
+    assert dataframe.load_dataframe(faux_conn, people, frame) == 2
+    assert loaded_parquet(load_table_from_file) == [
+        dict(name="a", age=1, born=born, tags=["x"]),
+        dict(name="b", age=None, born=None, tags=[]),
+    ]
+
+
+def test_parquet_of_to_sql_frame(faux_conn, people, load_table_from_file):
+    pandas = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    frame = pandas.DataFrame(
+        dict(age=[1, None]), index=pandas.Index(["a", "b"], name="ignored")
+    )
+    pd_table = mock.Mock(
+        spec=["table", "frame", "index"], table=people, frame=frame, index=["name"]
+    )
+
+    assert dataframe.to_sql_method(pd_table, faux_conn, ["name", "age"], None) == 2
+    assert loaded_parquet(load_table_from_file) == [
+        dict(name="a", age=1),
+        dict(name="b", age=None),
+    ]
+    assert frame.index.name == "ignored"
+
+
+def test_arrow_to_dataframe(monkeypatch, pyarrow):
+    pandas = mock.Mock()
+    monkeypatch.setitem(sys.modules, "pandas", pandas)
+    table = mock.Mock()
+
+    frame = dataframe.arrow_to_dataframe(table)
+
+    assert frame is table.to_pandas.return_value
+    _, kw = table.to_pandas.call_args
+    assert kw["split_blocks"] and kw["self_destruct"]
+    types_mapper = kw["types_mapper"]
+    assert types_mapper(pyarrow.int64()) is pandas.Int64Dtype()
+    assert types_mapper(pyarrow.bool_()) is pandas.BooleanDtype()
+    assert types_mapper(pyarrow.string()) is None
+
+
+def test_to_dataframe(faux_conn):
+    engine = mock.Mock(spec=sqlalchemy.engine.Engine)
+    engine.connect.return_value = connection = mock.MagicMock()
+    connection.__enter__.return_value = connection
+    statement = sqlalchemy.text("select :x")
+
+    frame = dataframe.to_dataframe(engine, statement, x=1)
+
+    connection.execute.assert_called_once_with(statement, x=1)
+    assert frame is connection.execute.return_value.fetch_dataframe.return_value
+
+
+def test_fetch_dataframe(faux_conn):
+    pandas = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    from google.cloud.bigquery.schema import SchemaField
+    from google.cloud.bigquery.table import RowIterator
+
+    schema = [
+        SchemaField("i", "INT64"),
+        SchemaField("b", "BOOL"),
+        SchemaField("n", "NUMERIC"),
+        SchemaField("ts", "TIMESTAMP"),
+    ]
+    api_request = mock.Mock(
+        return_value={
+            "rows": [
+                {"f": [{"v": "1"}, {"v": "true"}, {"v": "1.5"}, {"v": "0"}]},
+                {"f": [{"v": None}, {"v": None}, {"v": None}, {"v": None}]},
+            ]
+        }
+    )
+    result = faux_conn.execute("select 1")
+    result.cursor._query_rows = RowIterator(
+        mock.Mock(), api_request, "/path", schema, total_rows=2
+    )
+
+    frame = result.fetch_dataframe()
+
+    assert list(frame["i"]) == [1, pandas.NA]
+    assert str(frame["i"].dtype) == "Int64"
+    assert str(frame["b"].dtype) == "boolean"
+    assert list(frame["n"]) == [decimal.Decimal("1.5"), None]
+    assert frame["ts"][0] == pandas.Timestamp(0, tz="UTC")
+    assert str(frame["ts"].dt.tz) == "UTC"
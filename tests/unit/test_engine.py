@@ -17,9 +17,14 @@
 # IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import gc
+
+import mock
 import pytest
 import sqlalchemy
 
+from fauxdbi import FauxClient
+
 
 def test_engine_dataset_but_no_project(faux_conn):
     engine = sqlalchemy.create_engine("bigquery:///foo")
@@ -33,6 +38,27 @@ def test_engine_no_dataset_no_project(faux_conn):
     assert conn.connection._client.project == "authproj"
 
 
+def test_engines_load_their_own_credentials(faux_conn):
+    with mock.patch("google.auth.default", return_value=("creds", "authproj")) as auth:
+        engine1 = sqlalchemy.create_engine("bigquery:///foo")
+        engine2 = sqlalchemy.create_engine("bigquery:///foo")
+        assert auth.call_count == 2
+
+        dialect = engine1.dialect
+        cache = dialect.credentials_cache
+        assert cache is not engine2.dialect.credentials_cache
+        dialect.create_connect_args(engine1.url)
+        assert dialect.credentials_cache is cache
+        assert auth.call_count == 2
+
+    # The credentials are forgotten, and their tokens no longer refreshed,
+    # with the engine.
+    assert cache._credentials
+    del dialect, engine1
+    gc.collect()
+    assert not cache._credentials
+
+
 @pytest.mark.parametrize("arraysize", [0, None])
 def test_set_arraysize_not_set_if_false(faux_conn, metadata, arraysize):
     engine = sqlalchemy.create_engine("bigquery://", arraysize=arraysize)
@@ -52,3 +78,76 @@ def test_set_arraysize(faux_conn, metadata):
 
     # Because we gave a false array size, the array size wasn't set on the cursor:
     assert conn.connection.test_data["arraysize"] == 42
+
+
+def test_connections_share_one_client(faux_conn):
+    with mock.patch(
+        "pybigquery._helpers.create_bigquery_client", wraps=FauxClient
+    ) as create_client:
+        engine = sqlalchemy.create_engine("bigquery://myproject/mydataset")
+        with engine.connect() as conn1, engine.connect() as conn2:
+            assert conn1.connection.connection is not conn2.connection.connection
+            assert conn1.connection._client is conn2.connection._client
+    create_client.assert_called_once()
+
+
+def test_default_pool_class(faux_conn):
+    engine = sqlalchemy.create_engine("bigquery://myproject/mydataset")
+    assert isinstance(engine.pool, sqlalchemy.pool.QueuePool)
+
+
+def test_pool_options(faux_conn):
+    engine = sqlalchemy.create_engine(
+        "bigquery://myproject/mydataset", pool_size=20, max_overflow=5, pool_timeout=10,
+    )
+    assert engine.pool.size() == 20
+    assert engine.pool._max_overflow == 5
+    assert engine.pool._timeout == 10
+    with engine.connect() as conn:
+        assert conn.connection._client is not None
+    # The connection was returned to the pool, rather than closed.
+    assert engine.pool.checkedin() == 1
+    engine.dispose()
+
+
+def test_http_options(faux_conn):
+    with mock.patch(
+        "pybigquery._helpers.create_bigquery_client", wraps=FauxClient
+    ) as create_client:
+        with mock.patch("pybigquery._helpers.warm_up_client") as warm_up_client:
+            engine = sqlalchemy.create_engine(
+                "bigquery://myproject/mydataset?http_pool_size=50&http_warmup=4",
+                http_max_retries=3,
+                http_keepalive=60,
+            )
+            with engine.connect() as conn:
+                warm_up_client.assert_called_once_with(conn.connection._client, 4)
+            with engine.connect():
+                warm_up_client.assert_called_once()
+
+    _, kwargs = create_client.call_args
+    assert kwargs["http_pool_size"] == 50
+    assert kwargs["http_max_retries"] == 3
+    assert kwargs["http_keepalive"] == 60
+
+
+def test_http_options_in_url_override_even_when_zero(faux_conn):
+    with mock.patch(
+        "pybigquery._helpers.create_bigquery_client", wraps=FauxClient
+    ) as create_client:
+        with mock.patch("pybigquery._helpers.warm_up_client") as warm_up_client:
+            engine = sqlalchemy.create_engine(
+                "bigquery://myproject/mydataset?http_max_retries=0"
+                "&http_pool_size=0&http_keepalive=0&http_warmup=0",
+                http_pool_size=50,
+                http_max_retries=3,
+                http_keepalive=60,
+                http_warmup=4,
+            )
+            engine.connect().close()
+            warm_up_client.assert_not_called()
+
+    _, kwargs = create_client.call_args
+    assert kwargs["http_pool_size"] == 0
+    assert kwargs["http_max_retries"] == 0
+    assert kwargs["http_keepalive"] == 0
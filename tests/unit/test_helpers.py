@@ -4,10 +4,16 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+import datetime
+import functools
+import sys
+import threading
 from unittest import mock
 
+import google.api_core.exceptions
 import google.auth
 import google.auth.credentials
+import google.auth.exceptions
 from google.oauth2 import service_account
 import pytest
 
@@ -136,3 +142,207 @@ def test_create_bigquery_client_with_default_credentials_respects_project(
     )
 
     assert bqclient.project == "connection-url-project"
+
+
+@pytest.mark.parametrize(
+    "version,expected",
+    [("2.21.0", False), ("3.16.1", False), ("3.17.0", True), ("4.0.0rc1", True)],
+)
+def test_dbapi_keeps_query_rows(monkeypatch, module_under_test, version, expected):
+    monkeypatch.setattr("google.cloud.bigquery.__version__", version)
+    assert module_under_test.dbapi_keeps_query_rows() is expected
+
+
+def test_create_bigquery_storage_client_not_installed(monkeypatch, module_under_test):
+    monkeypatch.setitem(sys.modules, "google.cloud.bigquery_storage", None)
+    monkeypatch.delattr("google.cloud.bigquery_storage", raising=False)
+    client = mock.Mock()
+    assert module_under_test.create_bigquery_storage_client(client) is None
+
+
+def test_create_bigquery_storage_client(monkeypatch, module_under_test):
+    bigquery_storage = mock.Mock()
+    monkeypatch.setitem(sys.modules, "google.cloud.bigquery_storage", bigquery_storage)
+    monkeypatch.setattr(
+        "google.cloud.bigquery_storage", bigquery_storage, raising=False
+    )
+    client = mock.Mock()
+
+    bqstorage_client = module_under_test.create_bigquery_storage_client(client)
+
+    assert bqstorage_client is bigquery_storage.BigQueryReadClient.return_value
+    _, kwargs = bigquery_storage.BigQueryReadClient.call_args
+    assert kwargs["credentials"] is client._credentials
+    assert kwargs["client_info"].user_agent.startswith("sqlalchemy/")
+
+
+def test_create_bigquery_write_client_not_installed(monkeypatch, module_under_test):
+    monkeypatch.setitem(sys.modules, "google.cloud.bigquery_storage", None)
+    monkeypatch.delattr("google.cloud.bigquery_storage", raising=False)
+    with pytest.raises(ImportError, match="requires google-cloud-bigquery-storage"):
+        module_under_test.create_bigquery_write_client(mock.Mock())
+
+
+def test_create_bigquery_write_client(monkeypatch, module_under_test):
+    bigquery_storage = mock.Mock()
+    monkeypatch.setitem(sys.modules, "google.cloud.bigquery_storage", bigquery_storage)
+    monkeypatch.setattr(
+        "google.cloud.bigquery_storage", bigquery_storage, raising=False
+    )
+    client = mock.Mock()
+
+    write_client = module_under_test.create_bigquery_write_client(client)
+
+    assert write_client is bigquery_storage.BigQueryWriteClient.return_value
+    _, kwargs = bigquery_storage.BigQueryWriteClient.call_args
+    assert kwargs["credentials"] is client._credentials
+    assert kwargs["client_info"].user_agent.startswith("sqlalchemy/")
+
+
+def test_credentials_are_loaded_once(monkeypatch, module_under_test):
+    mock_default = mock.Mock(
+        return_value=(google.auth.credentials.AnonymousCredentials(), "default-project")
+    )
+    monkeypatch.setattr(google.auth, "default", mock_default)
+    mock_service_account = mock.create_autospec(service_account.Credentials)
+    mock_service_account.from_service_account_info.return_value = AnonymousCredentialsWithProject(
+        "service-account-project"
+    )
+    monkeypatch.setattr(service_account, "Credentials", mock_service_account)
+
+    cache = module_under_test.CredentialsCache()
+    create_client = functools.partial(
+        module_under_test.create_bigquery_client, credentials_cache=cache
+    )
+    client1 = create_client()
+    client2 = create_client(project_id="other-project")
+    assert client1._credentials is client2._credentials
+    mock_default.assert_called_once()
+
+    info = {"type": "service_account", "project_id": "service-account-project"}
+    client3 = create_client(credentials_info=info)
+    client4 = create_client(credentials_info=dict(info))
+    assert client3.project == "service-account-project"
+    assert client3._credentials is client4._credentials
+    assert client3._credentials is not client1._credentials
+    mock_service_account.from_service_account_info.assert_called_once()
+
+    # Other caches, e.g. of other engines, load their own credentials.
+    module_under_test.create_bigquery_client()
+    assert mock_default.call_count == 2
+
+
+def test_background_token_refresh_starts_once(monkeypatch, module_under_test):
+    credentials = google.auth.credentials.AnonymousCredentials()
+    monkeypatch.setattr(
+        google.auth, "default", mock.Mock(return_value=(credentials, "project"))
+    )
+    monkeypatch.setattr(module_under_test, "_TokenRefresher", mock.Mock())
+
+    cache = module_under_test.CredentialsCache()
+    cache.get(background_token_refresh=True)
+    cache.get(background_token_refresh=True)
+    module_under_test._TokenRefresher.assert_called_once_with(credentials)
+    refresher = module_under_test._TokenRefresher.return_value
+    refresher.start.assert_called_once_with()
+
+    cache.clear()
+    refresher.stop.assert_called_once_with()
+
+
+def test_token_refresher_delay(module_under_test):
+    credentials = mock.Mock(expiry=None)
+    refresher = module_under_test._TokenRefresher(credentials, request="request")
+    assert refresher.delay() == 0
+
+    now = module_under_test._utcnow()
+    credentials.expiry = now + datetime.timedelta(hours=1)
+    assert 3290 < refresher.delay() <= 3300
+
+    credentials.expiry = now + datetime.timedelta(minutes=1)
+    assert refresher.delay() == 0
+
+
+def test_token_refresher_refreshes_and_retries(module_under_test):
+    credentials = mock.Mock(expiry=None)
+    refreshed = threading.Event()
+
+    def refresh(request):
+        if credentials.refresh.call_count == 1:
+            raise google.auth.exceptions.RefreshError("try again")
+        credentials.expiry = module_under_test._utcnow() + datetime.timedelta(hours=1)
+        refreshed.set()
+
+    credentials.refresh.side_effect = refresh
+    refresher = module_under_test._TokenRefresher(
+        credentials, retry_interval=0.01, request="request"
+    )
+    refresher.start()
+    assert refreshed.wait(5)
+    refresher.stop()
+    refresher.join(5)
+    assert not refresher.is_alive()
+    credentials.refresh.assert_has_calls([mock.call("request")] * 2)
+    assert credentials.refresh.call_count == 2
+
+
+def test_create_bigquery_client_with_http_options(monkeypatch, module_under_test):
+    monkeypatch.setattr(
+        google.auth,
+        "default",
+        mock.Mock(
+            return_value=(google.auth.credentials.AnonymousCredentials(), "project")
+        ),
+    )
+    bqclient = module_under_test.create_bigquery_client(
+        http_pool_size=50, http_max_retries=3
+    )
+
+    adapter = bqclient._http.get_adapter("https://bigquery.googleapis.com")
+    assert isinstance(adapter, module_under_test._HTTPAdapter)
+    assert adapter._pool_maxsize == 50
+    assert adapter.max_retries.total == 3
+    assert adapter.socket_options is None
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 50
+    assert "socket_options" not in adapter.poolmanager.connection_pool_kw
+
+    # Without options, the client creates its own session.
+    bqclient = module_under_test.create_bigquery_client()
+    assert not isinstance(
+        bqclient._http.get_adapter("https://bigquery.googleapis.com"),
+        module_under_test._HTTPAdapter,
+    )
+
+
+@pytest.mark.parametrize("idle_option", ["TCP_KEEPIDLE", "TCP_KEEPALIVE", None])
+def test_create_http_session_with_keepalive(
+    monkeypatch, module_under_test, idle_option
+):
+    import socket
+
+    for name in "TCP_KEEPIDLE", "TCP_KEEPALIVE":
+        monkeypatch.delattr(socket, name, raising=False)
+    if idle_option:
+        monkeypatch.setattr(socket, idle_option, 42, raising=False)
+
+    session = module_under_test.create_http_session(
+        google.auth.credentials.AnonymousCredentials(), keepalive=60
+    )
+
+    adapter = session.get_adapter("https://bigquery.googleapis.com")
+    options = adapter.poolmanager.connection_pool_kw["socket_options"]
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+    assert ((socket.IPPROTO_TCP, 42, 60) in options) == bool(idle_option)
+
+
+def test_warm_up_client(module_under_test):
+    import requests.exceptions
+
+    client = mock.Mock()
+    client.list_datasets.side_effect = [
+        [],
+        google.api_core.exceptions.Forbidden("no"),
+        requests.exceptions.ConnectionError("no"),
+    ]
+    module_under_test.warm_up_client(client, 3)
+    client.list_datasets.assert_has_calls([mock.call(max_results=1)] * 3)
@@ -0,0 +1,259 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import google.api_core.exceptions
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery import _information_schema
+
+
+def column_rows(table_name, *columns, description=None):
+    rows = []
+    for position, column in enumerate(columns, 1):
+        column = dict(column)
+        paths = column.pop("paths", {column["column_name"]: None})
+        for path, path_description in paths.items():
+            row = dict(
+                table_name=table_name,
+                ordinal_position=position,
+                is_nullable="YES",
+                is_partitioning_column="NO",
+                clustering_ordinal_position=None,
+                field_path=path,
+                description=path_description,
+                table_description=description,
+            )
+            row.update(column)
+            rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize(
+    "data_type,expect",
+    [
+        ("INT64", ("INT64", "NULLABLE", ())),
+        ("STRING(10)", ("STRING", "NULLABLE", ())),
+        ("NUMERIC(10, 2)", ("NUMERIC", "NULLABLE", ())),
+        ("ARRAY<BIGNUMERIC(40)>", ("BIGNUMERIC", "REPEATED", ())),
+        ("ARRAY<STRING(10) NOT NULL>", ("STRING", "REPEATED", ())),
+        (
+            "STRUCT<a INT64 NOT NULL, `b c` ARRAY<STRING>>",
+            (
+                "RECORD",
+                "NULLABLE",
+                (("a", "INT64", "REQUIRED"), ("b c", "STRING", "REPEATED")),
+            ),
+        ),
+    ],
+)
+def test_parse_data_type(data_type, expect):
+    field = _information_schema.parse_data_type("x", data_type)
+    assert (
+        field.field_type,
+        field.mode,
+        tuple((f.name, f.field_type, f.mode) for f in field.fields),
+    ) == expect
+
+
+@pytest.mark.parametrize(
+    "data_type",
+    [
+        "STRUCT<a INT64",
+        "STRUCT<a INT64; b INT64>",
+        "ARRAY<INT64",
+        "INT64)",
+        "STRING(10",
+    ],
+)
+def test_parse_data_type_bad(data_type):
+    with pytest.raises(ValueError, match="Did not understand type"):
+        _information_schema.parse_data_type("x", data_type)
+
+
+def test_tables_from_rows():
+    from google.cloud.bigquery.dataset import DatasetReference
+
+    rows = (
+        column_rows(
+            "t1",
+            dict(column_name="id", data_type="INT64", is_nullable="NO"),
+            dict(
+                column_name="r",
+                data_type="STRUCT<i INT64, f FLOAT64>",
+                paths={"r": "a record", "r.i": "an int", "r.f": None},
+            ),
+            dict(
+                column_name="tm",
+                data_type="TIMESTAMP",
+                is_partitioning_column="YES",
+                clustering_ordinal_position=2,
+            ),
+            dict(
+                column_name="store", data_type="STRING", clustering_ordinal_position=1
+            ),
+            description='"special \\"table\\""',
+        )
+        + column_rows(
+            "t2",
+            dict(column_name="n", data_type="INT64", is_partitioning_column="YES"),
+        )
+        + column_rows(
+            "t3",
+            dict(
+                column_name="_PARTITIONTIME",
+                data_type="TIMESTAMP",
+                is_partitioning_column="YES",
+            ),
+            dict(column_name="x", data_type="STRING"),
+            description="'single-quoted'",
+        )
+        + column_rows(
+            "t4",
+            dict(column_name="x", data_type="STRING"),
+            dict(column_name="r", data_type="RANGE<DATE>"),
+        )
+    )
+
+    # t4's type isn't understood, so it's left to client.get_table().
+    t1, t2, t3 = _information_schema.tables_from_rows(DatasetReference("p", "d"), rows)
+
+    assert str(t1.reference) == "p.d.t1"
+    assert t1.description == 'special "table"'
+    assert [(f.name, f.field_type, f.mode, f.description) for f in t1.schema] == [
+        ("id", "INT64", "REQUIRED", None),
+        ("r", "RECORD", "NULLABLE", "a record"),
+        ("tm", "TIMESTAMP", "NULLABLE", None),
+        ("store", "STRING", "NULLABLE", None),
+    ]
+    assert [(f.name, f.description) for f in t1.schema[1].fields] == [
+        ("i", "an int"),
+        ("f", None),
+    ]
+    assert t1.time_partitioning.field == "tm"
+    assert t1.clustering_fields == ["store", "tm"]
+
+    # Integer-range partitioning isn't reported, like with client.get_table().
+    assert t2.time_partitioning is None
+    assert t2.clustering_fields is None
+    assert t2.description is None
+
+    # Ingestion-time partitioning
+    assert t3.time_partitioning.field is None
+    assert [f.name for f in t3.schema] == ["x"]
+    assert t3.description == "single-quoted"
+
+
+@pytest.fixture()
+def bulk_conn(faux_engine):
+    def make(**kw):
+        conn = faux_engine(bulk_reflection=True, **kw)
+        client = conn.connection._client
+        client.query = mock.Mock()
+        client.query.return_value.result.return_value = column_rows(
+            "t1", dict(column_name="x", data_type="INT64")
+        ) + column_rows(
+            "t2",
+            dict(column_name="y", data_type="STRING", clustering_ordinal_position=1),
+            description='"table two"',
+        )
+        return conn
+
+    return make
+
+
+def test_bulk_reflection_with_metadata_cache(bulk_conn):
+    conn = bulk_conn(metadata_cache_ttl=60)
+    client = conn.connection._client
+    dialect = conn.dialect
+
+    assert [c["name"] for c in dialect.get_columns(conn, "t1")] == ["x"]
+    assert [c["name"] for c in dialect.get_columns(conn, "t2")] == ["y"]
+    assert dialect.get_indexes(conn, "t2") == [
+        dict(name="clustering", column_names=["y"], unique=False)
+    ]
+    assert dialect.get_table_comment(conn, "t2") == dict(text="table two")
+
+    client.query.assert_called_once()
+    assert "`myproject.mydataset`.INFORMATION_SCHEMA.COLUMNS" in (
+        client.query.call_args[0][0]
+    )
+    client.get_table.assert_not_called()
+
+
+def test_bulk_reflection_with_inspectors(bulk_conn):
+    conn = bulk_conn(metadata_cache_ttl=60)
+    client = conn.connection._client
+
+    # Table reflection uses a new Inspector for each table.
+    for _ in range(2):
+        inspector = sqlalchemy.inspect(conn)
+        assert [c["name"] for c in inspector.get_columns("t1")] == ["x"]
+        assert [c["name"] for c in inspector.get_columns("t2")] == ["y"]
+
+    client.query.assert_called_once()
+    client.get_table.assert_not_called()
+
+
+def test_bulk_reflection_requires_metadata_cache(bulk_conn):
+    with pytest.raises(ValueError, match="requires metadata_cache_ttl"):
+        bulk_conn()
+
+
+def test_bulk_reflection_falls_back_to_get_table(bulk_conn):
+    conn = bulk_conn(metadata_cache_ttl=60)
+    conn.execute("create table t3 (z INT64)")
+    client = conn.connection._client
+    dialect = conn.dialect
+
+    assert [c["name"] for c in dialect.get_columns(conn, "t3")] == ["z"]
+    assert not dialect.has_table(conn, "t4")
+    client.query.assert_called_once()
+    assert client.get_table.call_count == 2
+
+
+def test_bulk_reflection_of_unknown_types(bulk_conn):
+    conn = bulk_conn(metadata_cache_ttl=60)
+    conn.execute("create table t3 (z INT64)")
+    client = conn.connection._client
+    client.query.return_value.result.return_value += column_rows(
+        "t3", dict(column_name="z", data_type="RANGE<DATE>")
+    )
+    dialect = conn.dialect
+
+    assert [c["name"] for c in dialect.get_columns(conn, "t3")] == ["z"]
+    assert [c["name"] for c in dialect.get_columns(conn, "t1")] == ["x"]
+    client.query.assert_called_once()
+    client.get_table.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "error", [google.api_core.exceptions.Forbidden("nope"), ValueError("nope")]
+)
+def test_bulk_reflection_query_fails(bulk_conn, error):
+    conn = bulk_conn(metadata_cache_ttl=60)
+    conn.execute("create table t3 (z INT64)")
+    client = conn.connection._client
+    client.query.side_effect = error
+
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "t3")] == ["z"]
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "t3")] == ["z"]
+    client.query.assert_called_once()
+    client.get_table.assert_called_once()
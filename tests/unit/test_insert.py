@@ -0,0 +1,475 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import decimal
+
+import google.api_core.exceptions
+from google.cloud.bigquery import dbapi
+from google.cloud.bigquery.schema import SchemaField
+from google.cloud.bigquery.table import Table
+import mock
+import pytest
+import sqlalchemy
+
+from conftest import setup_table
+from pybigquery import _insert
+from pybigquery._insert_buffer import InsertBuffer
+
+
+def test_json_value():
+    assert _insert.json_value(
+        dict(
+            d=datetime.date(2021, 1, 2),
+            dt=datetime.datetime(2021, 1, 2, 3, 4, 5, 6),
+            t=datetime.time(3, 4),
+            n=decimal.Decimal("1.50"),
+            b=b"\xff",
+            a=[1, (2.5, None)],
+            s="x",
+        )
+    ) == dict(
+        d="2021-01-02",
+        dt="2021-01-02T03:04:05.000006",
+        t="03:04:00",
+        n="1.50",
+        b="/w==",
+        a=[1, [2.5, None]],
+        s="x",
+    )
+
+
+def test_load_rows_in_batches():
+    client = mock.Mock()
+    table = Table("p.d.t", schema=[SchemaField("x", "DATE")])
+    rows = [dict(x=datetime.date(2021, 1, day)) for day in range(1, 6)]
+    assert _insert.load_rows(client, table, rows, 2) == 5
+    batches = [call[0][0] for call in client.load_table_from_json.call_args_list]
+    assert batches == [
+        [dict(x="2021-01-01"), dict(x="2021-01-02")],
+        [dict(x="2021-01-03"), dict(x="2021-01-04")],
+        [dict(x="2021-01-05")],
+    ]
+    [_, destination], kw = client.load_table_from_json.call_args
+    assert destination == table.reference
+    assert kw["job_config"].schema == table.schema
+    assert kw["job_config"].write_disposition == "WRITE_APPEND"
+    assert client.load_table_from_json.return_value.result.call_count == 3
+
+
+def select_people(faux_conn, people):
+    return faux_conn.execute(
+        sqlalchemy.select([people.c.name_key, people.c.age]).order_by(people.c.age)
+    ).fetchall()
+
+
+def test_executemany_insert_is_loaded(faux_conn, people):
+    client = faux_conn.connection.connection._client
+    faux_conn.dialect.insert_mode = "load"
+    faux_conn.dialect.load_batch_size = 2
+    executed = len(faux_conn.test_data["execute"])
+    with mock.patch.object(
+        client, "load_table_from_json", wraps=client.load_table_from_json
+    ) as load:
+        result = faux_conn.execute(
+            people.insert(),
+            [
+                dict(name_key="a", age=1),
+                dict(name_key="b", age=2),
+                dict(name_key=None, age=3),
+            ],
+        )
+
+    assert result.rowcount == 3
+    assert load.call_count == 2
+    assert len(faux_conn.test_data["execute"]) == executed
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2), (None, 3)]
+
+
+def test_insert_mode_dml_is_the_default(faux_conn, people):
+    assert faux_conn.dialect.insert_mode == "dml"
+    executed = len(faux_conn.test_data["execute"])
+    faux_conn.execute(
+        people.insert(), [dict(name_key="a", age=1), dict(name_key="b", age=2)]
+    )
+    assert len(faux_conn.test_data["execute"]) == executed + 2
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2)]
+
+
+def test_insert_mode_dml(faux_conn, people):
+    faux_conn.dialect.insert_mode = "load"
+    executed = len(faux_conn.test_data["execute"])
+    faux_conn.execution_options(bigquery_insert_mode="dml").execute(
+        people.insert(), [dict(name_key="a", age=1), dict(name_key="b", age=2)]
+    )
+    assert len(faux_conn.test_data["execute"]) == executed + 2
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2)]
+
+
+def test_inserts_of_sql_expressions_use_dml(faux_conn):
+    table = setup_table(
+        faux_conn,
+        "t",
+        sqlalchemy.Column("x", sqlalchemy.Integer),
+        sqlalchemy.Column("y", sqlalchemy.Integer, default=sqlalchemy.text("42")),
+    )
+    faux_conn.dialect.insert_mode = "load"
+    faux_conn.execute(table.insert(), [dict(x=1), dict(x=2)])
+    assert faux_conn.test_data["execute"][-1] == (
+        "INSERT INTO `t` (`x`, `y`) VALUES (%(x:INT64)s, 42)",
+        {"x": 2},
+    )
+
+
+def test_executemany_of_strings_uses_dml(faux_conn, people):
+    faux_conn.dialect.insert_mode = "load"
+    faux_conn.execute(
+        "insert into people (name, age) values (%(name)s, %(age)s)",
+        [dict(name="a", age=1), dict(name="b", age=2)],
+    )
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2)]
+
+
+def test_load_errors_are_database_errors(faux_conn, people):
+    client = faux_conn.connection.connection._client
+    with mock.patch.object(
+        client,
+        "load_table_from_json",
+        side_effect=google.api_core.exceptions.BadRequest("bad row"),
+    ):
+        with pytest.raises(sqlalchemy.exc.DatabaseError, match="bad row"):
+            faux_conn.execution_options(bigquery_insert_mode="load").execute(
+                people.insert(), [dict(age=1), dict(age=2)]
+            )
+
+
+def test_insert_mode_unnest(faux_conn, people):
+    faux_conn.dialect.insert_mode = "unnest"
+    result = faux_conn.execute(
+        people.insert(),
+        [
+            dict(name_key="a", age=1),
+            dict(name_key="b", age=2),
+            dict(name_key=None, age=3),
+        ],
+    )
+    assert result.rowcount == 3
+    assert faux_conn.test_data["execute"][-1] == (
+        "INSERT INTO `people` (`name`, `age`) SELECT * FROM"
+        " UNNEST(%(rows:ARRAY<STRUCT<c0 STRING, c1 INT64>>)s)",
+        {"rows": [dict(c0="a", c1=1), dict(c0="b", c1=2), dict(c0=None, c1=3),]},
+    )
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2), (None, 3)]
+
+
+def test_insert_mode_unnest_in_batches(faux_conn, people):
+    rows = [dict(name_key="x" * 100, age=i) for i in range(10)]
+    executed = len(faux_conn.test_data["execute"])
+    with mock.patch("pybigquery._insert.MAX_QUERY_PARAMETER_BYTES", 500):
+        result = faux_conn.execution_options(bigquery_insert_mode="unnest").execute(
+            people.insert(), rows
+        )
+    assert result.rowcount == 10
+    batches = [
+        params["rows"] for _, params in faux_conn.test_data["execute"][executed:]
+    ]
+    assert [len(batch) for batch in batches] == [2, 2, 2, 2, 2]
+    assert len(select_people(faux_conn, people)) == 10
+
+
+def test_insert_mode_unnest_needs_column_types(faux_conn):
+    faux_conn.ex("create table t (x, y)")
+    table = sqlalchemy.table("t", sqlalchemy.column("x"), sqlalchemy.column("y"))
+    faux_conn.execution_options(bigquery_insert_mode="unnest").execute(
+        table.insert(), [dict(x=1, y=2), dict(x=3, y=4)]
+    )
+    assert faux_conn.test_data["execute"][-1] == (
+        "INSERT INTO `t` (`x`, `y`) VALUES (%(x)s, %(y)s)",
+        {"x": 3, "y": 4},
+    )
+
+
+def test_row_id():
+    assert _insert.row_id(0, dict(a=1, b="x")) == _insert.row_id(0, dict(b="x", a=1))
+    assert _insert.row_id(0, dict(a=1)) != _insert.row_id(1, dict(a=1))
+    assert _insert.row_id(0, dict(a=1)) != _insert.row_id(0, dict(a=2))
+    date = datetime.date(2021, 1, 2)
+    assert _insert.row_id(0, dict(d=date)) == _insert.row_id(0, dict(d="2021-01-02"))
+
+
+def test_stream_rows_in_batches():
+    client = mock.Mock()
+    client.insert_rows_json.return_value = []
+    rows = [dict(x=datetime.date(2021, 1, i)) for i in range(1, 6)]
+    # {"x": "2021-01-01"} is 19 bytes, plus 100 for the insertId and framing.
+    assert _insert.stream_rows(client, "t", rows, 2, 1000) == 5
+    assert _insert.stream_rows(client, "t", rows, 1000, 238) == 5
+    assert _insert.stream_rows(client, "t", [], 2, 1000) == 0
+
+    calls = client.insert_rows_json.call_args_list
+    assert [len(args[1]) for args, _ in calls] == [2, 2, 1, 2, 2, 1]
+    assert calls[0][0] == ("t", [dict(x="2021-01-01"), dict(x="2021-01-02")])
+    assert calls[2][1]["skip_invalid_rows"]
+    # Random insertIds, so that rows inserted again aren't dropped.
+    row_ids = [row_id for _, kw in calls for row_id in kw["row_ids"]]
+    assert len(set(row_ids)) == 10
+
+
+def test_stream_rows_with_row_ids():
+    client = mock.Mock()
+    client.insert_rows_json.return_value = []
+    rows = [dict(x=1), dict(x=2), dict(x=3)]
+    assert _insert.stream_rows(client, "t", rows, 2, 1000, ["a", "b", "c"]) == 3
+    calls = client.insert_rows_json.call_args_list
+    assert [kw["row_ids"] for _, kw in calls] == [["a", "b"], ["c"]]
+
+
+def test_stream_rows_reports_rejected_rows():
+    client = mock.Mock()
+    client.insert_rows_json.side_effect = [
+        [],
+        [{"index": 1, "errors": [{"reason": "invalid"}]}],
+    ]
+    with pytest.raises(_insert.InsertRowsError) as exc_info:
+        _insert.stream_rows(client, "t", [dict(x=i) for i in range(4)], 2, 1000)
+    assert exc_info.value.errors == [{"index": 3, "errors": [{"reason": "invalid"}]}]
+    assert exc_info.value.rowcount == 3
+
+
+def test_insert_mode_streaming(faux_conn, people):
+    client = faux_conn.connection.connection._client
+    executed = len(faux_conn.test_data["execute"])
+    with mock.patch.object(
+        client, "insert_rows_json", wraps=client.insert_rows_json
+    ) as insert_rows_json:
+        result = faux_conn.execution_options(bigquery_insert_mode="streaming").execute(
+            people.insert(), [dict(name_key="a", age=1), dict(name_key="a", age=1)],
+        )
+
+    assert result.rowcount == 2
+    assert len(faux_conn.test_data["execute"]) == executed
+    [_, json_rows], kw = insert_rows_json.call_args
+    assert json_rows == [dict(name="a", age=1)] * 2
+    first, second = kw["row_ids"]
+    assert first != second
+    assert select_people(faux_conn, people) == [("a", 1), ("a", 1)]
+
+
+def test_insert_mode_streaming_content_ids(faux_conn, people):
+    client = faux_conn.connection.connection._client
+    faux_conn.dialect.streaming_content_ids = True
+    rows = [dict(name_key="a", age=1), dict(name_key="a", age=1)]
+    with mock.patch.object(
+        client, "insert_rows_json", wraps=client.insert_rows_json
+    ) as insert_rows_json:
+        for _ in range(2):
+            faux_conn.execution_options(bigquery_insert_mode="streaming").execute(
+                people.insert(), rows
+            )
+
+    # Running the insert again sends the same ids.
+    first, second = [kw["row_ids"] for _, kw in insert_rows_json.call_args_list]
+    assert (
+        first
+        == second
+        == [
+            _insert.row_id(0, dict(name="a", age=1)),
+            _insert.row_id(1, dict(name="a", age=1)),
+        ]
+    )
+
+
+def test_insert_mode_streaming_rejected_rows(faux_conn):
+    table = setup_table(
+        faux_conn,
+        "t",
+        sqlalchemy.Column("x", sqlalchemy.Integer),
+        sqlalchemy.Column("y", sqlalchemy.Integer, nullable=False),
+    )
+    faux_conn.dialect.insert_mode = "streaming"
+    with pytest.raises(sqlalchemy.exc.DatabaseError) as exc_info:
+        faux_conn.execute(
+            table.insert(), [dict(x=1, y=1), dict(x=2, y=None), dict(x=3, y=3)]
+        )
+
+    error = exc_info.value.orig
+    assert isinstance(error, _insert.InsertRowsError)
+    assert error.rowcount == 2
+    [rejected] = error.errors
+    assert rejected["index"] == 1
+    assert "NOT NULL" in rejected["errors"][0]["message"]
+    assert faux_conn.execute(sqlalchemy.select([table.c.x])).fetchall() == [
+        (1,),
+        (3,),
+    ]
+
+
+def test_parameter_size():
+    assert _insert.parameter_size(None) == 36
+    assert _insert.parameter_size(dict(c0="ab", c1=[1, 22])) == (
+        32 + (2 + 32 + 4) + (2 + 32 + (32 + 1) + (32 + 2))
+    )
+
+
+def test_parameter_batches():
+    rows = [dict(c0=i) for i in range(5)]  # 2 + 32 + 32 + 1 = 67 bytes each
+    assert list(_insert.parameter_batches(rows, 134)) == [
+        rows[:2],
+        rows[2:4],
+        rows[4:],
+    ]
+    assert list(_insert.parameter_batches(rows, 1)) == [[row] for row in rows]
+    assert list(_insert.parameter_batches([], 1)) == []
+
+
+def test_invalid_insert_mode(faux_conn, people):
+    with pytest.raises(ValueError, match="invalid insert_mode: nope"):
+        faux_conn.execution_options(bigquery_insert_mode="nope").execute(
+            people.insert(), [dict(age=1), dict(age=2)]
+        )
+    with pytest.raises(ValueError, match="invalid insert_mode: nope"):
+        sqlalchemy.create_engine("bigquery://myproject", insert_mode="nope")
+    with pytest.raises(ValueError, match="invalid insert_mode: nope"):
+        sqlalchemy.create_engine("bigquery://myproject/mydataset?insert_mode=nope")
+
+
+def test_insert_mode_in_url(faux_conn):
+    engine = sqlalchemy.create_engine("bigquery://myproject/mydataset?insert_mode=dml")
+    assert engine.dialect.insert_mode == "dml"
+
+
+@pytest.fixture()
+def insert_buffer(faux_conn):
+    dialect = faux_conn.dialect
+    dialect.insert_mode = "load"
+    dialect.insert_buffer = InsertBuffer(dialect._flush_insert_buffer, 1000, 2, 100)
+    yield dialect.insert_buffer
+    dialect.insert_buffer.close()
+
+
+def test_single_row_inserts_are_buffered(faux_conn, people, insert_buffer):
+    executed = len(faux_conn.test_data["execute"])
+    first = faux_conn.execute(people.insert(), dict(name_key="a", age=1))
+    assert first.rowcount == 1
+    assert select_people(faux_conn, people) == []
+
+    second = faux_conn.execute(people.insert(), dict(name_key="b", age=2))
+    first.context.insert_future.result(timeout=5)
+    second.context.insert_future.result(timeout=5)
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2)]
+    assert len(faux_conn.test_data["execute"]) == executed + 2  # The selects.
+
+
+def test_buffered_inserts_use_append_modes(faux_conn, people, insert_buffer):
+    client = faux_conn.connection.connection._client
+    faux_conn.dialect.insert_mode = "streaming"
+    with mock.patch.object(
+        client, "insert_rows_json", wraps=client.insert_rows_json
+    ) as insert_rows_json:
+        faux_conn.execute(people.insert(), dict(name_key="a", age=1))
+        insert_buffer.flush()
+    insert_rows_json.assert_called_once()
+
+    faux_conn.dialect.insert_mode = "load"
+    with mock.patch.object(
+        client, "load_table_from_json", wraps=client.load_table_from_json
+    ) as load, mock.patch.object(
+        client, "insert_rows_json", wraps=client.insert_rows_json
+    ) as insert_rows_json:
+        faux_conn.execution_options(bigquery_insert_mode="streaming").execute(
+            people.insert(), dict(name_key="b", age=2)
+        )
+        faux_conn.execute(people.insert(), dict(name_key="c", age=3))
+        insert_buffer.flush()
+    load.assert_called_once()
+    insert_rows_json.assert_called_once()
+    assert select_people(faux_conn, people) == [("a", 1), ("b", 2), ("c", 3)]
+
+
+def test_buffered_streaming_inserts_are_not_deduplicated(
+    faux_conn, people, insert_buffer
+):
+    client = faux_conn.connection.connection._client
+    faux_conn.dialect.insert_mode = "streaming"
+    with mock.patch.object(
+        client, "insert_rows_json", wraps=client.insert_rows_json
+    ) as insert_rows_json:
+        for _ in range(2):
+            faux_conn.execute(people.insert(), dict(name_key="a", age=1))
+            insert_buffer.flush()
+    [first], [second] = [call[1]["row_ids"] for call in insert_rows_json.call_args_list]
+    assert first != second
+
+
+def test_buffered_inserts_in_other_modes_arent_buffered(
+    faux_conn, people, insert_buffer
+):
+    for mode in "dml", "unnest":
+        result = faux_conn.execution_options(bigquery_insert_mode=mode).execute(
+            people.insert(), dict(name_key=mode, age=1)
+        )
+        assert not hasattr(result.context, "insert_future")
+    assert select_people(faux_conn, people) == [("dml", 1), ("unnest", 1)]
+
+    with pytest.raises(ValueError, match="invalid insert_mode: nope"):
+        faux_conn.execution_options(bigquery_insert_mode="nope").execute(
+            people.insert(), dict(name_key="a", age=1)
+        )
+
+
+def test_buffered_insert_errors(faux_conn, people, insert_buffer):
+    client = faux_conn.connection.connection._client
+    with mock.patch.object(
+        client,
+        "load_table_from_json",
+        side_effect=google.api_core.exceptions.BadRequest("bad row"),
+    ):
+        result = faux_conn.execute(people.insert(), dict(name_key="a", age=1))
+        with pytest.raises(ValueError, match="buffered rows failed") as exc_info:
+            insert_buffer.flush()
+    assert isinstance(exc_info.value.__cause__, dbapi.DatabaseError)
+    with pytest.raises(dbapi.DatabaseError, match="bad row"):
+        result.context.insert_future.result()
+
+
+def test_inserts_that_arent_buffered(faux_conn, people, insert_buffer):
+    faux_conn.execution_options(bigquery_buffer_inserts=False).execute(
+        people.insert(), dict(name_key="a", age=1)
+    )
+    faux_conn.execute(
+        people.insert().values(name_key=sqlalchemy.literal("b") + "c", age=2)
+    )
+    assert select_people(faux_conn, people) == [("a", 1), ("bc", 2)]
+
+
+def test_insert_buffer_engine_options(faux_conn):
+    engine = sqlalchemy.create_engine(
+        "bigquery://myproject/mydataset?insert_mode=streaming",
+        insert_buffer_interval=0.5,
+        insert_buffer_size=50,
+        insert_buffer_max_rows=1000,
+    )
+    buffer = engine.dialect.insert_buffer
+    assert (buffer.interval, buffer.batch_size, buffer.max_rows) == (0.5, 50, 1000)
+    assert sqlalchemy.create_engine("bigquery://").dialect.insert_buffer is None
+
+    with pytest.raises(ValueError, match="requires insert_mode to be one of: load"):
+        sqlalchemy.create_engine(
+            "bigquery://myproject/mydataset", insert_buffer_interval=0.5
+        )
@@ -0,0 +1,197 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import threading
+
+import mock
+import pytest
+
+from pybigquery._insert_buffer import InsertBuffer
+
+
+@pytest.fixture(autouse=True)
+def atexit_register():
+    with mock.patch("atexit.register") as register:
+        yield register
+
+
+class Flushes(object):
+    def __init__(self):
+        self.calls = []
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, key, rows):
+        self.release.wait()
+        self.calls.append((key, list(rows)))
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture()
+def flushes():
+    return Flushes()
+
+
+def test_flush_full_batches(flushes, atexit_register):
+    buffer = InsertBuffer(flushes, 1000, 2, 100)
+    futures = [buffer.add("a", 1), buffer.add("b", 2), buffer.add("a", 3)]
+    futures[0].result(timeout=5)
+    futures[2].result(timeout=5)
+    assert flushes.calls == [("a", [1, 3])]
+    assert not futures[1].done()
+    atexit_register.assert_called_once_with(buffer.close)
+    buffer.close()
+    assert futures[1].done()
+    assert flushes.calls == [("a", [1, 3]), ("b", [2])]
+
+
+def test_flush_after_interval(flushes):
+    buffer = InsertBuffer(flushes, 0.01, 100, 100)
+    buffer.add("a", 1).result(timeout=5)
+    buffer.add("a", 2).result(timeout=5)
+    assert flushes.calls == [("a", [1]), ("a", [2])]
+    buffer.close()
+
+
+def test_flush(flushes):
+    buffer = InsertBuffer(flushes, 1000, 100, 100)
+    futures = [buffer.add("a", 1), buffer.add("b", 2)]
+    buffer.flush()
+    assert all(future.done() for future in futures)
+    assert sorted(flushes.calls) == [("a", [1]), ("b", [2])]
+    buffer.flush()  # Nothing to flush.
+    buffer.close()
+
+
+def test_flush_errors_are_set_on_futures(flushes, caplog):
+    flushes.error = ValueError("bad rows")
+    buffer = InsertBuffer(flushes, 1000, 2, 100)
+    futures = [buffer.add("a", 1), buffer.add("a", 2)]
+    for future in futures:
+        with pytest.raises(ValueError, match="bad rows"):
+            future.result(timeout=5)
+    [record] = caplog.records
+    assert record.getMessage() == "Failed to append 2 buffered rows"
+    assert record.exc_info[1] is flushes.error
+
+    # The next row isn't added, so that the failure isn't missed.
+    with pytest.raises(ValueError, match="buffered rows failed") as exc_info:
+        buffer.add("a", 3)
+    assert exc_info.value.__cause__ is flushes.error
+
+    # The buffer keeps going.
+    flushes.error = None
+    buffer.add("a", 3)
+    buffer.add("a", 4).result(timeout=5)
+    buffer.close()
+    assert flushes.calls[-1] == ("a", [3, 4])
+
+
+def test_flush_errors_are_raised_by_flush_and_close(flushes):
+    error = flushes.error = ValueError("bad rows")
+    buffer = InsertBuffer(flushes, 1000, 100, 100)
+    buffer.add("a", 1)
+    with pytest.raises(ValueError, match="buffered rows failed") as exc_info:
+        buffer.flush()
+    assert exc_info.value.__cause__ is error
+    buffer.flush()  # Each failure is raised once.
+
+    buffer.add("a", 2)
+    with pytest.raises(ValueError, match="buffered rows failed") as exc_info:
+        buffer.close()
+    assert exc_info.value.__cause__ is error
+
+
+def test_adding_blocks_when_full(flushes):
+    flushes.release.clear()
+    buffer = InsertBuffer(flushes, 1000, 1, 1)
+    first = buffer.add("a", 1)
+    added = []
+    thread = threading.Thread(target=lambda: added.append(buffer.add("a", 2)))
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive()
+    assert not added
+
+    flushes.release.set()
+    thread.join(5)
+    first.result(timeout=5)
+    added[0].result(timeout=5)
+    assert flushes.calls == [("a", [1]), ("a", [2])]
+    buffer.close()
+
+
+def test_close(flushes):
+    buffer = InsertBuffer(flushes, 1000, 100, 100)
+    buffer.close()  # Nothing was ever added.
+    with pytest.raises(ValueError, match="insert buffer is closed"):
+        buffer.add("a", 1)
+
+
+def test_cancelled_futures(flushes):
+    flushes.release.clear()
+    buffer = InsertBuffer(flushes, 1000, 1, 100)
+    first = buffer.add("a", 1)
+    second = buffer.add("a", 2)
+    assert second.cancel()
+    flushes.release.set()
+    first.result(timeout=5)
+    buffer.add("a", 3).result(timeout=5)
+    # The cancelled row was flushed anyway, but its future left alone.
+    assert [row for _, rows in flushes.calls for row in rows] == [1, 2, 3]
+    assert second.cancelled()
+    buffer.close()
+
+
+class Stop(BaseException):
+    pass
+
+
+def test_failed_thread(flushes):
+    flushes.release.clear()
+    flushes.error = Stop()
+    buffer = InsertBuffer(flushes, 1000, 1, 2)
+    first = buffer.add("a", 1)
+    second = buffer.add("b", 2)
+    errors = []
+
+    def add():
+        try:
+            buffer.add("a", 3)
+        except ValueError as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=add)
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive()  # Waiting for room.
+
+    flushes.release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert isinstance(errors[0].__cause__, Stop)
+    for future in first, second:
+        with pytest.raises(Stop):
+            future.result(timeout=5)
+    with pytest.raises(ValueError, match="insert buffer failed"):
+        buffer.add("a", 4)
+    buffer.flush()
+    buffer.close()
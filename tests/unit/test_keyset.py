@@ -0,0 +1,198 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+
+import google.api_core.exceptions
+from google.cloud.bigquery import dbapi
+from google.cloud.bigquery.dataset import DatasetReference
+import mock
+import pytest
+import sqlalchemy
+
+from conftest import setup_table
+from pybigquery import _keyset
+
+
+@pytest.fixture()
+def keys_table(faux_conn):
+    faux_conn.dialect.keyset_threshold = 3
+    return setup_table(
+        faux_conn,
+        "t",
+        sqlalchemy.Column("id", sqlalchemy.Integer),
+        initial_data=[dict(id=i) for i in range(5)],
+    )
+
+
+def keyset_tables(faux_conn):
+    return [
+        name
+        for [name] in faux_conn.connection.connection.connection.execute(
+            "select name from sqlite_master"
+        )
+        if _keyset.KEYSET_TABLE_PREFIX in name
+    ]
+
+
+def test_large_in_list_is_semi_joined(faux_conn, keys_table):
+    client = faux_conn.connection.connection._client
+    with mock.patch.object(client, "delete_table", wraps=client.delete_table) as drop:
+        rows = faux_conn.execute(
+            sqlalchemy.select([keys_table.c.id])
+            .where(keys_table.c.id.in_(sqlalchemy.bindparam("q", expanding=True)))
+            .order_by(keys_table.c.id),
+            dict(q=[1, 3, 4, 9]),
+        ).fetchall()
+
+    assert [id for [id] in rows] == [1, 3, 4]
+    operation, parameters = faux_conn.test_data["execute"][-1]
+    [[table_ref], _] = drop.call_args
+    assert table_ref.project == "myproject"
+    assert table_ref.dataset_id == "mydataset"
+    assert operation == (
+        "SELECT `t`.`id` \nFROM `t` \nWHERE `t`.`id` IN"
+        " (SELECT key FROM `myproject.mydataset.{}`) ORDER BY `t`.`id`".format(
+            table_ref.table_id
+        )
+    )
+    assert parameters == {}
+    assert keyset_tables(faux_conn) == []
+
+
+def test_small_in_list_is_bound(faux_conn, keys_table):
+    rows = faux_conn.execute(
+        sqlalchemy.select([keys_table.c.id]).where(
+            keys_table.c.id.notin_(sqlalchemy.bindparam("q", expanding=True))
+        ),
+        dict(q=[0, 1]),
+    ).fetchall()
+    assert sorted(id for [id] in rows) == [2, 3, 4]
+    assert faux_conn.test_data["execute"][-1][1] == {"q": [0, 1]}
+
+
+def test_keyset_dataset(faux_conn, keys_table):
+    faux_conn.dialect.keyset_dataset = "otherproject.keys"
+    client = faux_conn.connection.connection._client
+    with mock.patch.object(client, "delete_table", wraps=client.delete_table) as drop:
+        faux_conn.execute(
+            sqlalchemy.select([keys_table.c.id]).where(
+                keys_table.c.id.notin_(sqlalchemy.bindparam("q", expanding=True))
+            ),
+            dict(q=[0, 1, 2]),
+        ).fetchall()
+    [[table_ref], _] = drop.call_args
+    assert (table_ref.project, table_ref.dataset_id) == ("otherproject", "keys")
+
+
+def test_keyset_is_dropped_when_query_fails(faux_conn, keys_table):
+    statement = sqlalchemy.select([keys_table.c.id]).where(
+        keys_table.c.id.in_(sqlalchemy.bindparam("q", expanding=True))
+    )
+    with mock.patch("fauxdbi.Cursor.execute", side_effect=dbapi.DatabaseError("nope")):
+        with pytest.raises(sqlalchemy.exc.DatabaseError):
+            faux_conn.execute(statement, dict(q=[1, 2, 3]))
+    assert keyset_tables(faux_conn) == []
+
+
+def test_keysets_are_dropped_when_upload_fails(faux_conn, keys_table):
+    client = faux_conn.connection.connection._client
+    uploaded = []
+
+    def upload_keyset(client, dataset_ref, field_type, keys):
+        if uploaded:
+            raise google.api_core.exceptions.BadRequest("nope")
+        uploaded.append(dataset_ref.table("keys"))
+        return uploaded[-1]
+
+    statement = sqlalchemy.select([keys_table.c.id]).where(
+        keys_table.c.id.in_(sqlalchemy.bindparam("q", expanding=True))
+        | keys_table.c.id.in_(sqlalchemy.bindparam("r", expanding=True))
+    )
+    with mock.patch("pybigquery._keyset.upload_keyset", upload_keyset):
+        with mock.patch.object(client, "delete_table") as drop:
+            with pytest.raises(google.api_core.exceptions.BadRequest):
+                faux_conn.execute(statement, dict(q=[1, 2, 3], r=[1, 2, 3]))
+    drop.assert_called_once_with(uploaded[0], not_found_ok=True)
+
+
+def test_executemany_is_not_semi_joined(faux_conn, keys_table):
+    faux_conn.execute(
+        keys_table.delete().where(
+            keys_table.c.id.in_(sqlalchemy.bindparam("q", expanding=True))
+        ),
+        [dict(q=[0, 1, 2]), dict(q=[3])],
+    )
+    assert faux_conn.test_data["execute"][-1][1] == {"q": [3]}
+    assert keyset_tables(faux_conn) == []
+
+
+def test_keyset_threshold_requires_a_dataset(faux_conn):
+    with pytest.raises(ValueError, match="keyset_threshold requires keyset_dataset"):
+        sqlalchemy.create_engine("bigquery://myproject", keyset_threshold=10)
+
+
+def test_upload_keyset():
+    client = mock.Mock()
+    client.create_table.side_effect = lambda table: table
+    dataset_ref = DatasetReference("p", "d")
+    before = datetime.datetime.now(datetime.timezone.utc)
+
+    table_ref = _keyset.upload_keyset(
+        client, dataset_ref, "BYTES", [b"\x00", None, b"x,y"]
+    )
+
+    [[table], _] = client.create_table.call_args
+    assert table.reference == table_ref
+    assert table_ref.dataset_id == "d"
+    assert table_ref.table_id.startswith(_keyset.KEYSET_TABLE_PREFIX)
+    # The API stores expiration times in milliseconds.
+    assert table.expires > (
+        before + _keyset.KEYSET_TABLE_LIFETIME - datetime.timedelta(milliseconds=1)
+    )
+    assert [(f.name, f.field_type) for f in table.schema] == [("key", "BYTES")]
+    [[data, ref], kw] = client.load_table_from_file.call_args
+    assert ref == table_ref
+    assert data.read() == b"AA==\r\neCx5\r\n"
+    assert kw["job_config"].source_format == "CSV"
+    assert kw["job_config"].allow_quoted_newlines
+    client.load_table_from_file.return_value.result.assert_called_once_with()
+
+
+def test_csv_file_quotes_values():
+    data = _keyset._csv_file(["a,b", "", "c\nd", True, 1])
+    assert data.read() == b'"a,b"\r\n""\r\n"c\nd"\r\ntrue\r\n1\r\n'
+
+
+def test_upload_keyset_drops_table_when_load_fails():
+    client = mock.Mock()
+    client.create_table.side_effect = lambda table: table
+    client.load_table_from_file.return_value.result.side_effect = google.api_core.exceptions.BadRequest(
+        "bad keys"
+    )
+    with pytest.raises(google.api_core.exceptions.BadRequest):
+        _keyset.upload_keyset(client, DatasetReference("p", "d"), "INT64", [1])
+    [[table], _] = client.create_table.call_args
+    client.delete_table.assert_called_once_with(table.reference, not_found_ok=True)
+
+
+def test_drop_keyset_ignores_errors():
+    client = mock.Mock()
+    client.delete_table.side_effect = google.api_core.exceptions.Forbidden("no")
+    _keyset.drop_keyset(client, DatasetReference("p", "d").table("t"))
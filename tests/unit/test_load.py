@@ -0,0 +1,102 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import io
+
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery.load import copy_from, LoadStatistics
+
+
+def test_copy_from_file(faux_conn, people, load_table_from_file):
+    source = io.BytesIO(b"a,1\nb,2\n")
+
+    stats = copy_from(faux_conn, people, source)
+
+    assert stats == LoadStatistics("job", 10, 2, 20, [])
+    [file_obj, table_ref], kw = load_table_from_file.call_args
+    assert file_obj is source
+    assert str(table_ref) == "myproject.mydataset.people"
+    job_config = kw["job_config"]
+    assert job_config.source_format == "CSV"
+    assert job_config.write_disposition == "WRITE_APPEND"
+    assert job_config.max_bad_records == 0
+    assert job_config.skip_leading_rows is None
+    assert [(f.name, f.field_type, f.mode) for f in job_config.schema] == [
+        ("name", "STRING", "NULLABLE"),
+        ("age", "INT64", "NULLABLE"),
+        ("born", "DATETIME", "NULLABLE"),
+        ("tags", "STRING", "REPEATED"),
+    ]
+    load_table_from_file.return_value.result.assert_called_once_with()
+
+
+def test_copy_from_path(tmp_path, faux_conn, people, load_table_from_file):
+    path = tmp_path / "people.json"
+    path.write_bytes(b'{"age": 1}\n')
+
+    def load(file_obj, table_ref, job_config):
+        assert file_obj.read() == b'{"age": 1}\n'
+        return mock.DEFAULT
+
+    load_table_from_file.side_effect = load
+    load_table_from_file.return_value.errors = ["bad record"]
+    engine = mock.Mock(spec=sqlalchemy.engine.Engine)
+    engine.connect.return_value = faux_conn
+
+    stats = copy_from(
+        engine, people, str(path), format="NDJSON", columns=["age"], max_bad_records=5
+    )
+
+    assert stats.errors == ["bad record"]
+    [file_obj, _], kw = load_table_from_file.call_args
+    assert file_obj.closed
+    assert kw["job_config"].source_format == "NEWLINE_DELIMITED_JSON"
+    assert kw["job_config"].max_bad_records == 5
+    assert [f.name for f in kw["job_config"].schema] == ["age"]
+
+
+@pytest.mark.parametrize(
+    "format,source_format",
+    [("parquet", "PARQUET"), ("json", "NEWLINE_DELIMITED_JSON"), ("CSV", "CSV")],
+)
+def test_copy_from_formats(
+    faux_conn, people, load_table_from_file, format, source_format
+):
+    copy_from(faux_conn, people, io.BytesIO(), format=format)
+    _, kw = load_table_from_file.call_args
+    assert kw["job_config"].source_format == source_format
+
+
+def test_copy_from_csv_with_header(faux_conn, people, load_table_from_file):
+    copy_from(faux_conn, people, io.BytesIO(), header=True)
+    _, kw = load_table_from_file.call_args
+    assert kw["job_config"].skip_leading_rows == 1
+
+
+def test_copy_from_errors(faux_conn, people, load_table_from_file):
+    with pytest.raises(ValueError, match="invalid format: avro"):
+        copy_from(faux_conn, people, io.BytesIO(), format="avro")
+    with pytest.raises(ValueError, match="header is only for CSV files"):
+        copy_from(faux_conn, people, io.BytesIO(), format="parquet", header=True)
+    with pytest.raises(ValueError, match="people has no columns named: x"):
+        copy_from(faux_conn, people, io.BytesIO(), columns=["x"])
+    load_table_from_file.assert_not_called()
@@ -0,0 +1,304 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import threading
+import time
+
+import google.api_core.exceptions
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery._metadata_cache import CacheInfo, MetadataCache
+
+
+class FakeTimer:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_disabled_cache_stores_nothing():
+    cache = MetadataCache()
+    assert not cache.enabled
+    cache.set("k", 1)
+    assert cache.get("k") is None
+    assert cache.info() == CacheInfo(0, 1, 0, 1000, 0)
+
+
+def test_entries_expire_after_ttl():
+    timer = FakeTimer()
+    cache = MetadataCache(ttl=10, timer=timer)
+    cache.set("k", 1)
+    timer.now = 9.9
+    assert cache.get("k") == 1
+    timer.now = 10
+    assert cache.get("k", "gone") == "gone"
+    assert cache.info() == CacheInfo(1, 1, 0, 1000, 0)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = MetadataCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # b is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.info() == CacheInfo(3, 1, 1, 2, 2)
+
+
+def test_invalidate_and_clear():
+    cache = MetadataCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("nope")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.clear()
+    assert cache.get("b") is None
+
+
+def test_contains_and_room_leave_statistics_alone():
+    timer = FakeTimer()
+    cache = MetadataCache(maxsize=3, ttl=10, timer=timer)
+    assert cache.room() == 3
+    cache.set("a", 1)
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.room() == 2
+    timer.now = 10
+    assert "a" not in cache
+    assert cache.info() == CacheInfo(0, 0, 0, 3, 1)
+
+    cache.set("b", 2)
+    cache.set("c", 3)
+    cache.set("d", 4)
+    assert cache.room() == 0
+    assert MetadataCache(ttl=0).room() == 0
+
+
+def test_concurrent_loads_share_one_load():
+    cache = MetadataCache(ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        # Long enough for the other threads to wait for this load.
+        time.sleep(0.1)
+        return "value"
+
+    values = []
+    threads = [
+        threading.Thread(target=lambda: values.append(cache.get_or_load("k", load)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert values == ["value"] * 3
+    assert len(loads) == 1
+    assert cache.get_or_load("k", load) == "value"
+    assert not cache._loading
+
+
+@pytest.fixture()
+def cached_conn(faux_engine):
+    return faux_engine(metadata_cache_ttl=60)
+
+
+def test_reflection_shares_one_get_table_call(cached_conn):
+    cached_conn.execute("create table foo (x INT64)")
+    dialect = cached_conn.dialect
+    client = cached_conn.connection._client
+
+    assert dialect.has_table(cached_conn, "foo")
+    dialect.get_columns(cached_conn, "foo")
+    dialect.get_indexes(cached_conn, "foo")
+    dialect.get_table_comment(cached_conn, "foo")
+
+    assert client.get_table.call_count == 1
+    info = dialect.metadata_cache.info()
+    assert (info.hits, info.misses) == (3, 1)
+
+
+def test_missing_tables_are_not_cached(cached_conn):
+    dialect = cached_conn.dialect
+    assert not dialect.has_table(cached_conn, "foo")
+    cached_conn.connection.cursor().execute("create table foo (x INT64)")
+    assert dialect.has_table(cached_conn, "foo")
+
+
+def test_ddl_invalidates_cache(cached_conn, metadata):
+    dialect = cached_conn.dialect
+    client = cached_conn.connection._client
+    table = sqlalchemy.Table(
+        "foo", metadata, sqlalchemy.Column("x", sqlalchemy.Integer)
+    )
+    table.create(cached_conn)
+    assert [c["name"] for c in dialect.get_columns(cached_conn, "foo")] == ["x"]
+
+    cached_conn.execute("alter table foo add column y INT64")
+    assert [c["name"] for c in dialect.get_columns(cached_conn, "foo")] == ["x", "y"]
+
+    table.drop(cached_conn)
+    assert not dialect.has_table(cached_conn, "foo")
+    assert client.get_table.call_count == 3
+
+
+def test_ddl_without_parameters_invalidates_cache(cached_conn):
+    dialect = cached_conn.dialect
+    cached_conn.execute("create table foo (x INT64)")
+    assert dialect.has_table(cached_conn, "foo")
+    cached_conn.execution_options(no_parameters=True).execute("drop table foo")
+    assert not dialect.has_table(cached_conn, "foo")
+
+
+def test_table_listings_are_cached(cached_conn):
+    cached_conn.execute("create table foo (x INT64)")
+    dialect = cached_conn.dialect
+    client = cached_conn.connection._client
+    with mock.patch.object(client, "list_tables", wraps=client.list_tables):
+        assert dialect.get_table_names(cached_conn) == ["foo"]
+        assert dialect.get_table_names(cached_conn) == ["foo"]
+        assert client.list_tables.call_count == 1
+    assert dialect.get_schema_names(cached_conn) == ["mydataset", "yourdataset"]
+    with mock.patch.object(client, "list_datasets", wraps=client.list_datasets):
+        assert dialect.get_schema_names(cached_conn) == ["mydataset", "yourdataset"]
+        client.list_datasets.assert_not_called()
+
+
+@pytest.fixture()
+def prefetch_conn(faux_engine):
+    from google.cloud.bigquery.schema import SchemaField
+    from google.cloud.bigquery.table import Table
+
+    conn = faux_engine(
+        metadata_cache_ttl=60, prefetch_tables=True, metadata_max_workers=3
+    )
+    for name in "foo", "bar", "baz":
+        conn.execute("create table {} (x INT64)".format(name))
+
+    def get_table(table_ref):
+        # The faux client's sqlite connection can't be used by the pool's
+        # threads, so build the tables here.
+        return Table(table_ref, [SchemaField(table_ref.table_id + "_x", "INT64")])
+
+    conn.connection._client.get_table.side_effect = get_table
+    return conn
+
+
+def test_table_listing_prefetches_tables(prefetch_conn):
+    client = prefetch_conn.connection._client
+    metadata = sqlalchemy.MetaData()
+    metadata.reflect(prefetch_conn)
+    assert sorted(metadata.tables) == ["bar", "baz", "foo"]
+    assert list(metadata.tables["bar"].columns.keys()) == ["bar_x"]
+    assert client.get_table.call_count == 3
+
+    # Already cached tables aren't fetched again.
+    prefetch_conn.dialect.get_table_names(prefetch_conn)
+    assert client.get_table.call_count == 3
+
+
+def test_prefetching_counts_no_misses(prefetch_conn):
+    dialect = prefetch_conn.dialect
+    dialect.get_table_names(prefetch_conn)
+    info = dialect.metadata_cache.info()
+    assert (info.hits, info.misses, info.currsize) == (0, 1, 4)
+
+
+def test_prefetching_evicts_nothing(prefetch_conn):
+    client = prefetch_conn.connection._client
+    dialect = prefetch_conn.dialect
+    dialect.metadata_cache.maxsize = 3
+    dialect.get_table_names(prefetch_conn)
+    assert client.get_table.call_count == 2
+    assert dialect.metadata_cache.info().evictions == 0
+
+
+def test_prefetch_errors_are_left_for_reflection(prefetch_conn):
+    client = prefetch_conn.connection._client
+    get_table = client.get_table.side_effect
+
+    def get_table_or_not(table_ref):
+        if table_ref.table_id == "bar":
+            raise google.api_core.exceptions.NotFound("bar")
+        return get_table(table_ref)
+
+    client.get_table.side_effect = get_table_or_not
+    dialect = prefetch_conn.dialect
+    assert sorted(dialect.get_table_names(prefetch_conn)) == ["bar", "baz", "foo"]
+    assert client.get_table.call_count == 3
+
+    with pytest.raises(sqlalchemy.exc.NoSuchTableError):
+        dialect.get_columns(prefetch_conn, "bar")
+    assert [c["name"] for c in dialect.get_columns(prefetch_conn, "foo")] == ["foo_x"]
+    assert client.get_table.call_count == 4
+
+
+def test_prefetch_tables_requires_metadata_cache(faux_conn):
+    with pytest.raises(ValueError, match="requires metadata_cache_ttl"):
+        sqlalchemy.create_engine("bigquery://myproject/mydataset", prefetch_tables=True)
+
+
+def slowly(value):
+    def call(client, dataset_ref):
+        # Long enough for the other workers to look the dataset up too.
+        time.sleep(0.1)
+        return value
+
+    return mock.Mock(side_effect=call)
+
+
+def test_prefetched_tables_share_one_dataset_query(prefetch_conn):
+    from google.cloud.bigquery.schema import SchemaField
+    from google.cloud.bigquery.table import Table
+
+    client = prefetch_conn.connection._client
+    dialect = prefetch_conn.dialect
+    dialect.bulk_reflection = True
+    tables = [
+        Table("myproject.mydataset." + name, [SchemaField("y", "INT64")])
+        for name in ("foo", "bar", "baz")
+    ]
+    with mock.patch(
+        "pybigquery._information_schema.reflect_dataset", slowly(tables)
+    ) as reflect_dataset:
+        dialect.get_table_names(prefetch_conn)
+    reflect_dataset.assert_called_once()
+    client.get_table.assert_not_called()
+
+
+def test_prefetched_tables_share_one_last_modified_query(prefetch_conn, tmp_path):
+    from pybigquery._schema_cache import SchemaCache
+
+    client = prefetch_conn.connection._client
+    dialect = prefetch_conn.dialect
+    dialect.schema_cache = SchemaCache(str(tmp_path))
+    with mock.patch(
+        "pybigquery._schema_cache.last_modified_times", slowly({})
+    ) as last_modified_times:
+        dialect.get_table_names(prefetch_conn)
+    last_modified_times.assert_called_once()
+    assert client.get_table.call_count == 3
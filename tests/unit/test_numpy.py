@@ -0,0 +1,196 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import decimal
+
+from google.cloud.bigquery.schema import SchemaField
+from google.cloud.bigquery.table import RowIterator
+import mock
+import pytest
+
+numpy = pytest.importorskip("numpy")
+pyarrow = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture()
+def result(faux_conn):
+    result = faux_conn.execute("select 1")
+    result.cursor._query_rows = mock.Mock(
+        total_rows=None,
+        schema=[SchemaField("i", "INT64"), SchemaField("r", "INT64", mode="REQUIRED")],
+    )
+    return result
+
+
+def record_batch(**columns):
+    fields = []
+    arrays = []
+    for name, (type_, values, nullable) in columns.items():
+        fields.append(pyarrow.field(name, type_, nullable))
+        arrays.append(pyarrow.array(values, type_))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=pyarrow.schema(fields))
+
+
+def test_column_arrays():
+    from pybigquery._numpy import column_arrays
+
+    batch = record_batch(
+        i=(pyarrow.int64(), [1, None, 3], True),
+        f=(pyarrow.float64(), [1.5, 2.5, None], True),
+        b=(pyarrow.bool_(), [None, True, False], True),
+        s=(pyarrow.string(), ["a", None, "c"], True),
+        r=(pyarrow.int64(), [4, 5, 6], False),
+        d=(pyarrow.decimal128(38, 9), [decimal.Decimal("1.5")] * 3, False),
+    )
+    columns = column_arrays(batch)
+    assert list(columns) == ["i", "f", "b", "s", "r", "d"]
+
+    assert columns["i"].dtype == numpy.int64
+    assert columns["i"].tolist() == [1, None, 3]
+    assert columns["f"].dtype == numpy.float64
+    assert columns["f"].tolist() == [1.5, 2.5, None]
+    assert columns["b"].dtype == numpy.bool_
+    assert columns["b"].tolist() == [None, True, False]
+    assert columns["s"].dtype == object
+    assert columns["s"].tolist() == ["a", None, "c"]
+
+    # Columns that don't allow NULL aren't masked.
+    assert not numpy.ma.isMaskedArray(columns["r"])
+    assert columns["r"].tolist() == [4, 5, 6]
+    assert columns["d"].dtype == object
+    assert columns["d"].tolist() == [decimal.Decimal("1.5")] * 3
+
+
+def test_column_arrays_share_numeric_memory():
+    from pybigquery._numpy import column_arrays
+
+    batch = record_batch(
+        i=(pyarrow.int64(), [1, None, 3, 4], True),
+        r=(pyarrow.float64(), [1.0, 2.0, 3.0, 4.0], False),
+    )
+    i = batch.column(0)
+    columns = column_arrays(batch.slice(1))
+    assert columns["i"].tolist() == [None, 3, 4]
+    assert columns["i"].data.ctypes.data == i.buffers()[1].address + 8
+    assert columns["r"].ctypes.data == batch.column(1).buffers()[1].address + 8
+
+
+def test_column_arrays_nullable_without_nulls():
+    from pybigquery._numpy import column_arrays
+
+    batch = record_batch(i=(pyarrow.int64(), [1, 2], True))
+    column = column_arrays(batch)["i"]
+    assert numpy.ma.isMaskedArray(column)
+    assert column.mask.tolist() == [False, False]
+
+
+def test_column_arrays_all_null():
+    from pybigquery._numpy import column_arrays
+
+    batch = record_batch(i=(pyarrow.int64(), [None, None], True))
+    assert column_arrays(batch)["i"].tolist() == [None, None]
+
+
+def batches():
+    return [
+        record_batch(
+            i=(pyarrow.int64(), [1, None], True), r=(pyarrow.int64(), [1, 2], False),
+        ),
+        record_batch(i=(pyarrow.int64(), [3], True), r=(pyarrow.int64(), [3], False),),
+    ]
+
+
+@pytest.mark.parametrize("total_rows", [None, 3])
+def test_fetch_numpy(result, total_rows):
+    rows = result.cursor._query_rows
+    rows.total_rows = total_rows
+    rows.to_arrow_iterable.return_value = batches()
+    columns = result.fetch_numpy()
+    assert columns["i"].tolist() == [1, None, 3]
+    assert columns["i"].dtype == numpy.int64
+    assert columns["r"].tolist() == [1, 2, 3]
+    assert not numpy.ma.isMaskedArray(columns["r"])
+    rows.to_arrow_iterable.assert_called_once_with(bqstorage_client=None)
+    assert result.cursor is None
+
+
+def test_concatenate_preallocates():
+    from pybigquery import _numpy
+
+    with mock.patch("numpy.concatenate") as concatenate:
+        columns = _numpy.concatenate(
+            (_numpy.column_arrays(batch) for batch in batches()), 3
+        )
+    concatenate.assert_not_called()
+    assert columns["r"].tolist() == [1, 2, 3]
+
+
+def test_concatenate_fewer_rows_than_reported():
+    from pybigquery import _numpy
+
+    columns = _numpy.concatenate(map(_numpy.column_arrays, batches()), 5)
+    assert columns["i"].tolist() == [1, None, 3]
+    assert columns["r"].tolist() == [1, 2, 3]
+
+
+@pytest.mark.parametrize("total_rows", [None, 0])
+def test_fetch_numpy_no_batches(result, total_rows):
+    rows = result.cursor._query_rows
+    rows.total_rows = total_rows
+    rows.to_arrow_iterable.return_value = []
+    assert result.fetch_numpy() == {}
+
+
+def test_fetch_numpy_batches(result):
+    rows = result.cursor._query_rows
+    rows.to_arrow_iterable.return_value = batches()
+    columns = [
+        {name: array.tolist() for name, array in batch.items()}
+        for batch in result.fetch_numpy_batches(1)
+    ]
+    assert columns == [
+        {"i": [1], "r": [1]},
+        {"i": [None], "r": [2]},
+        {"i": [3], "r": [3]},
+    ]
+    assert result.cursor is None
+
+
+def test_fetch_numpy_from_rest():
+    from pybigquery import _numpy
+
+    api_request = mock.Mock(
+        return_value={
+            "rows": [
+                {"f": [{"v": "1"}, {"v": None}]},
+                {"f": [{"v": "2"}, {"v": "2.5"}]},
+            ]
+        }
+    )
+    schema = [SchemaField("x", "INT64", mode="REQUIRED"), SchemaField("y", "FLOAT64")]
+    rows = RowIterator(mock.Mock(), api_request, "/path", schema, total_rows=2)
+    nullable = _numpy.nullable_columns(rows.schema)
+    columns = _numpy.concatenate(
+        (_numpy.column_arrays(b, nullable) for b in rows.to_arrow_iterable()),
+        rows.total_rows,
+    )
+    assert columns["x"].dtype == numpy.int64
+    assert not numpy.ma.isMaskedArray(columns["x"])
+    assert columns["x"].tolist() == [1, 2]
+    assert columns["y"].tolist() == [None, 2.5]
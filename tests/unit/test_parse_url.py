@@ -49,7 +49,14 @@ def url_with_everything():
         "bigquery://some-project/some-dataset"
         "?credentials_path=/some/path/to.json"
         "&location=some-location"
+        "&schema_cache_dir=/some/cache/dir"
         "&arraysize=1000"
+        "&http_pool_size=50"
+        "&http_max_retries=3"
+        "&http_keepalive=60"
+        "&http_warmup=8"
+        "&insert_mode=dml"
+        "&use_bqstorage=false"
         "&clustering_fields=a,b,c"
         "&create_disposition=CREATE_IF_NEEDED"
         "&destination=different-project.different-dataset.table"
@@ -72,6 +79,13 @@ def test_basic(url_with_everything):
         arraysize,
         credentials_path,
         job_config,
+        schema_cache_dir,
+        http_pool_size,
+        http_max_retries,
+        http_keepalive,
+        http_warmup,
+        insert_mode,
+        use_bqstorage,
     ) = parse_url(url_with_everything)
 
     assert project_id == "some-project"
@@ -80,6 +94,13 @@ def test_basic(url_with_everything):
     assert arraysize == 1000
     assert credentials_path == "/some/path/to.json"
     assert isinstance(job_config, QueryJobConfig)
+    assert schema_cache_dir == "/some/cache/dir"
+    assert http_pool_size == 50
+    assert http_max_retries == 3
+    assert http_keepalive == 60
+    assert http_warmup == 8
+    assert insert_mode == "dml"
+    assert use_bqstorage is False
 
 
 @pytest.mark.parametrize(
@@ -134,6 +155,7 @@ def test_all_values(url_with_everything, param, value, default):
     "param, value",
     [
         ("arraysize", "not-int"),
+        ("http_pool_size", "not-int"),
         ("create_disposition", "not-attribute"),
         ("destination", "not.fully-qualified"),
         ("dry_run", "not-bool"),
@@ -142,6 +164,7 @@ def test_all_values(url_with_everything, param, value, default):
         ("priority", "not-attribute"),
         ("schema_update_options", "not-attribute"),
         ("use_query_cache", "not-bool"),
+        ("use_bqstorage", "not-bool"),
         ("write_disposition", "not-attribute"),
     ],
 )
@@ -165,7 +188,21 @@ def test_empty_with_non_config():
             "bigquery:///?location=some-location&arraysize=1000&credentials_path=/some/path/to.json"
         )
     )
-    project_id, location, dataset_id, arraysize, credentials_path, job_config = url
+    (
+        project_id,
+        location,
+        dataset_id,
+        arraysize,
+        credentials_path,
+        job_config,
+        schema_cache_dir,
+        http_pool_size,
+        http_max_retries,
+        http_keepalive,
+        http_warmup,
+        insert_mode,
+        use_bqstorage,
+    ) = url
 
     assert project_id is None
     assert location == "some-location"
@@ -173,11 +210,29 @@ def test_empty_with_non_config():
     assert arraysize == 1000
     assert credentials_path == "/some/path/to.json"
     assert job_config is None
+    assert schema_cache_dir is None
+    assert http_pool_size is None
+    assert insert_mode is None
+    assert use_bqstorage is None
 
 
 def test_only_dataset():
     url = parse_url(make_url("bigquery:///some-dataset"))
-    project_id, location, dataset_id, arraysize, credentials_path, job_config = url
+    (
+        project_id,
+        location,
+        dataset_id,
+        arraysize,
+        credentials_path,
+        job_config,
+        schema_cache_dir,
+        http_pool_size,
+        http_max_retries,
+        http_keepalive,
+        http_warmup,
+        insert_mode,
+        use_bqstorage,
+    ) = url
 
     assert project_id is None
     assert location is None
@@ -185,6 +240,7 @@ def test_only_dataset():
     assert arraysize is None
     assert credentials_path is None
     assert isinstance(job_config, QueryJobConfig)
+    assert schema_cache_dir is None
     # we can't actually test that the dataset is on the job_config,
     # since we take care of that afterwards, when we have a client to fill in the project
 
@@ -0,0 +1,165 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+
+import google.api_core.exceptions
+import mock
+import pytest
+import sqlalchemy
+
+from pybigquery._schema_cache import SchemaCache
+
+
+def make_table(table_id, last_modified="1000"):
+    from google.cloud.bigquery.schema import SchemaField
+    from google.cloud.bigquery.table import Table
+
+    table = Table("myproject.mydataset." + table_id, [SchemaField("x", "INT64")])
+    table.description = "a table"
+    if last_modified is not None:
+        table._properties["lastModifiedTime"] = last_modified
+    return table
+
+
+def test_save_and_load(tmp_path):
+    cache = SchemaCache(str(tmp_path / "cache"))
+    table = make_table("t")
+    cache.save(table)
+
+    loaded = cache.load(table.reference, 1000)
+    assert loaded.reference == table.reference
+    assert loaded.description == "a table"
+    assert [(f.name, f.field_type) for f in loaded.schema] == [("x", "INT64")]
+
+    # The table changed since it was stored.
+    assert cache.load(table.reference, 2000) is None
+
+
+def test_load_missing_or_corrupt(tmp_path):
+    cache = SchemaCache(str(tmp_path))
+    table = make_table("t")
+    assert cache.load(table.reference, 1000) is None
+
+    cache.save(table)
+    [name] = os.listdir(str(tmp_path))
+    with open(str(tmp_path / name), "w") as f:
+        f.write('{"tableReference": ')
+    assert cache.load(table.reference, 1000) is None
+
+
+def test_tables_without_modification_time_are_not_saved(tmp_path):
+    cache = SchemaCache(str(tmp_path))
+    cache.save(make_table("t", last_modified=None))
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_failed_save_leaves_no_temporary_files(tmp_path):
+    cache = SchemaCache(str(tmp_path))
+    with mock.patch("json.dump", side_effect=TypeError("nope")):
+        with pytest.raises(TypeError):
+            cache.save(make_table("t"))
+    assert os.listdir(str(tmp_path)) == []
+
+
+@pytest.fixture()
+def connect(faux_conn, faux_engine, tmp_path):
+    faux_conn.execute("create table foo (x INT64)")
+
+    def connect(last_modified, url="bigquery://myproject/mydataset", **kw):
+        kw.setdefault("schema_cache_dir", str(tmp_path))
+        conn = faux_engine(url, metadata_cache_ttl=60, **kw)
+        client = conn.connection._client
+        get_table = client.get_table
+
+        def get_table_with_modified_time(table_ref):
+            table = get_table(table_ref)
+            table._properties["lastModifiedTime"] = str(last_modified)
+            return table
+
+        client.get_table = mock.Mock(side_effect=get_table_with_modified_time)
+        client.query = mock.Mock()
+        client.query.return_value.result.return_value = [
+            dict(table_id="foo", last_modified_time=last_modified)
+        ]
+        return conn
+
+    return connect
+
+
+def test_warm_start(connect):
+    conn = connect(1000)
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "foo")] == ["x"]
+    conn.connection._client.get_table.assert_called_once()
+
+    conn = connect(1000)
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "foo")] == ["x"]
+    assert conn.dialect.get_table_comment(conn, "foo") == dict(text=None)
+    conn.connection._client.get_table.assert_not_called()
+    query = conn.connection._client.query.call_args[0][0]
+    assert "`myproject.mydataset.__TABLES__`" in query
+
+
+def test_last_modified_times_are_fetched_once_per_dataset(connect):
+    conn = connect(1000)
+    conn.execute("create table bar (y INT64)")
+    conn.dialect.get_columns(conn, "foo")
+    conn.dialect.get_columns(conn, "bar")
+    conn.connection._client.query.assert_called_once()
+
+
+def test_schema_changed(connect):
+    conn = connect(1000)
+    conn.dialect.get_columns(conn, "foo")
+
+    conn.execute("alter table foo add column y INT64")
+    conn = connect(2000)
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "foo")] == ["x", "y"]
+    conn.connection._client.get_table.assert_called_once()
+
+    conn = connect(2000)
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "foo")] == ["x", "y"]
+    conn.connection._client.get_table.assert_not_called()
+
+
+def test_last_modified_query_fails(connect):
+    conn = connect(1000)
+    conn.dialect.get_columns(conn, "foo")
+
+    conn = connect(1000)
+    client = conn.connection._client
+    client.query.side_effect = google.api_core.exceptions.Forbidden("nope")
+    assert [c["name"] for c in conn.dialect.get_columns(conn, "foo")] == ["x"]
+    client.get_table.assert_called_once()
+
+
+def test_schema_cache_dir_in_url(connect, tmp_path):
+    conn = connect(
+        1000,
+        url="bigquery://myproject/mydataset?schema_cache_dir=" + str(tmp_path / "u"),
+        schema_cache_dir=None,
+    )
+    assert conn.dialect.schema_cache.directory == str(tmp_path / "u")
+
+
+def test_schema_cache_requires_metadata_cache(faux_conn, tmp_path):
+    with pytest.raises(ValueError, match="requires metadata_cache_ttl"):
+        sqlalchemy.create_engine(
+            "bigquery://myproject/mydataset", schema_cache_dir=str(tmp_path)
+        )
@@ -224,10 +224,8 @@ def test_select_in_param(faux_conn):
     )
     assert isin
     assert faux_conn.test_data["execute"][-1] == (
-        "SELECT %(param_1:INT64)s IN UNNEST("
-        "[ %(q_1:INT64)s, %(q_2:INT64)s, %(q_3:INT64)s ]"
-        ") AS `anon_1`",
-        {"param_1": 1, "q_1": 1, "q_2": 2, "q_3": 3},
+        "SELECT %(param_1:INT64)s IN UNNEST(%(q:INT64)s) AS `anon_1`",
+        {"param_1": 1, "q": [1, 2, 3]},
     )
 
 
@@ -240,11 +238,38 @@ def test_select_in_param1(faux_conn):
     )
     assert isin
     assert faux_conn.test_data["execute"][-1] == (
-        "SELECT %(param_1:INT64)s IN UNNEST(" "[ %(q_1:INT64)s ]" ") AS `anon_1`",
-        {"param_1": 1, "q_1": 1},
+        "SELECT %(param_1:INT64)s IN UNNEST(%(q:INT64)s) AS `anon_1`",
+        {"param_1": 1, "q": [1]},
     )
 
 
+def test_select_in_param_with_null(faux_conn):
+    [[isin]] = faux_conn.execute(
+        sqlalchemy.select(
+            [sqlalchemy.literal(1).in_(sqlalchemy.bindparam("q", expanding=True))]
+        ),
+        dict(q=[None, 1]),
+    )
+    assert isin
+    # BigQuery rejects ARRAY parameters with NULL elements.
+    assert faux_conn.test_data["execute"][-1] == (
+        "SELECT %(param_1:INT64)s"
+        " IN UNNEST([ %(q_1:INT64)s, %(q_2:INT64)s ]) AS `anon_1`",
+        {"param_1": 1, "q_1": None, "q_2": 1},
+    )
+
+
+def test_select_notin_param_with_null(faux_conn):
+    [[isnotin]] = faux_conn.execute(
+        sqlalchemy.select(
+            [sqlalchemy.literal(1).notin_(sqlalchemy.bindparam("q", expanding=True))]
+        ),
+        dict(q=[2, None]),
+    )
+    # The NULL isn't dropped: NOT IN a list with NULL is never true.
+    assert isnotin is None
+
+
 @sqlalchemy_1_3_or_higher
 def test_select_in_param_empty(faux_conn):
     [[isin]] = faux_conn.execute(
@@ -255,8 +280,8 @@ def test_select_in_param_empty(faux_conn):
     )
     assert not isin
     assert faux_conn.test_data["execute"][-1] == (
-        "SELECT %(param_1:INT64)s IN UNNEST(" "[  ]" ") AS `anon_1`",
-        {"param_1": 1},
+        "SELECT %(param_1:INT64)s IN UNNEST(%(q:INT64)s) AS `anon_1`",
+        {"param_1": 1, "q": []},
     )
 
 
@@ -281,10 +306,8 @@ def test_select_notin_param(faux_conn):
     )
     assert not isnotin
     assert faux_conn.test_data["execute"][-1] == (
-        "SELECT %(param_1:INT64)s NOT IN UNNEST("
-        "[ %(q_1:INT64)s, %(q_2:INT64)s, %(q_3:INT64)s ]"
-        ") AS `anon_1`",
-        {"param_1": 1, "q_1": 1, "q_2": 2, "q_3": 3},
+        "SELECT %(param_1:INT64)s NOT IN UNNEST(%(q:INT64)s) AS `anon_1`",
+        {"param_1": 1, "q": [1, 2, 3]},
     )
 
 
@@ -298,6 +321,74 @@ def test_select_notin_param_empty(faux_conn):
     )
     assert isnotin
     assert faux_conn.test_data["execute"][-1] == (
-        "SELECT %(param_1:INT64)s NOT IN UNNEST(" "[  ]" ") AS `anon_1`",
-        {"param_1": 1},
+        "SELECT %(param_1:INT64)s NOT IN UNNEST(%(q:INT64)s) AS `anon_1`",
+        {"param_1": 1, "q": []},
+    )
+
+
+def test_select_in_param_untyped(faux_conn):
+    [[isin]] = faux_conn.execute(
+        sqlalchemy.select(
+            [
+                sqlalchemy.literal_column("1").in_(
+                    sqlalchemy.bindparam("q", expanding=True)
+                )
+            ]
+        ),
+        dict(q=[1, 2, 3]),
+    )
+    assert isin
+    # Without a type, the elements can't be bound as an ARRAY.
+    assert faux_conn.test_data["execute"][-1] == (
+        "SELECT 1 IN UNNEST([ %(q_1)s, %(q_2)s, %(q_3)s ]) AS `anon_1`",
+        {"q_1": 1, "q_2": 2, "q_3": 3},
+    )
+
+
+def test_select_in_param_processes_each_element(faux_conn):
+    class Upper(sqlalchemy.types.TypeDecorator):
+        impl = sqlalchemy.String
+
+        def process_bind_param(self, value, dialect):
+            return value.upper()
+
+    [[isin]] = faux_conn.execute(
+        sqlalchemy.select(
+            [
+                sqlalchemy.literal("b", Upper).in_(
+                    sqlalchemy.bindparam("q", expanding=True)
+                )
+            ]
+        ),
+        dict(q=["a", "b"]),
+    )
+    assert isin
+    assert faux_conn.test_data["execute"][-1] == (
+        "SELECT %(param_1:STRING)s IN UNNEST(%(q:STRING)s) AS `anon_1`",
+        {"param_1": "B", "q": ["A", "B"]},
+    )
+
+
+def test_array_items_are_processed(faux_conn):
+    class Upper(sqlalchemy.types.TypeDecorator):
+        impl = sqlalchemy.String
+
+        def process_bind_param(self, value, dialect):
+            return value.upper()
+
+    table = setup_table(faux_conn, "t", sqlalchemy.Column("a", sqlalchemy.ARRAY(Upper)))
+    faux_conn.execution_options(bigquery_insert_mode="dml").execute(
+        table.insert(), [dict(a=["x", "y"]), dict(a=None)]
     )
+    assert [params for _, params in faux_conn.test_data["execute"][-2:]] == [
+        {"a": ["X", "Y"]},
+        {"a": None},
+    ]
+
+
+def test_literal_binds_have_no_type_markers(faux_conn):
+    dialect = pybigquery.sqlalchemy_bigquery.BigQueryDialect()
+    select = sqlalchemy.select([sqlalchemy.literal("a)")])
+    assert str(
+        select.compile(dialect=dialect, compile_kwargs=dict(literal_binds=True))
+    ) == ("SELECT 'a)' AS `anon_1`")
@@ -4,11 +4,13 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+import subprocess
+import sys
 from unittest import mock
 
 import google.api_core.exceptions
 from google.cloud import bigquery
-from google.cloud.bigquery.dataset import DatasetListItem
+from google.cloud.bigquery.dataset import DatasetListItem, DatasetReference
 from google.cloud.bigquery.table import TableListItem
 import pytest
 import sqlalchemy
@@ -137,3 +139,71 @@ def test_get_view_names(
     mock_bigquery_client.list_datasets.assert_called_once()
     assert mock_bigquery_client.list_tables.call_count == len(datasets_list)
     assert list(sorted(view_names)) == list(sorted(expected))
+
+
+@pytest.mark.parametrize(
+    ["schema", "dataset_ref"],
+    [
+        ("dataset_1", DatasetReference("some-project-id", "dataset_1")),
+        ("other-project.dataset_1", DatasetReference("other-project", "dataset_1")),
+    ],
+)
+def test_get_table_names_with_schema_skips_list_datasets(
+    inspector_under_test, mock_bigquery_client, schema, dataset_ref
+):
+    mock_bigquery_client.project = "some-project-id"
+    mock_bigquery_client.list_tables.return_value = [
+        table_item("dataset_1", "d1t1"),
+        table_item("dataset_1", "d1view", type_="VIEW"),
+    ]
+    table_names = inspector_under_test.get_table_names(schema=schema)
+    mock_bigquery_client.list_datasets.assert_not_called()
+    mock_bigquery_client.list_tables.assert_called_once_with(dataset_ref)
+    assert table_names == ["dataset_1.d1t1"]
+
+
+def test_get_table_names_with_missing_schema(
+    inspector_under_test, mock_bigquery_client
+):
+    mock_bigquery_client.project = "some-project-id"
+    mock_bigquery_client.list_tables.side_effect = google.api_core.exceptions.NotFound(
+        "dataset_deleted"
+    )
+    assert inspector_under_test.get_table_names(schema="dataset_deleted") == []
+
+
+def test_get_table_names_with_bad_schema(inspector_under_test, mock_bigquery_client):
+    mock_bigquery_client.project = "some-project-id"
+    with pytest.raises(ValueError, match=r"Did not understand schema: a\.b\.c"):
+        inspector_under_test.get_table_names(schema="a.b.c")
+
+
+@pytest.mark.parametrize("metadata_max_workers", [1, 3])
+def test_get_table_names_lists_datasets_concurrently(
+    mock_connection, mock_bigquery_client, metadata_max_workers
+):
+    engine = sqlalchemy.create_engine(
+        "bigquery://", metadata_max_workers=metadata_max_workers
+    )
+    datasets = [dataset_item("dataset_{}".format(i)) for i in range(5)]
+    mock_bigquery_client.list_datasets.return_value = datasets
+    mock_bigquery_client.list_tables.side_effect = lambda dataset_ref: [
+        table_item(dataset_ref.dataset_id, "t")
+    ]
+    assert engine.table_names() == ["dataset_{}.t".format(i) for i in range(5)]
+    assert mock_bigquery_client.list_tables.call_count == 5
+
+
+def test_compiling_does_not_import_google_cloud_bigquery():
+    code = "\n".join(
+        [
+            "import sys",
+            "import sqlalchemy",
+            "from pybigquery.sqlalchemy_bigquery import BigQueryDialect",
+            "table = sqlalchemy.table('t', sqlalchemy.column('c'))",
+            "query = sqlalchemy.select([table]).where(table.c.c == 1)",
+            "print(query.compile(dialect=BigQueryDialect()))",
+            "assert 'google.cloud.bigquery' not in sys.modules",
+        ]
+    )
+    subprocess.check_call([sys.executable, "-c", code], stdout=subprocess.DEVNULL)
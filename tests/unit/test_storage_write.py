@@ -0,0 +1,263 @@
+# Copyright (c) 2021 The PyBigQuery Authors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import decimal
+import sys
+
+import google.api_core.exceptions
+from google.cloud.bigquery.schema import SchemaField
+from google.cloud.bigquery.table import Table
+import mock
+import pytest
+import sqlalchemy
+
+from conftest import setup_table
+from pybigquery import _storage_write
+
+SCHEMA = [
+    SchemaField("s", "STRING"),
+    SchemaField("i", "INT64", mode="REQUIRED"),
+    SchemaField("d", "DATE"),
+    SchemaField("ts", "TIMESTAMP"),
+    SchemaField("dt", "DATETIME"),
+    SchemaField("n", "NUMERIC"),
+    SchemaField("j", "JSON"),
+    SchemaField("b", "BYTES"),
+    SchemaField("ints", "INT64", mode="REPEATED"),
+    SchemaField("days", "DATE", mode="REPEATED"),
+    SchemaField(
+        "rec",
+        "RECORD",
+        fields=[
+            SchemaField("x", "FLOAT64"),
+            SchemaField(
+                "inner", "RECORD", mode="REPEATED", fields=[SchemaField("y", "BOOL")]
+            ),
+        ],
+    ),
+]
+
+
+def test_serialize_rows():
+    row_class = _storage_write.row_class(_storage_write.row_descriptor(SCHEMA))
+    rows = [
+        dict(
+            s="a",
+            i=1,
+            d=datetime.date(1970, 1, 3),
+            ts=datetime.datetime(1970, 1, 1, 0, 0, 1, 5),
+            dt=datetime.datetime(2021, 1, 2, 3, 4, 5),
+            n=decimal.Decimal("1.50"),
+            j={"k": [1]},
+            b=b"\\x00",
+            ints=[1, 2],
+            days=[datetime.date(1969, 12, 31)],
+            rec=dict(x=0.5, inner=[dict(y=True), dict(y=None)]),
+        ),
+        dict(s=None, i=2, d="1970-01-05", ts="1970-01-01T01:00:00+01:00", j='"s"'),
+    ]
+
+    first, second = [
+        row_class.FromString(serialized)
+        for serialized in _storage_write.serialize_rows(SCHEMA, row_class, rows)
+    ]
+
+    assert (first.s, first.i, first.d, first.ts) == ("a", 1, 2, 1000005)
+    assert (first.dt, first.n, first.j, first.b) == (
+        "2021-01-02T03:04:05",
+        "1.50",
+        '{"k": [1]}',
+        b"\\x00",
+    )
+    assert (list(first.ints), list(first.days)) == ([1, 2], [-1])
+    assert first.rec.x == 0.5
+    assert [inner.HasField("y") for inner in first.rec.inner] == [True, False]
+    assert not second.HasField("s")
+    assert not second.HasField("rec")
+    assert (second.i, second.d, second.ts, second.j) == (2, 4, 0, '"s"')
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("1970-01-01T00:00:01Z", 10 ** 6),
+        ("1970-01-01 00:00:01.5", 1500000),
+        ("1970-01-01T00:00:00.000001+00:00", 1),
+        ("1970-01-01T05:30:00+05:30", 0),
+        ("1969-12-31T23:00:00-0100", 0),
+        ("1970-01-02", 86400 * 10 ** 6),
+    ],
+)
+def test_timestamp_strings(value, expected):
+    assert _storage_write._microseconds(value) == expected
+
+
+def test_invalid_timestamp_string():
+    with pytest.raises(ValueError, match="Invalid TIMESTAMP: '1970-01-01T00'"):
+        _storage_write._microseconds("1970-01-01T00")
+
+
+def test_row_descriptor_of_unknown_types():
+    with pytest.raises(ValueError, match="can't write INTERVAL columns, like i"):
+        _storage_write.row_descriptor([SchemaField("i", "INTERVAL")])
+
+
+def test_row_class_with_protobuf_3(monkeypatch):
+    from google.protobuf import message_factory
+
+    monkeypatch.delattr(message_factory, "GetMessageClass")
+    factory = mock.Mock()
+    monkeypatch.setattr(message_factory, "MessageFactory", factory)
+    row_class = _storage_write.row_class(_storage_write.row_descriptor(SCHEMA))
+    assert row_class is factory.return_value.GetPrototype.return_value
+    [descriptor], _ = factory.return_value.GetPrototype.call_args
+    assert descriptor.full_name == "pybigquery.Row"
+
+
+def test_row_descriptor():
+    descriptor = _storage_write.row_descriptor(
+        [SchemaField("a", "STRING", mode="REPEATED"), SchemaField("b", "GEOGRAPHY")]
+    )
+    assert [(f.name, f.number, f.label, f.type) for f in descriptor.field] == [
+        ("a", 1, 3, 9),  # LABEL_REPEATED, TYPE_STRING
+        ("b", 2, 1, 9),  # LABEL_OPTIONAL, TYPE_STRING
+    ]
+
+
+@pytest.fixture()
+def storage_v1(monkeypatch):
+    # google-cloud-bigquery-storage is optional.
+    storage_v1 = mock.MagicMock()
+    monkeypatch.setitem(sys.modules, "google.cloud.bigquery_storage_v1", storage_v1)
+    return storage_v1
+
+
+@pytest.fixture()
+def write_client():
+    write_client = mock.Mock()
+    write_client.table_path.return_value = "projects/p/datasets/d/tables/t"
+    write_client.create_write_stream.return_value.name = "stream"
+    write_client.batch_commit_write_streams.return_value.stream_errors = []
+    return write_client
+
+
+def test_write_rows(storage_v1, write_client):
+    table = Table("p.d.t", schema=[SchemaField("s", "STRING")])
+    rows = [dict(s="x" * 10) for _ in range(5)]  # 12 bytes each, serialized
+
+    assert _storage_write.write_rows(write_client, table, rows, "pending", 24) == 5
+
+    types = storage_v1.types
+    write_client.table_path.assert_called_once_with("p", "d", "t")
+    types.WriteStream.Type.__getitem__.assert_called_once_with("PENDING")
+    _, kw = write_client.create_write_stream.call_args
+    assert kw["parent"] == "projects/p/datasets/d/tables/t"
+    [template, *requests] = [kw for _, kw in types.AppendRowsRequest.call_args_list]
+    assert template["write_stream"] == "stream"
+    assert [(kw["write_stream"], kw["offset"]) for kw in requests] == [
+        ("stream", 0),
+        ("stream", 2),
+        ("stream", 4),
+    ]
+    assert [len(kw["serialized_rows"]) for _, kw in types.ProtoRows.call_args_list] == [
+        2,
+        2,
+        1,
+    ]
+    append_rows_stream = storage_v1.writer.AppendRowsStream.return_value
+    assert append_rows_stream.send.return_value.result.call_count == 3
+    append_rows_stream.close.assert_called_once_with()
+    write_client.finalize_write_stream.assert_called_once_with(name="stream")
+    _, kw = types.BatchCommitWriteStreamsRequest.call_args
+    assert kw == dict(parent="projects/p/datasets/d/tables/t", write_streams=["stream"])
+
+
+def test_write_rows_committed(storage_v1, write_client):
+    table = Table("p.d.t", schema=[SchemaField("s", "STRING")])
+    _storage_write.write_rows(write_client, table, [dict(s="x")], "committed", 100)
+    storage_v1.types.WriteStream.Type.__getitem__.assert_called_once_with("COMMITTED")
+    write_client.finalize_write_stream.assert_called_once_with(name="stream")
+    write_client.batch_commit_write_streams.assert_not_called()
+
+
+def test_write_rows_commit_errors(storage_v1, write_client):
+    table = Table("p.d.t", schema=[SchemaField("s", "STRING")])
+    write_client.batch_commit_write_streams.return_value.stream_errors = ["oops"]
+    with pytest.raises(google.api_core.exceptions.BadRequest) as exc_info:
+        _storage_write.write_rows(write_client, table, [dict(s="x")], "pending", 100)
+    assert exc_info.value.errors == ["oops"]
+
+
+def test_write_rows_closes_stream_on_errors(storage_v1, write_client):
+    table = Table("p.d.t", schema=[SchemaField("s", "STRING")])
+    append_rows_stream = storage_v1.writer.AppendRowsStream.return_value
+    append_rows_stream.send.return_value.result.side_effect = google.api_core.exceptions.BadRequest(
+        "bad rows"
+    )
+    with pytest.raises(google.api_core.exceptions.BadRequest):
+        _storage_write.write_rows(write_client, table, [dict(s="x")], "pending", 100)
+    append_rows_stream.close.assert_called_once_with()
+    write_client.batch_commit_write_streams.assert_not_called()
+
+
+def test_insert_mode_storage_write(faux_conn):
+    table = setup_table(
+        faux_conn,
+        "t",
+        sqlalchemy.Column("name", sqlalchemy.String, key="name_key"),
+        sqlalchemy.Column("age", sqlalchemy.Integer),
+    )
+    faux_conn.dialect.storage_write_stream_type = "committed"
+    with mock.patch(
+        "pybigquery._helpers.create_bigquery_write_client"
+    ) as create_write_client, mock.patch(
+        "pybigquery._storage_write.write_rows", return_value=2
+    ) as write_rows:
+        conn = faux_conn.execution_options(bigquery_insert_mode="storage_write")
+        result = conn.execute(
+            table.insert(), [dict(name_key="a", age=1), dict(name_key="b", age=2)]
+        )
+        conn.execute(table.insert(), [dict(name_key="c", age=3)] * 2)
+
+    assert result.rowcount == 2
+    create_write_client.assert_called_once_with(faux_conn.connection.connection._client)
+    (
+        [write_client, bq_table, rows, stream_type, flush_bytes],
+        _,
+    ) = write_rows.call_args_list[0]
+    assert write_client is create_write_client.return_value
+    assert bq_table.table_id == "t"
+    assert rows == [dict(name="a", age=1), dict(name="b", age=2)]
+    assert (stream_type, flush_bytes) == ("committed", 8 * 1024 * 1024)
+
+
+def test_invalid_stream_type(faux_conn):
+    with pytest.raises(ValueError, match="invalid storage_write_stream_type: nope"):
+        sqlalchemy.create_engine(
+            "bigquery://myproject/mydataset", storage_write_stream_type="nope"
+        )
+
+
+def test_batches():
+    assert list(_storage_write._batches([b"ab", b"c", b"def", b""], 3)) == [
+        [b"ab", b"c"],
+        [b"def", b""],
+    ]
+    assert list(_storage_write._batches([], 3)) == []